@@ -0,0 +1,272 @@
+"""图书大字段的存储：完整长文本、图片、标签等不进入关系表的 book_info 字段。
+
+关系库只保留 ``books`` 的结构化列与摘要，``books.has_external_longtext`` 标记该书在
+这里还有一份文档（按 ``book_id`` 寻址），读接口按页批量取回后拼出原始 ``book_info``。
+文档是各店铺共享的图书内容，店铺自己的售价取 ``inventories.price``（``listing_book_info``）；
+文档附带内容哈希，同一本书被再次上架且内容未变时不重写。
+
+默认写入 Mongo ``book_blob`` 文档；设置 ``BOOKSTORE_BLOB_DIR`` 时改存本地目录，
+每本书一个 JSON 文件，便于无 Mongo 的单机部署。
+
+图片按内容的 SHA-256 寻址、只存一份（Mongo 下为 GridFS ``book_picture``，本地目录下为
+``pictures/`` 子目录），book_info 与 ``books.cover_ref`` 中只保留摘要，
+字节经 ``/book/picture/<hash>`` 读取。
+"""
+import base64
+import binascii
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+import gridfs
+from gridfs.errors import FileExists
+from pymongo import ReplaceOne
+
+from be.model.mongo import get_book_collection
+
+DOC_TYPE = "book_blob"
+PICTURE_BUCKET = "book_picture"
+
+# book_info 中原样落到 books 同名列的字段
+BOOK_INFO_COLUMNS = (
+    "title",
+    "author",
+    "publisher",
+    "original_title",
+    "translator",
+    "pub_year",
+    "pages",
+    "price",
+    "currency_unit",
+    "binding",
+    "isbn",
+)
+# 长文本在 books 中只保留摘要列，超出摘要长度的全文放在 blob 文档里
+LONG_TEXT_COLUMNS = {
+    "book_intro": "intro_excerpt",
+    "author_intro": "author_excerpt",
+    "content": "content_excerpt",
+}
+# blob 文档中可以出现在 book_info 里的字段，其余键（旧版文档的 picture 等）一律不外露
+TEXT_BLOB_FIELDS = tuple(LONG_TEXT_COLUMNS) + ("sub_title", "catalog")
+BLOB_FIELDS = TEXT_BLOB_FIELDS + ("tags", "pictures")
+
+
+def _legacy_picture_bytes(picture) -> Optional[bytes]:
+    # 旧版导入脚本把封面以 bson Binary（bytes 子类）内嵌在文档里，也兼容 base64 字符串
+    if isinstance(picture, (bytes, bytearray)):
+        return bytes(picture)
+    if isinstance(picture, str):
+        try:
+            return base64.b64decode(picture, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+    return None
+
+
+def normalize_blob(doc: Optional[Dict]) -> Tuple[Dict, Dict[str, bytes]]:
+    """Keep the known ``book_info`` fields of a blob document.
+
+    A legacy inline ``picture`` becomes the first hash in ``pictures``; its bytes
+    are returned keyed by hash so a migration can move them to the picture store.
+    """
+    fields: Dict = {}
+    legacy_pictures: Dict[str, bytes] = {}
+    if not doc:
+        return fields, legacy_pictures
+    for key in TEXT_BLOB_FIELDS:
+        if isinstance(doc.get(key), str):
+            fields[key] = doc[key]
+    tags = doc.get("tags")
+    if isinstance(tags, str):
+        fields["tags"] = tags
+    elif isinstance(tags, list):
+        fields["tags"] = [tag for tag in tags if isinstance(tag, str)]
+    pictures = doc.get("pictures")
+    hashes = []
+    if isinstance(pictures, list):
+        hashes = [digest for digest in pictures if isinstance(digest, str)]
+    data = _legacy_picture_bytes(doc.get("picture"))
+    if data:
+        digest = picture_hash(data)
+        legacy_pictures[digest] = data
+        if digest not in hashes:
+            hashes.insert(0, digest)
+    if hashes or "pictures" in doc:
+        fields["pictures"] = hashes
+    return fields, legacy_pictures
+
+
+def build_book_info(book, blob: Optional[Dict] = None) -> Dict:
+    """Rebuild the ``book_info`` dict a seller listed from a books row and its blob."""
+    if book is None:
+        return {}
+    info = {"id": book.book_id}
+    for key in BOOK_INFO_COLUMNS:
+        info[key] = getattr(book, key, None)
+    for key, column in LONG_TEXT_COLUMNS.items():
+        info[key] = getattr(book, column, None)
+    info.update(normalize_blob(blob)[0])
+    return info
+
+
+def listing_book_info(book_infos: Dict[str, Dict], inventory) -> Dict:
+    """The ``book_info`` of one store's listing: the book's shared info with that store's price."""
+    info = dict(book_infos.get(inventory.book_id) or {})
+    if info:
+        info["price"] = inventory.price
+    return info
+
+
+def picture_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_hash(fields: Dict) -> str:
+    """Hash of a blob document's fields, stored alongside to skip rewriting unchanged books."""
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MongoBlobStore:
+    def put_many(self, docs: Dict[str, Dict]) -> None:
+        """Replace the documents of the given books whose content changed, in one bulk write."""
+        if not docs:
+            return
+        hashes = {book_id: content_hash(fields) for book_id, fields in docs.items()}
+        collection = get_book_collection()
+        stored = {
+            doc["book_id"]: doc.get("content_hash")
+            for doc in collection.find(
+                {"doc_type": DOC_TYPE, "book_id": {"$in": list(docs)}},
+                {"_id": 0, "book_id": 1, "content_hash": 1},
+            )
+        }
+        requests = [
+            ReplaceOne(
+                {"doc_type": DOC_TYPE, "book_id": book_id},
+                dict(
+                    fields,
+                    doc_type=DOC_TYPE,
+                    book_id=book_id,
+                    content_hash=hashes[book_id],
+                ),
+                upsert=True,
+            )
+            for book_id, fields in docs.items()
+            if stored.get(book_id) != hashes[book_id]
+        ]
+        if requests:
+            collection.bulk_write(requests, ordered=False)
+
+    def get_many(self, book_ids: Iterable[str]) -> Dict[str, Dict]:
+        book_ids = list(set(book_ids))
+        if not book_ids:
+            return {}
+        cursor = get_book_collection().find(
+            {"doc_type": DOC_TYPE, "book_id": {"$in": book_ids}},
+            {"_id": 0, "doc_type": 0},
+        )
+        return {doc.pop("book_id"): doc for doc in cursor}
+
+    def _pictures(self) -> gridfs.GridFS:
+        return gridfs.GridFS(get_book_collection().database, collection=PICTURE_BUCKET)
+
+    def put_pictures(self, pictures: Dict[str, bytes]) -> None:
+        """Store pictures keyed by their hash, skipping the ones already stored."""
+        if not pictures:
+            return
+        files = get_book_collection().database[PICTURE_BUCKET + ".files"]
+        stored = {
+            doc["_id"] for doc in files.find({"_id": {"$in": list(pictures)}}, {"_id": 1})
+        }
+        fs = self._pictures()
+        for digest, data in pictures.items():
+            if digest in stored:
+                continue
+            try:
+                fs.put(data, _id=digest)
+            except FileExists:
+                # 并发上架同一张图：内容相同，谁先写入都一样
+                continue
+
+    def get_picture(self, digest: str) -> Optional[bytes]:
+        try:
+            return self._pictures().get(digest).read()
+        except gridfs.NoFile:
+            return None
+
+
+class FileBlobStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, book_id: str) -> str:
+        # book_id 可能含路径分隔符等字符，文件名取其摘要
+        digest = hashlib.sha256(book_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest + ".json")
+
+    def put_many(self, docs: Dict[str, Dict]) -> None:
+        stored = self.get_many(docs)
+        for book_id, fields in docs.items():
+            digest = content_hash(fields)
+            if stored.get(book_id, {}).get("content_hash") == digest:
+                continue
+            path = self._path(book_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(dict(fields, content_hash=digest), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+    def get_many(self, book_ids: Iterable[str]) -> Dict[str, Dict]:
+        docs: Dict[str, Dict] = {}
+        for book_id in set(book_ids):
+            try:
+                with open(self._path(book_id), "r", encoding="utf-8") as f:
+                    docs[book_id] = json.load(f)
+            except FileNotFoundError:
+                continue
+        return docs
+
+    def _picture_path(self, digest: str) -> str:
+        return os.path.join(self.root, "pictures", digest[:2], digest)
+
+    def put_pictures(self, pictures: Dict[str, bytes]) -> None:
+        for digest, data in pictures.items():
+            path = self._picture_path(digest)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def get_picture(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self._picture_path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+@lru_cache()
+def get_blob_store():
+    root = os.getenv("BOOKSTORE_BLOB_DIR")
+    if root:
+        return FileBlobStore(root)
+    return MongoBlobStore()
+
+
+def load_book_infos(books: Iterable) -> Dict[str, Dict]:
+    """``book_id -> book_info`` for books rows, fetching blobs in one batch."""
+    books = [book for book in books if book is not None]
+    external = [
+        book.book_id for book in books if getattr(book, "has_external_longtext", False)
+    ]
+    blobs = get_blob_store().get_many(external) if external else {}
+    return {book.book_id: build_book_info(book, blobs.get(book.book_id)) for book in books}
@@ -2,13 +2,89 @@ import csv
 import io
 import json
 import logging
-import uuid
+from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
 from be.model import db_conn
 from be.model import error
-from be.model.dao import user_dao, store_dao, order_dao
+from be.model import ids
+from be.model import metrics
+from be.model import stock_admission
+from be.model.dao import archive_dao, user_dao, store_dao, order_dao
+
+
+EXPORT_FORMATS = ("json", "ndjson", "csv")
+EXPORT_CHUNK_SIZE = 500
+EXPORT_CSV_COLUMNS = (
+    "order_id",
+    "store_id",
+    "status",
+    "total_price",
+    "created_at",
+    "updated_at",
+)
+# CSV 按块输出的缓冲阈值（字符数）
+EXPORT_CSV_FLUSH_SIZE = 64 * 1024
+
+
+def _render_export(fmt: str, orders):
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_CSV_COLUMNS)
+            for order in orders:
+                writer.writerow([order.get(column) for column in EXPORT_CSV_COLUMNS])
+                if buffer.tell() >= EXPORT_CSV_FLUSH_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        elif fmt == "ndjson":
+            for order in orders:
+                yield json.dumps(order) + "\n"
+        else:
+            yield '{"message": "ok", "orders": ['
+            separator = ""
+            for order in orders:
+                yield separator + json.dumps(order)
+                separator = ", "
+            yield "]}"
+    except Exception as e:
+        # 响应头已发出，无法再改状态码；截断输出让客户端感知失败
+        logging.exception("export stream aborted: %s", e)
+
+
+def serialize_order(order, items=None) -> Dict:
+    """JSON-ready view of an order; ``items`` adds the line items when given."""
+
+    def _ts(value):
+        return value.isoformat() if value else None
+
+    payload = {
+        "order_id": order.order_id,
+        "user_id": order.user_id,
+        "store_id": order.store_id,
+        "status": order.status,
+        "total_price": order.total_price,
+        "created_at": _ts(order.created_at),
+        "updated_at": _ts(order.updated_at),
+        "payment_time": _ts(order.payment_time),
+        "shipment_time": _ts(order.shipment_time),
+        "delivery_time": _ts(order.delivery_time),
+        "expires_at": _ts(order.expires_at),
+    }
+    if items is not None:
+        payload["items"] = [
+            {
+                "book_id": item.book_id,
+                "count": item.count,
+                "price": item.unit_price,
+            }
+            for item in items
+        ]
+    return payload
 
 
 class Buyer(db_conn.DBConn):
@@ -25,138 +101,309 @@ class Buyer(db_conn.DBConn):
             session, store_id, items, decrease=False
         )
 
-    def cancel_expired_orders(self) -> int:
+    @staticmethod
+    def _is_expired(order, now: datetime) -> bool:
+        expires_at = getattr(order, "expires_at", None)
+        return (
+            order.status == "pending"
+            and expires_at is not None
+            and expires_at <= now
+        )
+
+    def _expire_orders(
+        self, session, orders, now: datetime, locked: bool = False
+    ) -> int:
+        """Move pending orders to cancelled_timeout and give their stock back in bulk."""
+        if not locked:
+            pending = set(
+                order_dao.lock_pending_orders(
+                    session, [order.order_id for order in orders]
+                )
+            )
+            orders = [order for order in orders if order.order_id in pending]
+        if not orders:
+            return 0
+        order_ids = [order.order_id for order in orders]
+        updated = order_dao.update_orders_status(
+            session,
+            order_ids,
+            expected_status="pending",
+            new_status="cancelled_timeout",
+            cancelled_at=now,
+            updated_at=now,
+        )
+        items_by_order = order_dao.get_items_for_orders(session, order_ids)
+        deltas = {}
+        for order in orders:
+            items = items_by_order[order.order_id]
+            restore = order_dao.merge_stock_deltas(
+                order.store_id,
+                [(item.book_id, item.count) for item in items],
+                decrease=False,
+            )
+            for key, delta in restore.items():
+                deltas[key] = deltas.get(key, 0) + delta
+        order_dao.apply_stock_deltas(session, deltas)
+        return updated
+
+    def cancel_expired_orders(self, limit: Optional[int] = None) -> int:
+        """Cancel up to ``limit`` expired orders in one transaction (used by the sweeper)."""
         now = datetime.utcnow()
-        cutoff = now - timedelta(seconds=self.pending_timeout)
         with self.session_scope() as session:
             expired_orders = order_dao.find_expired_pending_orders(
-                session, now, cutoff
+                session, now, limit=limit
             )
-            cancelled = 0
-            for order in expired_orders:
-                items = order_dao.get_order_items(session, order.order_id)
-                tuples = [(item.book_id, item.count) for item in items]
-                self.__restore_inventory(session, order.store_id, tuples)
-                order_dao.update_order_status(
-                    session,
-                    order_id=order.order_id,
-                    expected_status="pending",
-                    new_status="cancelled_timeout",
-                    cancelled_at=now,
-                    updated_at=now,
-                )
-                cancelled += 1
-            return cancelled
+            if not expired_orders:
+                # 积压清空后不再沿用上一次的滞后值
+                metrics.set_gauge("order_expiry.sweep_lag_seconds", 0)
+                return 0
+            cancelled = self._expire_orders(session, expired_orders, now, locked=True)
+        lag = (now - min(order.expires_at for order in expired_orders)).total_seconds()
+        metrics.set_gauge("order_expiry.sweep_lag_seconds", lag)
+        metrics.incr("order_expiry.cancelled", cancelled)
+        return cancelled
+
+    def archive_orders(self, older_than: timedelta, limit: int) -> int:
+        """Move one batch of finished orders idle for ``older_than`` to the archive tables."""
+        before = datetime.utcnow() - older_than
+        with self.session_scope() as session:
+            archived = archive_dao.archive_orders(session, before, limit)
+        metrics.incr("order_archive.archived", archived)
+        return archived
 
     def new_order(
         self, user_id: str, store_id: str, id_and_count: List[Tuple[str, int]]
     ) -> Tuple[int, str, str]:
-        order_id = ""
-        try:
-            with self.session_scope() as session:
-                buyer = user_dao.get_user(session, user_id)
-                if buyer is None:
-                    return error.error_non_exist_user_id(user_id) + (order_id,)
-                store = store_dao.get_store(session, store_id)
-                if store is None:
-                    return error.error_non_exist_store_id(store_id) + (order_id,)
-                order_id = f"{user_id}_{store_id}_{uuid.uuid1()}"
-
-                order_items = []
-                stock_tuples = []
-                for book_id, count in id_and_count:
-                    inventory = store_dao.get_inventory(session, store_id, book_id)
-                    if inventory is None:
-                        return error.error_non_exist_book_id(book_id) + (order_id,)
-                    if inventory.stock_level < count:
-                        return error.error_stock_level_low(book_id) + (order_id,)
-                    price = inventory.price
-                    if price is None:
-                        try:
-                            info = json.loads(inventory.book_info or "{}")
-                        except (TypeError, ValueError):
-                            info = {}
-                        price = info.get("price", 0)
-                    order_items.append((book_id, count, int(price or 0)))
-                    stock_tuples.append((book_id, count))
-
-                if not order_dao.adjust_inventory_for_items(
-                    session, store_id, stock_tuples, decrease=True
-                ):
-                    return error.error_stock_level_low(stock_tuples[0][0]) + (order_id,)
-
-                total_price = sum(price * count for _, count, price in order_items)
-                now = datetime.utcnow()
-                expires_at = now + timedelta(seconds=self.pending_timeout)
-                order_dao.create_order(
-                    session,
-                    order_id=order_id,
-                    user_id=user_id,
-                    store_id=store_id,
-                    status="pending",
-                    total_price=total_price,
-                    expires_at=expires_at,
-                )
-                order_dao.add_order_items(session, order_id, order_items)
+        def work(session):
+            buyer = user_dao.get_user(session, user_id)
+            if buyer is None:
+                return error.error_non_exist_user_id(user_id) + ("",)
+            store = store_dao.get_store(session, store_id)
+            if store is None:
+                return error.error_non_exist_store_id(store_id) + ("",)
+            order_id = self._new_order_id()
+
+            stock_tuples = [
+                (book_id, int(count)) for book_id, count in id_and_count
+            ]
+            # 一次 IN 查询按主键顺序锁定全部库存行，同时取回价格与库存
+            locked = order_dao.lock_inventory(
+                session,
+                order_dao.merge_stock_deltas(store_id, stock_tuples, True).keys(),
+            )
+            err, deltas, order_items = self._take_order_lines(
+                store_id, stock_tuples, locked
+            )
+            if err is not None:
+                return err + (order_id,)
+
+            if order_dao.apply_stock_deltas(session, deltas) != len(deltas):
+                raise RuntimeError("inventory changed while reserving stock")
+
+            total_price = sum(price * count for _, count, price in order_items)
+            now = datetime.utcnow()
+            expires_at = now + timedelta(seconds=self.pending_timeout)
+            order_dao.create_order(
+                session,
+                order_id=order_id,
+                user_id=user_id,
+                store_id=store_id,
+                status="pending",
+                total_price=total_price,
+                expires_at=expires_at,
+            )
+            order_dao.add_order_items(session, order_id, order_items)
             return 200, "ok", order_id
+
+        try:
+            # 已知售罄时直接拒绝，不开事务、不排队等库存行锁
+            short_book = stock_admission.admit(store_id, id_and_count)
+            if short_book is not None:
+                return error.error_stock_level_low(short_book) + ("",)
+            return self.run_transaction("new_order", work)
         except BaseException as e:
             logging.exception("new_order failed: %s", e)
             return 530, "{}".format(str(e)), ""
 
-    def payment(self, user_id: str, password: str, order_id: str) -> Tuple[int, str]:
-        try:
-            self.cancel_expired_orders()
-            with self.session_scope() as session:
-                order = order_dao.get_order(session, order_id)
-                if order is None:
-                    return error.error_invalid_order_id(order_id)
-                if order.user_id != user_id:
-                    return error.error_authorization_fail()
-                if order.status != "pending":
-                    return error.error_invalid_order_status(order_id)
+    @staticmethod
+    def _new_order_id() -> str:
+        # 旧格式 f"{user_id}_{store_id}_{uuid1}" 的订单仍按原主键查询
+        return ids.new_id()
 
-                buyer = user_dao.get_user(session, user_id)
-                if buyer is None:
-                    return error.error_non_exist_user_id(user_id)
-                if buyer.password != password:
-                    return error.error_authorization_fail()
+    @staticmethod
+    def _take_order_lines(store_id: str, stock_tuples, available: Dict):
+        """Check one order's lines against locked stock and take them from it.
 
-                store = store_dao.get_store(session, order.store_id)
-                if store is None:
-                    return error.error_non_exist_store_id(order.store_id)
-                seller_id = store.owner_id
-                if user_dao.get_user(session, seller_id) is None:
-                    return error.error_non_exist_user_id(seller_id)
+        ``available`` maps (store_id, book_id) to (stock_level, price) as
+        returned by ``lock_inventory``; it is only decremented when every line
+        fits, so later orders in the same basket see what is left.
+        Returns (error or None, stock deltas, [(book_id, count, price)]).
+        """
+        deltas = order_dao.merge_stock_deltas(store_id, stock_tuples, decrease=True)
+        order_items = []
+        for book_id, count in stock_tuples:
+            row = available.get((store_id, book_id))
+            if row is None:
+                return error.error_non_exist_book_id(book_id), deltas, []
+            stock_level, price = row
+            if stock_level + deltas[(store_id, book_id)] < 0:
+                return error.error_stock_level_low(book_id), deltas, []
+            order_items.append((book_id, count, int(price or 0)))
+        for key, delta in deltas.items():
+            stock_level, price = available[key]
+            available[key] = (stock_level + delta, price)
+        return None, deltas, order_items
 
-                total_price = order.total_price
-                if not user_dao.change_balance(session, user_id, -total_price):
-                    return error.error_not_sufficient_funds(order_id)
-                if not user_dao.change_balance(session, seller_id, total_price):
-                    return error.error_non_exist_user_id(seller_id)
+    def new_orders(
+        self, user_id: str, groups: List[Tuple[str, List[Tuple[str, int]]]]
+    ) -> Tuple[int, str, List[Dict]]:
+        """Create one pending order per (store_id, books) group in one transaction.
 
-                updated = order_dao.update_order_status(
-                    session,
-                    order_id=order_id,
-                    expected_status="pending",
-                    new_status="paid",
-                    payment_time=datetime.utcnow(),
-                    updated_at=datetime.utcnow(),
+        Groups fail independently: the result lists, in input order, either the
+        new ``order_id`` or the ``code``/``message`` of that group's error.
+        """
+        def work(session):
+            if user_dao.get_user(session, user_id) is None:
+                return error.error_non_exist_user_id(user_id) + ([],)
+            parsed = [
+                (store_id, [(book_id, int(count)) for book_id, count in books])
+                for store_id, books in groups
+            ]
+            stores = store_dao.get_stores(
+                session, [store_id for store_id, _ in parsed]
+            )
+            keys = set()
+            for store_id, stock_tuples in parsed:
+                if store_id in stores:
+                    keys.update(
+                        order_dao.merge_stock_deltas(store_id, stock_tuples, True)
+                    )
+            # 所有店铺的库存行一次加锁，按 (store_id, book_id) 排序，顺序确定
+            available = order_dao.lock_inventory(session, keys)
+
+            now = datetime.utcnow()
+            expires_at = now + timedelta(seconds=self.pending_timeout)
+            results, orders, items = [], [], []
+            total_deltas = defaultdict(int)
+            for store_id, stock_tuples in parsed:
+                if store_id not in stores:
+                    code, message = error.error_non_exist_store_id(store_id)
+                    results.append(
+                        {"store_id": store_id, "code": code, "message": message}
+                    )
+                    continue
+                err, deltas, order_items = self._take_order_lines(
+                    store_id, stock_tuples, available
                 )
-                if not updated:
-                    return error.error_invalid_order_status(order_id)
+                if err is not None:
+                    results.append(
+                        {"store_id": store_id, "code": err[0], "message": err[1]}
+                    )
+                    continue
+                for key, delta in deltas.items():
+                    total_deltas[key] += delta
+                order_id = self._new_order_id()
+                orders.append(
+                    {
+                        "order_id": order_id,
+                        "user_id": user_id,
+                        "store_id": store_id,
+                        "status": "pending",
+                        "total_price": sum(
+                            price * count for _, count, price in order_items
+                        ),
+                        "expires_at": expires_at,
+                    }
+                )
+                items.extend(
+                    {
+                        "order_id": order_id,
+                        "book_id": book_id,
+                        "count": count,
+                        "unit_price": price,
+                    }
+                    for book_id, count, price in order_items
+                )
+                results.append({"store_id": store_id, "order_id": order_id})
+
+            if total_deltas:
+                applied = order_dao.apply_stock_deltas(session, total_deltas)
+                if applied != len(total_deltas):
+                    raise RuntimeError("inventory changed while reserving stock")
+            order_dao.bulk_create_orders(session, orders, items)
+            return 200, "ok", results
+
+        try:
+            return self.run_transaction("new_orders", work)
+        except BaseException as e:
+            logging.exception("new_orders failed: %s", e)
+            return 530, "{}".format(str(e)), []
+
+    def payment(self, user_id: str, password: str, order_id: str) -> Tuple[int, str]:
+        def work(session):
+            order = order_dao.get_order(session, order_id)
+            if order is None:
+                return error.error_invalid_order_id(order_id)
+            if order.user_id != user_id:
+                return error.error_authorization_fail()
+            if order.status != "pending":
+                return error.error_invalid_order_status(order_id)
+            if self._is_expired(order, datetime.utcnow()):
+                self._expire_orders(session, [order], datetime.utcnow())
+                return error.error_invalid_order_status(order_id)
+
+            buyer = user_dao.get_user(session, user_id)
+            if buyer is None:
+                return error.error_non_exist_user_id(user_id)
+            if buyer.password != password:
+                return error.error_authorization_fail()
+
+            store = store_dao.get_store(session, order.store_id)
+            if store is None:
+                return error.error_non_exist_store_id(order.store_id)
+            seller_id = store.owner_id
+            if user_dao.get_user(session, seller_id) is None:
+                return error.error_non_exist_user_id(seller_id)
+
+            # 先做条件状态翻转：锁住订单行，并发的重复支付在这里落空
+            now = datetime.utcnow()
+            updated = order_dao.update_order_status(
+                session,
+                order_id=order_id,
+                expected_status="pending",
+                new_status="paid",
+                payment_time=now,
+                updated_at=now,
+            )
+            if not updated:
+                return error.error_invalid_order_status(order_id)
+
+            failed = user_dao.transfer_balance(
+                session, user_id, seller_id, order.total_price, order_id
+            )
+            if failed is not None:
+                session.rollback()
+                if failed == user_id:
+                    return error.error_not_sufficient_funds(order_id)
+                return error.error_non_exist_user_id(seller_id)
             return 200, "ok"
+
+        try:
+            return self.run_transaction("payment", work)
         except BaseException as e:
             return 530, "{}".format(str(e))
 
     def add_funds(self, user_id, password, add_value) -> Tuple[int, str]:
-        try:
-            with self.session_scope() as session:
-                user = user_dao.get_user(session, user_id)
-                if user is None or user.password != password:
-                    return error.error_authorization_fail()
-                if not user_dao.change_balance(session, user_id, int(add_value)):
-                    return error.error_non_exist_user_id(user_id)
+        def work(session):
+            user = user_dao.get_user(session, user_id)
+            if user is None or user.password != password:
+                return error.error_authorization_fail()
+            if not user_dao.change_balance(session, user_id, int(add_value)):
+                return error.error_non_exist_user_id(user_id)
             return 200, "ok"
+
+        try:
+            return self.run_transaction("add_funds", work)
         except BaseException as e:
             return 530, "{}".format(str(e))
 
@@ -187,64 +434,43 @@ class Buyer(db_conn.DBConn):
     def cancel_order(
         self, user_id: str, password: Optional[str], order_id: str
     ) -> Tuple[int, str]:
-        try:
-            self.cancel_expired_orders()
-            with self.session_scope() as session:
-                order = order_dao.get_order(session, order_id)
-                if order is None:
-                    return error.error_invalid_order_id(order_id)
-                if order.user_id != user_id:
+        def work(session):
+            order = order_dao.get_order(session, order_id)
+            if order is None:
+                return error.error_invalid_order_id(order_id)
+            if order.user_id != user_id:
+                return error.error_authorization_fail()
+            if order.status != "pending":
+                return error.error_invalid_order_status(order_id)
+            if self._is_expired(order, datetime.utcnow()):
+                self._expire_orders(session, [order], datetime.utcnow())
+                return error.error_invalid_order_status(order_id)
+            if password is not None:
+                user = user_dao.get_user(session, user_id)
+                if user is None or user.password != password:
                     return error.error_authorization_fail()
-                if order.status != "pending":
-                    return error.error_invalid_order_status(order_id)
-                if password is not None:
-                    user = user_dao.get_user(session, user_id)
-                    if user is None or user.password != password:
-                        return error.error_authorization_fail()
-
-                items = order_dao.get_order_items(session, order_id)
-                tuples = [(item.book_id, item.count) for item in items]
-                self.__restore_inventory(session, order.store_id, tuples)
-                updated = order_dao.update_order_status(
-                    session,
-                    order_id=order_id,
-                    expected_status="pending",
-                    new_status="cancelled",
-                    cancelled_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow(),
-                )
-                if not updated:
-                    return error.error_invalid_order_status(order_id)
+
+            # 先用条件 UPDATE 抢到状态切换，只有切换成功的一方归还库存，并发取消不会重复归还
+            updated = order_dao.update_order_status(
+                session,
+                order_id=order_id,
+                expected_status="pending",
+                new_status="cancelled",
+                cancelled_at=datetime.utcnow(),
+                updated_at=datetime.utcnow(),
+            )
+            if not updated:
+                return error.error_invalid_order_status(order_id)
+            items = order_dao.get_order_items(session, order_id)
+            tuples = [(item.book_id, item.count) for item in items]
+            self.__restore_inventory(session, order.store_id, tuples)
             return 200, "ok"
+
+        try:
+            return self.run_transaction("cancel_order", work)
         except BaseException as e:
             return 530, "{}".format(str(e))
 
-    def __serialize_order(self, order, items):
-        def _ts(value):
-            return value.isoformat() if value else None
-
-        return {
-            "order_id": order.order_id,
-            "user_id": order.user_id,
-            "store_id": order.store_id,
-            "status": order.status,
-            "total_price": order.total_price,
-            "created_at": _ts(order.created_at),
-            "updated_at": _ts(order.updated_at),
-            "payment_time": _ts(order.payment_time),
-            "shipment_time": _ts(order.shipment_time),
-            "delivery_time": _ts(order.delivery_time),
-            "expires_at": _ts(order.expires_at),
-            "items": [
-                {
-                    "book_id": item.book_id,
-                    "count": item.count,
-                    "price": item.unit_price,
-                }
-                for item in items
-            ],
-        }
-
     def list_orders(
         self,
         user_id: str,
@@ -254,34 +480,55 @@ class Buyer(db_conn.DBConn):
         created_from: Optional[datetime] = None,
         created_to: Optional[datetime] = None,
         sort_by: str = "updated_at",
+        include_items: bool = True,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        include_history: bool = False,
     ) -> Tuple[int, str, Dict]:
         try:
-            self.cancel_expired_orders()
             with self.session_scope() as session:
                 if user_dao.get_user(session, user_id) is None:
                     return error.error_non_exist_user_id(user_id) + ({},)
                 safe_page = max(page or 1, 1)
                 safe_page_size = max(min(page_size or 20, 50), 1)
-                total, orders = order_dao.list_orders(
-                    session,
-                    user_id=user_id,
-                    status=status,
-                    created_from=created_from,
-                    created_to=created_to,
-                    sort_by=sort_by,
-                    page=safe_page,
-                    page_size=safe_page_size,
+                try:
+                    total, orders, next_cursor = order_dao.list_orders(
+                        session,
+                        user_id=user_id,
+                        status=status,
+                        created_from=created_from,
+                        created_to=created_to,
+                        sort_by=sort_by,
+                        page=safe_page,
+                        page_size=safe_page_size,
+                        cursor=cursor,
+                        with_total=include_total,
+                        include_history=include_history,
+                    )
+                except ValueError:
+                    return error.error_invalid_cursor(cursor) + ({},)
+                now = datetime.utcnow()
+                self._expire_orders(
+                    session, [o for o in orders if self._is_expired(o, now)], now
                 )
-                serialized = []
-                for order in orders:
-                    items = order_dao.get_order_items(session, order.order_id)
-                    serialized.append(self.__serialize_order(order, items))
+                items_by_order = {}
+                if include_items:
+                    items_by_order = order_dao.get_items_for_orders(
+                        session, [order.order_id for order in orders], include_history
+                    )
+                serialized = [
+                    serialize_order(order, items_by_order.get(order.order_id))
+                    for order in orders
+                ]
                 payload = {
-                    "page": safe_page,
                     "page_size": safe_page_size,
-                    "total": total,
                     "orders": serialized,
+                    "next_cursor": next_cursor,
                 }
+                if not cursor:
+                    payload["page"] = safe_page
+                if include_total:
+                    payload["total"] = total
                 return 200, "ok", payload
         except BaseException as e:
             return 530, "{}".format(str(e)), {}
@@ -294,44 +541,69 @@ class Buyer(db_conn.DBConn):
         created_to: Optional[datetime],
         sort_by: str,
         fmt: str = "json",
-        limit: int = 500,
+        limit: Optional[int] = None,
+        include_items: bool = True,
+        include_history: bool = False,
     ) -> Tuple[int, str, Optional[Dict]]:
-        safe_limit = max(min(limit or 500, 2000), 1)
-        code, message, payload = self.list_orders(
-            user_id=user_id,
-            status=status,
-            page=1,
-            page_size=safe_limit,
-            created_from=created_from,
-            created_to=created_to,
-            sort_by=sort_by,
+        """校验参数后返回一个按块生成导出内容的迭代器，不在内存中攒全量结果。"""
+        if fmt not in EXPORT_FORMATS:
+            fmt = "json"
+        try:
+            with self.session_scope() as session:
+                if user_dao.get_user(session, user_id) is None:
+                    return error.error_non_exist_user_id(user_id) + (None,)
+        except BaseException as e:
+            return 530, "{}".format(str(e)), None
+        orders = self._iter_export_orders(
+            user_id,
+            status,
+            created_from,
+            created_to,
+            sort_by,
+            limit if limit and limit > 0 else None,
+            include_items and fmt != "csv",
+            include_history,
         )
-        if code != 200:
-            return code, message, None
-        orders = payload.get("orders", [])
-        if fmt == "csv":
-            buffer = io.StringIO()
-            writer = csv.writer(buffer)
-            writer.writerow(
-                [
-                    "order_id",
-                    "store_id",
-                    "status",
-                    "total_price",
-                    "created_at",
-                    "updated_at",
-                ]
-            )
-            for order in orders:
-                writer.writerow(
-                    [
-                        order.get("order_id"),
-                        order.get("store_id"),
-                        order.get("status"),
-                        order.get("total_price"),
-                        order.get("created_at"),
-                        order.get("updated_at"),
-                    ]
-                )
-            return 200, "ok", {"content": buffer.getvalue(), "format": "csv"}
-        return 200, "ok", {"orders": orders, "format": "json"}
+        return 200, "ok", {"format": fmt, "chunks": _render_export(fmt, orders)}
+
+    def _iter_export_orders(
+        self,
+        user_id: str,
+        status: Optional[str],
+        created_from: Optional[datetime],
+        created_to: Optional[datetime],
+        sort_by: str,
+        limit: Optional[int],
+        include_items: bool,
+        include_history: bool = False,
+    ):
+        # 迭代发生在视图返回之后，请求级 session 已关闭，需要独立的 session
+        with self.session_scope(standalone=True) as session:
+            for orders in order_dao.iter_order_chunks(
+                session,
+                user_id=user_id,
+                status=status,
+                created_from=created_from,
+                created_to=created_to,
+                sort_by=sort_by,
+                chunk_size=EXPORT_CHUNK_SIZE,
+                limit=limit,
+                include_history=include_history,
+            ):
+                items_by_order = {}
+                if include_items:
+                    items_by_order = order_dao.get_items_for_orders(
+                        session, [order.order_id for order in orders], include_history
+                    )
+                now = datetime.utcnow()
+                for order in orders:
+                    items = None
+                    if include_items:
+                        items = items_by_order.get(order.order_id, [])
+                    payload = serialize_order(order, items)
+                    if self._is_expired(order, now):
+                        # 与 list_orders 相同的超时判断；导出只读，落库与归还库存交给后台扫描
+                        payload["status"] = "cancelled_timeout"
+                    yield payload
+                # 已输出的对象不再需要，避免 identity map 随导出行数增长
+                session.expunge_all()
@@ -0,0 +1,139 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import bindparam, delete, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from be.model.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    BookSales,
+    Order,
+    OrderItem,
+)
+
+# 不会再发生状态流转的订单才允许归档
+ARCHIVABLE_STATUSES = ("delivered", "cancelled", "cancelled_timeout")
+# 计入销量的终态；取消的订单只归档不计销量
+SOLD_STATUSES = ("delivered",)
+
+
+def _lock_archivable_orders(
+    session: Session, before: datetime, limit: int
+) -> List[Tuple[str, str]]:
+    """Range scan on (status, updated_at); rows locked by others are skipped."""
+    query = (
+        select(Order.order_id, Order.status)
+        .where(Order.status.in_(ARCHIVABLE_STATUSES), Order.updated_at < before)
+        .order_by(Order.updated_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return [(row.order_id, row.status) for row in session.execute(query)]
+
+
+def _fold_sales(session: Session, order_ids: List[str]) -> int:
+    """Add the sold quantities of ``order_ids`` into book_sales; return books touched."""
+    if not order_ids:
+        return 0
+    rows = session.execute(
+        select(OrderItem.book_id, OrderItem.count, OrderItem.unit_price).where(
+            OrderItem.order_id.in_(order_ids)
+        )
+    ).all()
+    totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for book_id, count, unit_price in rows:
+        totals[book_id][0] += count
+        totals[book_id][1] += count * unit_price
+    if not totals:
+        return 0
+
+    book_ids = sorted(totals)
+    existing = set(
+        session.execute(
+            select(BookSales.book_id)
+            .where(BookSales.book_id.in_(book_ids))
+            .with_for_update()
+        ).scalars()
+    )
+    sales = BookSales.__table__
+    updates = [
+        {
+            "b_book_id": book_id,
+            "b_count": totals[book_id][0],
+            "b_amount": totals[book_id][1],
+        }
+        for book_id in book_ids
+        if book_id in existing
+    ]
+    if updates:
+        session.execute(
+            update(sales)
+            .where(sales.c.book_id == bindparam("b_book_id"))
+            .values(
+                sold_count=sales.c.sold_count + bindparam("b_count"),
+                sales_amount=sales.c.sales_amount + bindparam("b_amount"),
+            ),
+            updates,
+        )
+    inserts = [
+        {
+            "book_id": book_id,
+            "sold_count": totals[book_id][0],
+            "sales_amount": totals[book_id][1],
+        }
+        for book_id in book_ids
+        if book_id not in existing
+    ]
+    if inserts:
+        session.execute(insert(sales), inserts)
+    return len(book_ids)
+
+
+def archive_orders(session: Session, before: datetime, limit: int) -> int:
+    """Move up to ``limit`` terminal orders last updated before ``before`` to the archive.
+
+    Rows are copied with INSERT ... SELECT, sales of delivered orders are
+    folded into book_sales, then the hot rows are deleted; returns orders moved.
+    """
+    locked = _lock_archivable_orders(session, before, limit)
+    if not locked:
+        return 0
+    order_ids = [order_id for order_id, _ in locked]
+    sold_ids = [order_id for order_id, status in locked if status in SOLD_STATUSES]
+
+    order_columns = [column.name for column in Order.__table__.columns]
+    session.execute(
+        insert(ArchivedOrder.__table__).from_select(
+            order_columns + ["archived_at"],
+            select(
+                *[Order.__table__.c[name] for name in order_columns],
+                literal(datetime.utcnow()),
+            ).where(Order.order_id.in_(order_ids)),
+        )
+    )
+    item_columns = [column.name for column in OrderItem.__table__.columns]
+    session.execute(
+        insert(ArchivedOrderItem.__table__).from_select(
+            item_columns,
+            select(*[OrderItem.__table__.c[name] for name in item_columns]).where(
+                OrderItem.order_id.in_(order_ids)
+            ),
+        )
+    )
+    _fold_sales(session, sold_ids)
+
+    session.execute(
+        delete(OrderItem)
+        .where(OrderItem.order_id.in_(order_ids))
+        .execution_options(synchronize_session=False)
+    )
+    deleted = session.execute(
+        delete(Order)
+        .where(Order.order_id.in_(order_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if deleted != len(order_ids):
+        raise RuntimeError("orders archived concurrently")
+    return deleted
@@ -0,0 +1,89 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from be.model.models import IdempotencyKey
+
+
+def _key_filter(user_id: str, endpoint: str, idem_key: str):
+    return (
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.endpoint == endpoint,
+        IdempotencyKey.idem_key == idem_key,
+    )
+
+
+def get_record(
+    session: Session, user_id: str, endpoint: str, idem_key: str
+) -> Optional[IdempotencyKey]:
+    return session.get(IdempotencyKey, (user_id, endpoint, idem_key))
+
+
+def add_claim(
+    session: Session, user_id: str, endpoint: str, idem_key: str, request_hash: str
+) -> IdempotencyKey:
+    """Insert a pending record; raises IntegrityError if the key is already taken."""
+    record = IdempotencyKey(
+        user_id=user_id,
+        endpoint=endpoint,
+        idem_key=idem_key,
+        request_hash=request_hash,
+    )
+    session.add(record)
+    session.flush()
+    return record
+
+
+def take_over_claim(
+    session: Session,
+    user_id: str,
+    endpoint: str,
+    idem_key: str,
+    claimed_at: datetime,
+    now: datetime,
+) -> bool:
+    """Re-claim a pending record still stamped ``claimed_at``; False if another request won."""
+    stmt = (
+        update(IdempotencyKey)
+        .where(
+            *_key_filter(user_id, endpoint, idem_key),
+            IdempotencyKey.status_code.is_(None),
+            IdempotencyKey.created_at == claimed_at,
+        )
+        .values(created_at=now)
+    )
+    return session.execute(stmt).rowcount == 1
+
+
+def complete_claim(
+    session: Session,
+    user_id: str,
+    endpoint: str,
+    idem_key: str,
+    status_code: int,
+    response_body: str,
+) -> bool:
+    stmt = (
+        update(IdempotencyKey)
+        .where(
+            *_key_filter(user_id, endpoint, idem_key),
+            IdempotencyKey.status_code.is_(None),
+        )
+        .values(status_code=status_code, response_body=response_body)
+    )
+    return session.execute(stmt).rowcount == 1
+
+
+def release_claim(session: Session, user_id: str, endpoint: str, idem_key: str) -> None:
+    stmt = delete(IdempotencyKey).where(
+        *_key_filter(user_id, endpoint, idem_key),
+        IdempotencyKey.status_code.is_(None),
+    )
+    session.execute(stmt)
+
+
+def purge_before(session: Session, cutoff: datetime) -> int:
+    stmt = delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)
+    return session.execute(stmt).rowcount
@@ -1,10 +1,90 @@
-from datetime import datetime
-from typing import Iterable, List, Optional, Tuple
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from sqlalchemy import and_, func, or_, update
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    and_,
+    bindparam,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    union_all,
+    update,
+)
+from sqlalchemy.orm import Session, aliased
 
-from be.model.models import Inventory, Order, OrderItem
+from be.model import stock_admission
+from be.model.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    Inventory,
+    Order,
+    OrderEvent,
+    OrderItem,
+)
+
+
+def _record_transitions(
+    session: Session,
+    order_ids: List[str],
+    from_status: str,
+    to_status: str,
+    now: datetime,
+    store_id: Optional[str] = None,
+) -> None:
+    """Append one event per order in ``order_ids``, copied with INSERT ... SELECT.
+
+    ``order_ids`` must be exactly the orders the caller's UPDATE just moved to
+    ``to_status``; the status / store filters only guard against rows that are not.
+    """
+    if not order_ids:
+        return
+    conditions = [Order.order_id.in_(order_ids), Order.status == to_status]
+    if store_id is not None:
+        conditions.append(Order.store_id == store_id)
+    session.execute(
+        insert(OrderEvent).from_select(
+            [
+                "order_id",
+                "user_id",
+                "store_id",
+                "from_status",
+                "to_status",
+                "created_at",
+            ],
+            select(
+                Order.order_id,
+                Order.user_id,
+                Order.store_id,
+                literal(from_status),
+                Order.status,
+                literal(now),
+            ).where(*conditions),
+        )
+    )
+
+
+def _record_created(session: Session, orders: List[Dict], now: datetime) -> None:
+    if orders:
+        session.execute(
+            insert(OrderEvent),
+            [
+                {
+                    "order_id": order["order_id"],
+                    "user_id": order["user_id"],
+                    "store_id": order["store_id"],
+                    "from_status": None,
+                    "to_status": order["status"],
+                    "created_at": now,
+                }
+                for order in orders
+            ],
+        )
 
 
 def create_order(
@@ -26,6 +106,18 @@ def create_order(
     )
     session.add(order)
     session.flush()
+    _record_created(
+        session,
+        [
+            {
+                "order_id": order_id,
+                "user_id": user_id,
+                "store_id": store_id,
+                "status": status,
+            }
+        ],
+        datetime.utcnow(),
+    )
     return order
 
 
@@ -42,6 +134,17 @@ def add_order_items(
     session.flush()
 
 
+def bulk_create_orders(
+    session: Session, orders: List[Dict], items: List[Dict]
+) -> None:
+    """Insert many orders and their items with one executemany INSERT per table."""
+    if orders:
+        session.execute(insert(Order), orders)
+        _record_created(session, orders, datetime.utcnow())
+    if items:
+        session.execute(insert(OrderItem), items)
+
+
 def get_order(session: Session, order_id: str) -> Optional[Order]:
     return session.get(Order, order_id)
 
@@ -54,6 +157,31 @@ def get_order_items(session: Session, order_id: str) -> List[OrderItem]:
     )
 
 
+def get_items_for_orders(
+    session: Session, order_ids: Iterable[str], include_history: bool = False
+) -> Dict[str, List[OrderItem]]:
+    """Load the items of many orders with one IN query, grouped by order_id.
+
+    With ``include_history`` a second IN query picks up archived items; their
+    rows are ``ArchivedOrderItem`` instances with the same attributes.
+    """
+    order_ids = list(order_ids)
+    grouped: Dict[str, List[OrderItem]] = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return grouped
+    models = (OrderItem, ArchivedOrderItem) if include_history else (OrderItem,)
+    for model in models:
+        items = (
+            session.query(model)
+            .filter(model.order_id.in_(order_ids))
+            .order_by(model.order_id, model.id)
+            .all()
+        )
+        for item in items:
+            grouped[item.order_id].append(item)
+    return grouped
+
+
 def update_order_status(
     session: Session,
     order_id: str,
@@ -66,8 +194,117 @@ def update_order_status(
         .where(Order.order_id == order_id, Order.status == expected_status)
         .values(status=new_status, **extra_fields)
     )
-    result = session.execute(stmt)
-    return result.rowcount > 0
+    if session.execute(stmt).rowcount == 0:
+        return False
+    now = extra_fields.get("updated_at") or datetime.utcnow()
+    _record_transitions(session, [order_id], expected_status, new_status, now)
+    return True
+
+
+ORDER_SORT_COLUMNS = {
+    "updated_at": Order.updated_at,
+    "created_at": Order.created_at,
+    "total_price": Order.total_price,
+}
+
+
+def _sort_column(entity, sort_by: str):
+    return getattr(entity, ORDER_SORT_COLUMNS.get(sort_by, Order.updated_at).key)
+
+
+def encode_cursor(sort_by: str, order: Order) -> str:
+    """Opaque keyset cursor holding (sort value, order_id) of the last row of a page."""
+    if sort_by not in ORDER_SORT_COLUMNS:
+        sort_by = "updated_at"
+    value = getattr(order, sort_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort_by, value, order.order_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(sort_by: str, cursor: str) -> Tuple[object, str]:
+    """Return (sort value, order_id); raise ValueError for malformed or foreign cursors."""
+    if sort_by not in ORDER_SORT_COLUMNS:
+        sort_by = "updated_at"
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii"))
+        cursor_sort, value, order_id = json.loads(raw.decode("utf-8"))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("malformed cursor")
+    if cursor_sort != sort_by or not isinstance(order_id, str):
+        raise ValueError("cursor does not match sort_by")
+    if sort_by == "total_price":
+        if not isinstance(value, int):
+            raise ValueError("malformed cursor")
+    else:
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError("malformed cursor")
+    return value, order_id
+
+
+def keyset_after(sort_column, id_column, value, last_id, descending: bool = True):
+    """Rows strictly after (value, last_id) in (sort_column, id_column) order."""
+    if descending:
+        return or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < last_id),
+        )
+    return or_(
+        sort_column > value,
+        and_(sort_column == value, id_column > last_id),
+    )
+
+
+def _buyer_order_conditions(
+    table,
+    user_id: str,
+    status: Optional[str],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+):
+    conditions = [table.c.user_id == user_id]
+    if status:
+        conditions.append(table.c.status == status)
+    if created_from:
+        conditions.append(table.c.created_at >= created_from)
+    if created_to:
+        conditions.append(table.c.created_at <= created_to)
+    return conditions
+
+
+def _buyer_orders_query(
+    session: Session,
+    user_id: str,
+    status: Optional[str],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+    include_history: bool = False,
+):
+    """Return (query, entity) over the buyer's orders; with history also the archive.
+
+    The history variant is a UNION ALL of both tables with the filters pushed
+    into each branch, mapped back onto ``Order`` so callers sort and page it
+    the same way.
+    """
+    criteria = (user_id, status, created_from, created_to)
+    hot = Order.__table__
+    if not include_history:
+        return session.query(Order).filter(*_buyer_order_conditions(hot, *criteria)), Order
+    cold = ArchivedOrder.__table__
+    names = [column.name for column in hot.columns]
+    union = union_all(
+        select(*[hot.c[name] for name in names]).where(
+            *_buyer_order_conditions(hot, *criteria)
+        ),
+        select(*[cold.c[name] for name in names]).where(
+            *_buyer_order_conditions(cold, *criteria)
+        ),
+    ).subquery("orders_with_history")
+    entity = aliased(Order, union)
+    return session.query(entity), entity
 
 
 def list_orders(
@@ -79,48 +316,403 @@ def list_orders(
     sort_by: str,
     page: int,
     page_size: int,
-) -> Tuple[int, List[Order]]:
-    query = session.query(Order).filter(Order.user_id == user_id)
+    cursor: Optional[str] = None,
+    with_total: bool = False,
+    include_history: bool = False,
+) -> Tuple[Optional[int], List[Order], Optional[str]]:
+    """One page of a buyer's orders plus the cursor of the next page.
+
+    With ``cursor`` the page is read by keyset on (sort column, order_id) and
+    ``page`` is ignored; the total is only counted when ``with_total`` is set.
+    """
+    query, entity = _buyer_orders_query(
+        session, user_id, status, created_from, created_to, include_history
+    )
+
+    total = None
+    if with_total:
+        total = query.with_entities(func.count(entity.order_id)).scalar() or 0
+
+    sort_column = _sort_column(entity, sort_by)
+    query = query.order_by(sort_column.desc(), entity.order_id.desc())
+    if cursor:
+        value, last_id = decode_cursor(sort_by, cursor)
+        query = query.filter(
+            keyset_after(sort_column, entity.order_id, value, last_id)
+        )
+    else:
+        query = query.offset((page - 1) * page_size)
+    orders = query.limit(page_size + 1).all()
+
+    next_cursor = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_cursor = encode_cursor(sort_by, orders[-1])
+    return total, orders, next_cursor
+
+
+def iter_order_chunks(
+    session: Session,
+    user_id: str,
+    status: Optional[str],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+    sort_by: str,
+    chunk_size: int,
+    limit: Optional[int] = None,
+    include_history: bool = False,
+) -> Iterator[List[Order]]:
+    """Yield a buyer's orders in ``list_orders`` order, at most ``chunk_size`` per chunk.
+
+    Each chunk is a separate keyset query, so no cursor stays open between
+    chunks and the session can run other queries (e.g. order items) in between.
+    """
+    query, entity = _buyer_orders_query(
+        session, user_id, status, created_from, created_to, include_history
+    )
+    sort_column = _sort_column(entity, sort_by)
+    query = query.order_by(sort_column.desc(), entity.order_id.desc())
+    remaining = limit
+    last = None
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        chunk_query = query
+        if last is not None:
+            chunk_query = chunk_query.filter(
+                keyset_after(sort_column, entity.order_id, last[0], last[1])
+            )
+        orders = chunk_query.limit(size).all()
+        if not orders:
+            return
+        last = (getattr(orders[-1], sort_column.key), orders[-1].order_id)
+        if remaining is not None:
+            remaining -= len(orders)
+        yield orders
+        if len(orders) < size:
+            return
+
+
+def list_store_orders(
+    session: Session,
+    store_id: str,
+    status: Optional[str],
+    updated_from: Optional[datetime],
+    updated_to: Optional[datetime],
+    page_size: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Order], Optional[str]]:
+    """One page of a store's orders, oldest ``updated_at`` first, plus the next cursor.
+
+    With ``status`` the scan is a range on (store_id, status, updated_at);
+    pages continue by keyset on (updated_at, order_id), never by OFFSET.
+    """
+    query = session.query(Order).filter(Order.store_id == store_id)
     if status:
         query = query.filter(Order.status == status)
-    if created_from:
-        query = query.filter(Order.created_at >= created_from)
-    if created_to:
-        query = query.filter(Order.created_at <= created_to)
+    if updated_from:
+        query = query.filter(Order.updated_at >= updated_from)
+    if updated_to:
+        query = query.filter(Order.updated_at <= updated_to)
+    if cursor:
+        value, last_id = decode_cursor("updated_at", cursor)
+        query = query.filter(
+            keyset_after(
+                Order.updated_at, Order.order_id, value, last_id, descending=False
+            )
+        )
+    orders = (
+        query.order_by(Order.updated_at.asc(), Order.order_id.asc())
+        .limit(page_size + 1)
+        .all()
+    )
 
-    sort_column = Order.updated_at
-    if sort_by == "created_at":
-        sort_column = Order.created_at
-    elif sort_by == "total_price":
-        sort_column = Order.total_price
+    next_cursor = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_cursor = encode_cursor("updated_at", orders[-1])
+    return orders, next_cursor
 
-    total = query.with_entities(func.count()).scalar()
-    orders = (
-        query.order_by(sort_column.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
+
+def sequence_order_events(session: Session, limit: int) -> int:
+    """Number up to ``limit`` committed, unnumbered events in id order after the
+    largest ``seq``; return how many were numbered.
+
+    Only committed rows are visible here, so ``seq`` follows commit order. A
+    concurrent numbering of the same rows fails on the unique ``seq`` index.
+    """
+    pending = list(
+        session.execute(
+            select(OrderEvent.id)
+            .where(OrderEvent.seq.is_(None))
+            .order_by(OrderEvent.id)
+            .limit(limit)
+        ).scalars()
+    )
+    if not pending:
+        return 0
+    last_seq = session.execute(select(func.max(OrderEvent.seq))).scalar() or 0
+    events = OrderEvent.__table__
+    session.execute(
+        update(events)
+        .where(events.c.id == bindparam("b_id"), events.c.seq.is_(None))
+        .values(seq=bindparam("b_seq")),
+        [
+            {"b_id": event_id, "b_seq": last_seq + offset}
+            for offset, event_id in enumerate(pending, start=1)
+        ],
+    )
+    return len(pending)
+
+
+def list_order_events(session: Session, after_seq: int, limit: int) -> List[OrderEvent]:
+    """Numbered events with seq > ``after_seq`` in seq order."""
+    return (
+        session.query(OrderEvent)
+        .filter(OrderEvent.seq > after_seq)
+        .order_by(OrderEvent.seq)
+        .limit(limit)
         .all()
     )
-    return total or 0, orders
+
+
+def purge_order_events(session: Session, cutoff: datetime) -> int:
+    # 保留 seq 最大的一行：编号从现存最大 seq 继续，全部删掉会让编号回到 0、落到消费者游标之后
+    last_seq = session.execute(select(func.max(OrderEvent.seq))).scalar()
+    if last_seq is None:
+        return 0
+    return session.execute(
+        delete(OrderEvent)
+        .where(OrderEvent.created_at < cutoff, OrderEvent.seq < last_seq)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def update_orders_status(
+    session: Session,
+    order_ids: Iterable[str],
+    expected_status: str,
+    new_status: str,
+    **extra_fields,
+) -> int:
+    """Move orders the caller has locked in ``expected_status`` to ``new_status``.
+
+    Raise if any of them has left ``expected_status``: the events could then not
+    be matched to the rows this UPDATE changed.
+    """
+    order_ids = sorted(set(order_ids))
+    if not order_ids:
+        return 0
+    stmt = (
+        update(Order)
+        .where(Order.order_id.in_(order_ids), Order.status == expected_status)
+        .values(status=new_status, **extra_fields)
+    )
+    updated = session.execute(stmt).rowcount
+    if updated != len(order_ids):
+        raise RuntimeError("orders changed while updating status")
+    now = extra_fields.get("updated_at") or datetime.utcnow()
+    _record_transitions(session, order_ids, expected_status, new_status, now)
+    return updated
+
+
+def lock_order_states(
+    session: Session, order_ids: Iterable[str]
+) -> Dict[str, Tuple[str, str]]:
+    """Lock the given orders; map order_id -> (store_id, status) for those that exist."""
+    order_ids = sorted(set(order_ids))
+    if not order_ids:
+        return {}
+    rows = session.execute(
+        select(Order.order_id, Order.store_id, Order.status)
+        .where(Order.order_id.in_(order_ids))
+        .order_by(Order.order_id)
+        .with_for_update()
+    )
+    return {order_id: (store_id, status) for order_id, store_id, status in rows}
+
+
+def ship_store_orders(
+    session: Session, store_id: str, order_ids: Iterable[str], now: datetime
+) -> int:
+    """Flip paid orders of ``store_id`` the caller has locked to shipped with one UPDATE.
+
+    Raise if any of them is no longer a paid order of the store.
+    """
+    order_ids = sorted(set(order_ids))
+    if not order_ids:
+        return 0
+    stmt = (
+        update(Order)
+        .where(
+            Order.order_id.in_(order_ids),
+            Order.store_id == store_id,
+            Order.status == "paid",
+        )
+        .values(status="shipped", shipment_time=now, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    shipped = session.execute(stmt).rowcount
+    if shipped != len(order_ids):
+        raise RuntimeError("orders changed while shipping")
+    _record_transitions(session, order_ids, "paid", "shipped", now, store_id=store_id)
+    return shipped
+
+
+def lock_pending_orders(session: Session, order_ids: Iterable[str]) -> List[str]:
+    """Lock the given orders that are still pending and return their ids."""
+    order_ids = sorted(set(order_ids))
+    if not order_ids:
+        return []
+    stmt = (
+        select(Order.order_id)
+        .where(Order.order_id.in_(order_ids), Order.status == "pending")
+        .order_by(Order.order_id)
+        .with_for_update()
+    )
+    return list(session.execute(stmt).scalars())
 
 
 def find_expired_pending_orders(
-    session: Session, now: datetime, cutoff: Optional[datetime] = None
+    session: Session, now: datetime, limit: Optional[int] = None
 ) -> List[Order]:
-    query = session.query(Order).filter(Order.status == "pending")
-    conditions = [Order.expires_at.isnot(None), Order.expires_at <= now]
-    if cutoff is not None:
-        query = query.filter(
-            or_(
-                and_(Order.expires_at.isnot(None), Order.expires_at <= now),
-                and_(Order.expires_at.is_(None), Order.created_at <= cutoff),
+    """Range scan on (status, expires_at); rows already locked by others are skipped."""
+    query = (
+        session.query(Order)
+        .filter(Order.status == "pending", Order.expires_at <= now)
+        .order_by(Order.expires_at)
+        .with_for_update(skip_locked=True)
+    )
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def backfill_expires_at(session: Session, pending_timeout: int) -> int:
+    """Give legacy pending orders without expires_at a deadline derived from created_at."""
+    rows = session.execute(
+        select(Order.order_id, Order.created_at).where(
+            Order.status == "pending", Order.expires_at.is_(None)
+        )
+    ).all()
+    if not rows:
+        return 0
+    orders = Order.__table__
+    session.execute(
+        update(orders)
+        .where(orders.c.order_id == bindparam("b_order_id"))
+        .values(
+            expires_at=bindparam("b_expires_at"), updated_at=orders.c.updated_at
+        ),
+        [
+            {
+                "b_order_id": order_id,
+                "b_expires_at": created_at + timedelta(seconds=pending_timeout),
+            }
+            for order_id, created_at in rows
+        ],
+    )
+    return len(rows)
+
+
+InventoryKey = Tuple[str, str]
+
+
+def _inventory_keys_clause(keys: Iterable[InventoryKey]):
+    by_store: Dict[str, List[str]] = defaultdict(list)
+    for store_id, book_id in keys:
+        by_store[store_id].append(book_id)
+    return or_(
+        *[
+            and_(
+                Inventory.store_id == store_id,
+                Inventory.book_id.in_(sorted(book_ids)),
             )
+            for store_id, book_ids in sorted(by_store.items())
+        ]
+    )
+
+
+def merge_stock_deltas(
+    store_id: str, items: Iterable[Tuple[str, int]], decrease: bool
+) -> Dict[InventoryKey, int]:
+    deltas: Dict[InventoryKey, int] = {}
+    for book_id, count in items:
+        delta = -int(count) if decrease else int(count)
+        key = (store_id, book_id)
+        deltas[key] = deltas.get(key, 0) + delta
+    return deltas
+
+
+def lock_inventory(
+    session: Session, keys: Iterable[InventoryKey]
+) -> Dict[InventoryKey, Tuple[int, int]]:
+    """Lock the inventory rows in (store_id, book_id) order and return their stock and price."""
+    keys = sorted(set(keys))
+    if not keys:
+        return {}
+    stmt = (
+        select(
+            Inventory.store_id,
+            Inventory.book_id,
+            Inventory.stock_level,
+            Inventory.price,
         )
-    else:
-        query = query.filter(
-            and_(Order.expires_at.isnot(None), Order.expires_at <= now)
+        .where(_inventory_keys_clause(keys))
+        .order_by(Inventory.store_id, Inventory.book_id)
+        .with_for_update()
+    )
+    locked = {}
+    for row in session.execute(stmt):
+        key = (row.store_id, row.book_id)
+        locked[key] = (row.stock_level, row.price)
+        stock_admission.observe(session, key, row.stock_level)
+    return locked
+
+
+def apply_stock_deltas(session: Session, deltas: Dict[InventoryKey, int]) -> int:
+    """Apply every delta with one executemany UPDATE; rows that would go negative are skipped."""
+    if not deltas:
+        return 0
+    inventories = Inventory.__table__
+    delta = bindparam("b_delta")
+    stmt = (
+        update(inventories)
+        .where(
+            inventories.c.store_id == bindparam("b_store_id"),
+            inventories.c.book_id == bindparam("b_book_id"),
+            inventories.c.stock_level + delta >= 0,
         )
-    return query.all()
+        .values(stock_level=inventories.c.stock_level + delta)
+    )
+    updated = session.execute(
+        stmt,
+        [
+            {"b_store_id": store_id, "b_book_id": book_id, "b_delta": change}
+            for (store_id, book_id), change in sorted(deltas.items())
+        ],
+    ).rowcount
+    for key, change in deltas.items():
+        if updated == len(deltas):
+            stock_admission.adjust(session, key, change)
+        else:
+            stock_admission.forget(session, key)
+    return updated
+
+
+def reserve_inventory(
+    session: Session, store_id: str, items: Iterable[Tuple[str, int]]
+) -> Optional[str]:
+    """Decrease stock for all items at once; return the first book that ran short, else None."""
+    items = list(items)
+    deltas = merge_stock_deltas(store_id, items, decrease=True)
+    locked = lock_inventory(session, deltas.keys())
+    for book_id, _ in items:
+        row = locked.get((store_id, book_id))
+        if row is None or row[0] + deltas[(store_id, book_id)] < 0:
+            return book_id
+    if apply_stock_deltas(session, deltas) != len(deltas):
+        raise RuntimeError("inventory changed while reserving stock")
+    return None
 
 
 def adjust_inventory_for_items(
@@ -129,22 +721,7 @@ def adjust_inventory_for_items(
     items: Iterable[Tuple[str, int]],
     decrease: bool = True,
 ) -> bool:
-    for book_id, count in items:
-        inv = (
-            session.query(Inventory)
-            .filter(
-                Inventory.store_id == store_id,
-                Inventory.book_id == book_id,
-            )
-            .with_for_update()
-            .one_or_none()
-        )
-        if inv is None:
-            return False
-        delta = -count if decrease else count
-        new_stock = inv.stock_level + delta
-        if new_stock < 0:
-            return False
-        inv.stock_level = new_stock
-    session.flush()
-    return True
+    if decrease:
+        return reserve_inventory(session, store_id, items) is None
+    deltas = merge_stock_deltas(store_id, items, decrease=False)
+    return apply_stock_deltas(session, deltas) == len(deltas)
@@ -1,10 +1,18 @@
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, select, union_all
 from sqlalchemy.orm import Session
 
-from be.model.models import Book, BookSearchIndex, Inventory, Order, OrderItem
+from be.model.dao.upsert import upsert_rows
+from be.model.models import (
+    Book,
+    BookSales,
+    BookSearchIndex,
+    Inventory,
+    Order,
+    OrderItem,
+)
 
 try:
     from sqlalchemy.dialects.mysql import match as mysql_match
@@ -14,16 +22,13 @@ except ImportError:  # pragma: no cover
 USE_FULLTEXT = mysql_match is not None and os.getenv("BOOKSTORE_DISABLE_FULLTEXT") != "1"
 
 
-def upsert_search_index(session: Session, book_id: str, **kwargs) -> BookSearchIndex:
-    entry = session.get(BookSearchIndex, book_id)
-    if entry is None:
-        entry = BookSearchIndex(book_id=book_id, **kwargs)
-        session.add(entry)
-    else:
-        for key, value in kwargs.items():
-            setattr(entry, key, value)
-    session.flush()
-    return entry
+def upsert_search_index(session: Session, book_id: str, **kwargs) -> None:
+    upsert_rows(session, BookSearchIndex, [dict(kwargs, book_id=book_id)])
+
+
+def bulk_upsert_search_index(session: Session, rows: List[Dict]) -> None:
+    """Insert or overwrite many search index rows with one upsert statement."""
+    upsert_rows(session, BookSearchIndex, rows)
 
 
 def search_books(
@@ -101,15 +106,27 @@ def recommend_by_tags(
     if not normalized_tags:
         return []
 
-    sales_subquery = (
-        session.query(
+    # 热表中的在途/已完成订单 + 归档时汇总进 book_sales 的历史销量
+    hot_sales = (
+        select(
             OrderItem.book_id.label("book_id"),
-            func.sum(OrderItem.count).label("sold_count"),
-            func.sum(OrderItem.count * OrderItem.unit_price).label("sales_amount"),
+            OrderItem.count.label("sold_count"),
+            (OrderItem.count * OrderItem.unit_price).label("sales_amount"),
         )
         .join(Order, OrderItem.order_id == Order.order_id)
-        .filter(Order.status.in_(["paid", "shipped", "delivered"]))
-        .group_by(OrderItem.book_id)
+        .where(Order.status.in_(["paid", "shipped", "delivered"]))
+    )
+    archived_sales = select(
+        BookSales.book_id, BookSales.sold_count, BookSales.sales_amount
+    )
+    all_sales = union_all(hot_sales, archived_sales).subquery("all_sales")
+    sales_subquery = (
+        select(
+            all_sales.c.book_id,
+            func.sum(all_sales.c.sold_count).label("sold_count"),
+            func.sum(all_sales.c.sales_amount).label("sales_amount"),
+        )
+        .group_by(all_sales.c.book_id)
         .subquery()
     )
 
@@ -1,9 +1,11 @@
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Set
 
-from sqlalchemy import update
+from sqlalchemy import bindparam, insert, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from be.model import stock_admission
+from be.model.dao.upsert import upsert_rows
 from be.model.models import Book, Bookstore, Inventory
 
 
@@ -33,16 +35,52 @@ def get_store(session: Session, store_id: str) -> Optional[Bookstore]:
     return session.get(Bookstore, store_id)
 
 
-def upsert_book(session: Session, book_id: str, **kwargs) -> Book:
-    book = session.get(Book, book_id)
-    if book is None:
-        book = Book(book_id=book_id, **kwargs)
-        session.add(book)
-    else:
-        for key, value in kwargs.items():
-            setattr(book, key, value)
-    session.flush()
-    return book
+def get_stores(session: Session, store_ids: Iterable[str]) -> Dict[str, Bookstore]:
+    store_ids = list(set(store_ids))
+    if not store_ids:
+        return {}
+    stores = (
+        session.query(Bookstore).filter(Bookstore.store_id.in_(store_ids)).all()
+    )
+    return {store.store_id: store for store in stores}
+
+
+def upsert_book(session: Session, book_id: str, **kwargs) -> None:
+    upsert_rows(session, Book, [dict(kwargs, book_id=book_id)])
+
+
+def get_inventory_book_ids(
+    session: Session, store_id: str, book_ids: Iterable[str]
+) -> Set[str]:
+    """Subset of ``book_ids`` already listed in ``store_id``."""
+    book_ids = list(set(book_ids))
+    if not book_ids:
+        return set()
+    return set(
+        session.execute(
+            select(Inventory.book_id).where(
+                Inventory.store_id == store_id, Inventory.book_id.in_(book_ids)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+
+def bulk_upsert_books(session: Session, rows: List[Dict]) -> None:
+    """Insert or overwrite many books with one upsert statement."""
+    upsert_rows(session, Book, rows)
+
+
+def bulk_add_inventory(session: Session, rows: List[Dict]) -> None:
+    """Insert many inventory rows with one executemany."""
+    if not rows:
+        return
+    session.execute(insert(Inventory), rows)
+    for row in rows:
+        stock_admission.observe(
+            session, (row["store_id"], row["book_id"]), row["stock_level"]
+        )
 
 
 def add_inventory(
@@ -51,19 +89,16 @@ def add_inventory(
     book_id: str,
     stock_level: int,
     price: int,
-    book_info: Optional[str] = None,
-    search_text: Optional[str] = None,
 ) -> Inventory:
     inventory = Inventory(
         store_id=store_id,
         book_id=book_id,
-        book_info=book_info,
         stock_level=stock_level,
         price=price,
-        search_text=search_text,
     )
     session.add(inventory)
     session.flush()
+    stock_admission.observe(session, (store_id, book_id), stock_level)
     return inventory
 
 
@@ -79,7 +114,35 @@ def increase_stock(
         .values(stock_level=Inventory.stock_level + delta)
     )
     result = session.execute(stmt)
-    return result.rowcount > 0
+    if result.rowcount == 0:
+        return False
+    stock_admission.adjust(session, (store_id, book_id), delta)
+    return True
+
+
+def increase_stocks(session: Session, store_id: str, deltas: Dict[str, int]) -> int:
+    """Add ``book_id -> delta`` to one store's inventory rows with one executemany UPDATE."""
+    if not deltas:
+        return 0
+    inventories = Inventory.__table__
+    stmt = (
+        update(inventories)
+        .where(
+            inventories.c.store_id == bindparam("b_store_id"),
+            inventories.c.book_id == bindparam("b_book_id"),
+        )
+        .values(stock_level=inventories.c.stock_level + bindparam("b_delta"))
+    )
+    result = session.execute(
+        stmt,
+        [
+            {"b_store_id": store_id, "b_book_id": book_id, "b_delta": delta}
+            for book_id, delta in sorted(deltas.items())
+        ],
+    )
+    for book_id, delta in deltas.items():
+        stock_admission.adjust(session, (store_id, book_id), delta)
+    return result.rowcount
 
 
 def get_inventory(
@@ -0,0 +1,59 @@
+"""单条语句的按主键 upsert，供 books / book_search_index 等"存在则覆盖"的写入使用。
+
+MySQL 用 ``INSERT ... ON DUPLICATE KEY UPDATE``，SQLite / PostgreSQL 用
+``INSERT ... ON CONFLICT (pk) DO UPDATE``；多行时走 executemany，由驱动合并为多行 VALUES。
+并发写入同一主键不会因"先查后插"的窗口抛 IntegrityError。
+"""
+from typing import Dict, List
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+_ON_CONFLICT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def upsert_rows(session: Session, model, rows: List[Dict]) -> None:
+    """Insert ``rows`` into ``model``'s table, overwriting the given columns of existing keys."""
+    if not rows:
+        return
+    table = model.__table__
+    pk_names = [column.name for column in table.primary_key.columns]
+    update_names = [name for name in rows[0] if name not in pk_names]
+    # 列上的 onupdate 只在 UPDATE 语句中生效，冲突分支需显式带上插入值里的默认时间
+    if "updated_at" in table.c and "updated_at" not in update_names:
+        update_names.append("updated_at")
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            {name: stmt.inserted[name] for name in update_names}
+        )
+    elif dialect in _ON_CONFLICT_INSERTS:
+        stmt = _ON_CONFLICT_INSERTS[dialect](table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=pk_names,
+            set_={name: stmt.excluded[name] for name in update_names},
+        )
+    else:
+        _upsert_by_lookup(session, model, rows, pk_names)
+        return
+    session.execute(stmt, rows)
+
+
+def _upsert_by_lookup(session: Session, model, rows: List[Dict], pk_names) -> None:
+    """Fallback for other dialects: one IN lookup, then insert/update executemany."""
+    (pk_name,) = pk_names
+    pk = getattr(model, pk_name)
+    existing = set(
+        session.execute(select(pk).where(pk.in_([row[pk_name] for row in rows])))
+        .scalars()
+        .all()
+    )
+    inserts = [row for row in rows if row[pk_name] not in existing]
+    updates = [row for row in rows if row[pk_name] in existing]
+    if inserts:
+        session.execute(insert(model), inserts)
+    if updates:
+        session.execute(update(model), updates)
@@ -1,10 +1,11 @@
+from collections import defaultdict
 from typing import Optional
 
-from sqlalchemy import update
+from sqlalchemy import bindparam, delete, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from be.model.models import User
+from be.model.models import BalanceLedger, User
 
 
 def create_user(
@@ -67,6 +68,16 @@ def revive_user(
     token: str,
     terminal: str,
 ) -> User:
+    """Reactivate a soft-deleted user with a zero balance.
+
+    The old account's unfolded ledger credits are deleted first, in the same
+    transaction, so a later rollup cannot fold them into the new account.
+    """
+    session.execute(
+        delete(BalanceLedger)
+        .where(BalanceLedger.user_id == user.user_id)
+        .execution_options(synchronize_session=False)
+    )
     user.password = password
     user.balance = 0
     user.token = token
@@ -105,12 +116,82 @@ def update_password(
 
 
 def change_balance(session: Session, user_id: str, delta: int) -> bool:
-    user = session.get(User, user_id)
-    if user is None:
-        return False
-    new_balance = user.balance + delta
-    if new_balance < 0:
-        return False
-    user.balance = new_balance
+    """Atomically add ``delta`` to the balance unless it would go negative."""
+    stmt = (
+        update(User)
+        .where(User.user_id == user_id, User.balance + delta >= 0)
+        .values(balance=User.balance + delta)
+    )
+    result = session.execute(stmt)
+    return result.rowcount > 0
+
+
+def credit_ledger(
+    session: Session, user_id: str, amount: int, order_id: Optional[str] = None
+) -> None:
+    session.add(BalanceLedger(user_id=user_id, amount=amount, order_id=order_id))
     session.flush()
-    return True
+
+
+def transfer_balance(
+    session: Session,
+    payer_id: str,
+    payee_id: str,
+    amount: int,
+    order_id: Optional[str] = None,
+) -> Optional[str]:
+    """Debit the payer in place and append the payee's credit to the ledger.
+
+    Returns the user_id whose update failed, or None. The payee's users row
+    is never locked here, so payments to the same seller do not serialize on
+    it; ``rollup_ledger`` folds the credits in later. On failure the caller
+    must roll back.
+    """
+    if not change_balance(session, payer_id, -amount):
+        # 付款方自己尚未折叠的入账也可用于支付
+        if rollup_ledger(session, user_id=payer_id) == 0:
+            return payer_id
+        if not change_balance(session, payer_id, -amount):
+            return payer_id
+    credit_ledger(session, payee_id, amount, order_id)
+    return None
+
+
+def rollup_ledger(
+    session: Session, user_id: Optional[str] = None, limit: Optional[int] = None
+) -> int:
+    """Fold ledger rows into users.balance and delete them; return rows folded."""
+    query = select(BalanceLedger.id, BalanceLedger.user_id, BalanceLedger.amount)
+    if user_id is not None:
+        query = query.where(BalanceLedger.user_id == user_id)
+    query = query.order_by(BalanceLedger.id)
+    if limit is not None:
+        query = query.limit(limit)
+    rows = session.execute(query.with_for_update(skip_locked=True)).all()
+    if not rows:
+        return 0
+
+    totals = defaultdict(int)
+    for _, owner_id, amount in rows:
+        totals[owner_id] += amount
+    ids = [row_id for row_id, _, _ in rows]
+    deleted = session.execute(
+        delete(BalanceLedger)
+        .where(BalanceLedger.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if deleted != len(ids):
+        # 另一事务已折叠了其中部分流水，放弃本批避免重复入账
+        raise RuntimeError("balance ledger rows folded concurrently")
+
+    users = User.__table__
+    session.execute(
+        update(users)
+        .where(users.c.user_id == bindparam("b_user_id"))
+        .values(balance=users.c.balance + bindparam("b_amount")),
+        [
+            {"b_user_id": owner_id, "b_amount": amount}
+            for owner_id, amount in sorted(totals.items())
+        ],
+    )
+    return len(ids)
@@ -1,4 +1,4 @@
-from be.model.sql_conn import session_scope
+from be.model.sql_conn import run_transaction, session_scope
 from be.model.models import User, Inventory, Bookstore
 
 
@@ -8,6 +8,12 @@ class DBConn:
     def __init__(self):
         self.session_scope = session_scope
 
+    def run_transaction(self, name: str, work, max_attempts: int = None):
+        """在 ``self.session_scope`` 中执行 ``work(session)``，死锁/锁等待超时时整体重试。"""
+        return run_transaction(
+            name, work, scope=self.session_scope, max_attempts=max_attempts
+        )
+
     def user_id_exist(self, user_id: str) -> bool:
         with self.session_scope() as session:
             return session.get(User, user_id) is not None
@@ -1,5 +1,7 @@
 error_code = {
     401: "authorization fail.",
+    409: "request with idempotency key {} is still in progress",
+    422: "idempotency key {} was used with a different request",
     511: "non exist user id {}",
     512: "exist user id {}",
     513: "non exist store id {}",
@@ -10,8 +12,8 @@ error_code = {
     518: "invalid order id {}",
     519: "not sufficient funds, order id {}",
     520: "invalid order status, order id {}",
-    521: "",
-    522: "",
+    521: "invalid cursor {}",
+    522: "invalid idempotency key {}",
     523: "",
     524: "",
     525: "",
@@ -61,6 +63,22 @@ def error_invalid_order_status(order_id):
     return 520, error_code[520].format(order_id)
 
 
+def error_invalid_cursor(cursor):
+    return 521, error_code[521].format(cursor)
+
+
+def error_invalid_idempotency_key(key):
+    return 522, error_code[522].format(key)
+
+
+def error_idempotency_key_in_progress(key):
+    return 409, error_code[409].format(key)
+
+
+def error_idempotency_key_reused(key):
+    return 422, error_code[422].format(key)
+
+
 def error_authorization_fail():
     return 401, error_code[401]
 
@@ -0,0 +1,73 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from be.model import error
+from be.model.db_conn import DBConn
+from be.model.dao import order_dao
+
+MAX_EVENTS_PAGE = 1000
+DEFAULT_RETENTION_DAYS = 7
+
+
+def _serialize_event(event) -> Dict:
+    return {
+        "id": event.id,
+        "seq": event.seq,
+        "order_id": event.order_id,
+        "user_id": event.user_id,
+        "store_id": event.store_id,
+        "from_status": event.from_status,
+        "to_status": event.to_status,
+        "created_at": event.created_at.isoformat(),
+    }
+
+
+class OrderEvents(DBConn):
+    """按 seq 顺序读取订单状态变更事件，消费者只需记住上次读到的 seq。"""
+
+    def sequence_events(self, batch_size: int = MAX_EVENTS_PAGE) -> int:
+        """Number committed, unnumbered events in batches; return how many were numbered."""
+        # 自增 id 在插入时分配、提交时才可见，较小的 id 可能晚于较大的 id 提交；
+        # 游标改用提交之后才由 OrderEventSequencer 分配的 seq，读取时只做范围查询
+        total = 0
+        while True:
+            try:
+                with self.session_scope() as session:
+                    numbered = order_dao.sequence_order_events(session, batch_size)
+            except IntegrityError:
+                # 另一个编号者同时提交了同一批编号，下一轮再继续
+                return total
+            total += numbered
+            if numbered < batch_size:
+                return total
+
+    def list_events(
+        self, after: Optional[str], limit: int = 100
+    ) -> Tuple[int, str, Dict]:
+        try:
+            after_id = int(after or 0)
+        except (TypeError, ValueError):
+            return error.error_invalid_cursor(after) + ({},)
+        safe_limit = max(min(limit or 100, MAX_EVENTS_PAGE), 1)
+        try:
+            with self.session_scope() as session:
+                events = order_dao.list_order_events(session, after_id, safe_limit)
+                payload = {
+                    "events": [_serialize_event(event) for event in events],
+                    "next_after": events[-1].seq if events else after_id,
+                }
+            return 200, "ok", payload
+        except BaseException as e:
+            return 530, "{}".format(str(e)), {}
+
+    def purge_expired(self, retention_days: float = None) -> int:
+        if retention_days is None:
+            retention_days = float(
+                os.getenv("BOOKSTORE_EVENTS_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+            )
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        with self.session_scope() as session:
+            return order_dao.purge_order_events(session, cutoff)
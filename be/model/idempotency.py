@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Hashable, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from be.model import metrics
+from be.model.db_conn import DBConn
+from be.model.dao import idempotency_dao
+
+MAX_KEY_LENGTH = 128
+DEFAULT_TTL = 24 * 3600
+# 占位超过这么多秒仍没有响应（进程崩溃、请求提交失败）时，重试可以接管
+DEFAULT_CLAIM_LEASE = 60
+
+# (status_code, response_body)
+StoredResponse = Tuple[int, str]
+
+# IdempotencyStore.claim 的结果
+CLAIMED = "claimed"
+REPLAY = "replay"
+REUSED = "reused"
+IN_PROGRESS = "in_progress"
+
+
+class ResponseCache:
+    """Thread-safe LRU of stored responses with a per-entry time-to-live."""
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = max(int(capacity), 0)
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, StoredResponse]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: StoredResponse) -> None:
+        if self.capacity == 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _ttl_from_env() -> float:
+    return float(os.getenv("BOOKSTORE_IDEMPOTENCY_TTL", DEFAULT_TTL))
+
+
+def _lease_from_env() -> float:
+    return float(os.getenv("BOOKSTORE_IDEMPOTENCY_LEASE", DEFAULT_CLAIM_LEASE))
+
+
+def request_digest(body) -> str:
+    """SHA-256 of a JSON request body, independent of key order."""
+    payload = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cache_key(user_id: str, token: str, endpoint: str, idem_key: str) -> Hashable:
+    # 只有用同一个已验证过的 token 重试才命中缓存，其余请求先验证 token 再查表
+    return user_id, hashlib.sha256(token.encode("utf-8")).hexdigest(), endpoint, idem_key
+
+
+_cache = ResponseCache(
+    capacity=int(os.getenv("BOOKSTORE_IDEMPOTENCY_CACHE_SIZE", "10000")),
+    ttl=_ttl_from_env(),
+)
+
+
+def reset_cache() -> None:
+    _cache.clear()
+
+
+class IdempotencyStore(DBConn):
+    """按 (user_id, endpoint, key) 保存首次响应；进程内 LRU 挡在数据表之前。
+
+    ``user_id`` 必须已经过 token 验证：视图执行前 ``claim`` 先插入占位行，
+    并发的同 key 请求只有一个能执行，其余等首个请求完成后重放它的响应。
+    """
+
+    def cached(
+        self, user_id: str, token: str, endpoint: str, idem_key: str
+    ) -> Optional[Tuple[str, StoredResponse]]:
+        """``(request_hash, response)`` already served to this user and token, if cached."""
+        entry = _cache.get(_cache_key(user_id, token, endpoint, idem_key))
+        if entry is not None:
+            metrics.incr("idempotency.cache_hit")
+        return entry
+
+    def claim(
+        self, user_id: str, token: str, endpoint: str, idem_key: str, request_hash: str
+    ) -> Tuple[str, Optional[StoredResponse]]:
+        """Take the key before running the request.
+
+        Returns ``(CLAIMED, None)`` when this request should run, ``(REPLAY, response)``
+        for a finished request with the same body, ``(REUSED, None)`` when the key was
+        used with another body and ``(IN_PROGRESS, None)`` while the first request runs.
+        """
+        try:
+            with self.session_scope(standalone=True) as session:
+                idempotency_dao.add_claim(
+                    session, user_id, endpoint, idem_key, request_hash
+                )
+            return CLAIMED, None
+        except IntegrityError:
+            pass
+        now = datetime.utcnow()
+        with self.session_scope(standalone=True) as session:
+            record = idempotency_dao.get_record(session, user_id, endpoint, idem_key)
+            if record is None:
+                # 首个请求失败后释放了占位，由客户端再次重试
+                return IN_PROGRESS, None
+            if record.request_hash != request_hash:
+                return REUSED, None
+            if record.status_code is not None:
+                stored = (record.status_code, record.response_body)
+                metrics.incr("idempotency.db_hit")
+                _cache.put(
+                    _cache_key(user_id, token, endpoint, idem_key), (request_hash, stored)
+                )
+                return REPLAY, stored
+            lease_expired = record.created_at <= now - timedelta(
+                seconds=_lease_from_env()
+            )
+            if lease_expired and idempotency_dao.take_over_claim(
+                session, user_id, endpoint, idem_key, record.created_at, now
+            ):
+                metrics.incr("idempotency.takeover")
+                return CLAIMED, None
+        metrics.incr("idempotency.in_progress")
+        return IN_PROGRESS, None
+
+    def complete(
+        self,
+        user_id: str,
+        endpoint: str,
+        idem_key: str,
+        status_code: int,
+        response_body: str,
+    ) -> None:
+        """Store the response in the request's transaction, committing with its writes."""
+        with self.session_scope() as session:
+            if not idempotency_dao.complete_claim(
+                session, user_id, endpoint, idem_key, status_code, response_body
+            ):
+                # 占位已过期被另一个请求接管：本请求的写入随请求事务回滚
+                raise RuntimeError(
+                    "idempotency key {} was taken over by a retry".format(idem_key)
+                )
+
+    def release(self, user_id: str, endpoint: str, idem_key: str) -> None:
+        """Drop the claim of a request that failed, so a retry can run it again."""
+        with self.session_scope(standalone=True) as session:
+            idempotency_dao.release_claim(session, user_id, endpoint, idem_key)
+
+    def purge_expired(self, ttl: float = None) -> int:
+        ttl = _ttl_from_env() if ttl is None else ttl
+        cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+        with self.session_scope() as session:
+            return idempotency_dao.purge_before(session, cutoff)
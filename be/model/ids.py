@@ -0,0 +1,127 @@
+"""64 位时间有序 ID（snowflake），编码为 13 位 Crockford base32 字符串。
+
+布局：41 位毫秒时间戳（自 ``EPOCH_MS`` 起）| 10 位 worker id | 12 位序号。
+定长编码使字符串的字典序与数值序一致，新 ID 总是追加在主键索引末尾。
+"""
+import os
+import threading
+import time
+
+# 2024-01-01T00:00:00Z
+EPOCH_MS = 1704067200000
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+ID_LENGTH = 13
+
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {char: index for index, char in enumerate(_ALPHABET)}
+
+
+def encode(value: int) -> str:
+    chars = []
+    for _ in range(ID_LENGTH):
+        chars.append(_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def decode(text: str) -> int:
+    """Inverse of ``encode``; raise ValueError if ``text`` is not a compact id."""
+    if len(text) != ID_LENGTH:
+        raise ValueError("not a compact id: {}".format(text))
+    value = 0
+    for char in text.upper():
+        if char not in _DECODE:
+            raise ValueError("not a compact id: {}".format(text))
+        value = (value << 5) | _DECODE[char]
+    return value
+
+
+def timestamp_ms(text: str) -> int:
+    """Creation time (unix ms) embedded in a compact id."""
+    return (decode(text) >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS
+
+
+# pre-fork 模式下子进程的序号（0..N-1），由 ``set_worker_index`` 设置
+_worker_index = None
+
+
+def set_worker_index(index: int) -> None:
+    """Give this pre-forked worker process its fork index; ids then use base + index."""
+    global _worker_index
+    if not 0 <= index <= MAX_WORKER_ID:
+        raise ValueError("worker index must be in [0, {}]".format(MAX_WORKER_ID))
+    _worker_index = index
+    _generator.reset_worker()
+
+
+def _default_worker_id() -> int:
+    configured = os.getenv("BOOKSTORE_WORKER_ID")
+    if _worker_index is not None:
+        # 同一台机器上的 N 个 worker 占用 [base, base + N)，多机部署时各机 base 间隔不小于 N
+        base = int(configured) if configured else 0
+        return (base + _worker_index) & MAX_WORKER_ID
+    if configured:
+        return int(configured) & MAX_WORKER_ID
+    return os.getpid() & MAX_WORKER_ID
+
+
+class SnowflakeGenerator:
+    """Thread-safe generator; re-derives the worker id after a fork."""
+
+    def __init__(self, worker_id: int = None):
+        self._fixed_worker_id = worker_id
+        self._lock = threading.Lock()
+        self._pid = None
+        self._worker_id = 0
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _refresh_worker(self) -> None:
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            if self._fixed_worker_id is not None:
+                self._worker_id = self._fixed_worker_id & MAX_WORKER_ID
+            else:
+                self._worker_id = _default_worker_id()
+            self._last_ms = -1
+            self._sequence = 0
+
+    def reset_worker(self) -> None:
+        """Re-derive the worker id on the next call."""
+        with self._lock:
+            self._pid = None
+
+    def next_int(self) -> int:
+        with self._lock:
+            self._refresh_worker()
+            now = int(time.time() * 1000)
+            # 时钟回拨时沿用上一个时间戳继续发号，保证单调
+            now = max(now, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    while now <= self._last_ms:
+                        time.sleep(0.0001)
+                        now = int(time.time() * 1000)
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (
+                ((now - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS))
+                | (self._worker_id << SEQUENCE_BITS)
+                | self._sequence
+            )
+
+    def next_id(self) -> str:
+        return encode(self.next_int())
+
+
+_generator = SnowflakeGenerator()
+
+
+def new_id() -> str:
+    return _generator.next_id()
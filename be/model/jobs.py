@@ -0,0 +1,177 @@
+import logging
+import os
+import threading
+from datetime import timedelta
+from typing import List
+
+from be.model.buyer import Buyer
+from be.model.events import OrderEvents
+from be.model.idempotency import IdempotencyStore
+from be.model.user import User
+
+
+class PeriodicJob(threading.Thread):
+    """Daemon thread that calls ``run_once`` every ``interval`` seconds until stopped."""
+
+    job_name = "periodic-job"
+
+    def __init__(self, interval: float):
+        super().__init__(name=self.job_name, daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error("%s failed: %s", self.job_name, str(e))
+
+    def run_once(self):
+        raise NotImplementedError
+
+    def stop(self, timeout: float = None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+class OrderExpirySweeper(PeriodicJob):
+    """Cancel expired pending orders in bounded batches, one transaction per batch."""
+
+    job_name = "order-expiry"
+
+    def __init__(self, interval: float, batch_size: int):
+        super().__init__(interval)
+        self.batch_size = max(int(batch_size), 1)
+
+    def run_once(self) -> int:
+        buyer = Buyer()
+        total = 0
+        while not self._stop_event.is_set():
+            cancelled = buyer.cancel_expired_orders(limit=self.batch_size)
+            total += cancelled
+            if cancelled < self.batch_size:
+                break
+        return total
+
+
+class BalanceLedgerRollup(PeriodicJob):
+    """Fold seller credits from the balance ledger into users.balance."""
+
+    job_name = "balance-rollup"
+
+    def __init__(self, interval: float, batch_size: int):
+        super().__init__(interval)
+        self.batch_size = max(int(batch_size), 1)
+
+    def run_once(self) -> int:
+        user = User()
+        total = 0
+        while not self._stop_event.is_set():
+            folded = user.settle_balance_ledger(limit=self.batch_size)
+            total += folded
+            if folded < self.batch_size:
+                break
+        return total
+
+
+class IdempotencyKeyPurge(PeriodicJob):
+    """Delete stored idempotent responses older than the key TTL."""
+
+    job_name = "idempotency-purge"
+
+    def run_once(self) -> int:
+        return IdempotencyStore().purge_expired()
+
+
+class OrderEventSequencer(PeriodicJob):
+    """Give committed order events their ``seq`` so /events/orders stays a pure read."""
+
+    job_name = "order-event-sequence"
+
+    def run_once(self) -> int:
+        return OrderEvents().sequence_events()
+
+
+class OrderEventPurge(PeriodicJob):
+    """Delete order events older than the retention window."""
+
+    job_name = "order-event-purge"
+
+    def run_once(self) -> int:
+        return OrderEvents().purge_expired()
+
+
+class OrderArchiver(PeriodicJob):
+    """Move finished orders older than ``older_than`` into the archive tables."""
+
+    job_name = "order-archive"
+
+    def __init__(self, interval: float, older_than: timedelta, batch_size: int):
+        super().__init__(interval)
+        self.older_than = older_than
+        self.batch_size = max(int(batch_size), 1)
+
+    def run_once(self) -> int:
+        buyer = Buyer()
+        total = 0
+        while not self._stop_event.is_set():
+            archived = buyer.archive_orders(self.older_than, limit=self.batch_size)
+            total += archived
+            if archived < self.batch_size:
+                break
+        return total
+
+
+def background_jobs_from_env() -> List[PeriodicJob]:
+    jobs: List[PeriodicJob] = []
+    sweep_interval = float(os.getenv("BOOKSTORE_EXPIRY_SWEEP_INTERVAL", "1"))
+    if sweep_interval > 0:
+        jobs.append(
+            OrderExpirySweeper(
+                interval=sweep_interval,
+                batch_size=int(os.getenv("BOOKSTORE_EXPIRY_SWEEP_BATCH", "200")),
+            )
+        )
+    rollup_interval = float(os.getenv("BOOKSTORE_LEDGER_ROLLUP_INTERVAL", "1"))
+    if rollup_interval > 0:
+        jobs.append(
+            BalanceLedgerRollup(
+                interval=rollup_interval,
+                batch_size=int(os.getenv("BOOKSTORE_LEDGER_ROLLUP_BATCH", "1000")),
+            )
+        )
+    purge_interval = float(os.getenv("BOOKSTORE_IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+    if purge_interval > 0:
+        jobs.append(IdempotencyKeyPurge(interval=purge_interval))
+    sequence_interval = float(os.getenv("BOOKSTORE_EVENTS_SEQUENCE_INTERVAL", "0.5"))
+    if sequence_interval > 0:
+        jobs.append(OrderEventSequencer(interval=sequence_interval))
+    event_purge_interval = float(os.getenv("BOOKSTORE_EVENTS_PURGE_INTERVAL", "3600"))
+    if event_purge_interval > 0:
+        jobs.append(OrderEventPurge(interval=event_purge_interval))
+    archive_interval = float(os.getenv("BOOKSTORE_ARCHIVE_INTERVAL", "600"))
+    if archive_interval > 0:
+        jobs.append(
+            OrderArchiver(
+                interval=archive_interval,
+                older_than=timedelta(
+                    days=float(os.getenv("BOOKSTORE_ARCHIVE_AFTER_DAYS", "30"))
+                ),
+                batch_size=int(os.getenv("BOOKSTORE_ARCHIVE_BATCH", "500")),
+            )
+        )
+    return jobs
+
+
+def start_background_jobs() -> List[PeriodicJob]:
+    jobs = background_jobs_from_env()
+    for job in jobs:
+        job.start()
+    return jobs
+
+
+def stop_background_jobs(jobs: List[PeriodicJob]) -> None:
+    for job in jobs:
+        job.stop(timeout=10)
@@ -0,0 +1,124 @@
+"""进程内计数器与仪表值，经 ``/metrics`` 输出。
+
+pre-fork 模式下每个 worker 进程各有一份：``incr``/``set_gauge`` 只更新本进程内存中的
+字典；调用 ``share_across_processes`` 后，后台线程每隔 ``BOOKSTORE_METRICS_FLUSH_INTERVAL``
+秒（默认 1 秒）把有变化的快照原子地写到共享目录下本进程的文件里，``snapshot()`` 先写出
+本进程的最新值，再合并目录中所有进程的文件——计数器求和，仪表值取最大（仪表值只由运行
+后台任务的那个 worker 设置）。其它 worker 的数值最多落后一个刷新周期。
+"""
+import json
+import os
+import threading
+from typing import Dict, Optional, Union
+
+Number = Union[int, float]
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_counters: Dict[str, Number] = {}
+_gauges: Dict[str, Number] = {}
+_share_path: Optional[str] = None
+_dirty = False
+_flusher_stop: Optional[threading.Event] = None
+
+
+def share_across_processes(directory: Optional[str], name: str = None) -> None:
+    """Publish this process's metrics as ``<directory>/<name>.json``; ``None`` stops sharing."""
+    global _share_path
+    _stop_flusher()
+    with _lock:
+        if directory is None:
+            _share_path = None
+            return
+        _share_path = os.path.join(directory, "{}.json".format(name or os.getpid()))
+        _publish_locked()
+    _start_flusher(
+        float(os.getenv("BOOKSTORE_METRICS_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL))
+    )
+
+
+def _start_flusher(interval: float) -> None:
+    global _flusher_stop
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            flush()
+
+    threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+    _flusher_stop = stop
+
+
+def _stop_flusher() -> None:
+    global _flusher_stop
+    if _flusher_stop is not None:
+        _flusher_stop.set()
+        _flusher_stop = None
+
+
+def _publish_locked() -> None:
+    global _dirty
+    if _share_path is None:
+        return
+    tmp_path = "{}.{}.tmp".format(_share_path, threading.get_ident())
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"counters": _counters, "gauges": _gauges}, f)
+    os.replace(tmp_path, _share_path)
+    _dirty = False
+
+
+def flush() -> None:
+    """Write this process's metrics to the shared directory if they changed."""
+    with _lock:
+        if _dirty:
+            _publish_locked()
+
+
+def incr(name: str, value: Number = 1) -> None:
+    global _dirty
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+        _dirty = True
+
+
+def set_gauge(name: str, value: Number) -> None:
+    global _dirty
+    with _lock:
+        _gauges[name] = value
+        _dirty = True
+
+
+def _merge_shared(directory: str) -> Dict[str, Dict[str, Number]]:
+    counters: Dict[str, Number] = {}
+    gauges: Dict[str, Number] = {}
+    for entry in os.listdir(directory):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, entry), "r", encoding="utf-8") as f:
+                part = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for key, value in part.get("counters", {}).items():
+            counters[key] = counters.get(key, 0) + value
+        for key, value in part.get("gauges", {}).items():
+            gauges[key] = max(gauges.get(key, value), value)
+    return {"counters": counters, "gauges": gauges}
+
+
+def snapshot() -> Dict[str, Dict[str, Number]]:
+    """Return a copy of all counters and gauges, merged across worker processes when shared."""
+    with _lock:
+        if _share_path is None:
+            return {"counters": dict(_counters), "gauges": dict(_gauges)}
+        _publish_locked()
+        directory = os.path.dirname(_share_path)
+    return _merge_shared(directory)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _publish_locked()
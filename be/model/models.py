@@ -34,6 +34,19 @@ class User(Base):
     updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, nullable=False)
 
 
+class BalanceLedger(Base):
+    """待并入 users.balance 的入账流水：付款只追加，不更新卖家的 users 行。"""
+
+    __tablename__ = "balance_ledger"
+    __table_args__ = (Index("idx_ledger_user", "user_id"),)
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(String(128), ForeignKey("users.user_id"), nullable=False)
+    order_id = Column(String(256), nullable=True)
+    amount = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=utcnow, nullable=False)
+
+
 class Bookstore(Base):
     __tablename__ = "bookstores"
 
@@ -82,10 +95,8 @@ class Inventory(Base):
     book_id = Column(
         String(64), ForeignKey("books.book_id"), primary_key=True, nullable=False
     )
-    book_info = Column(Text, nullable=True)
     stock_level = Column(Integer, nullable=False, default=0)
     price = Column(BigInteger, nullable=False, default=0)
-    search_text = Column(Text, nullable=True)
     updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, nullable=False)
 
 
@@ -108,6 +119,13 @@ class Order(Base):
     __table_args__ = (
         Index("idx_order_user_status", "user_id", "status"),
         Index("idx_order_status_updated", "status", "updated_at"),
+        Index("idx_order_status_expires", "status", "expires_at"),
+        # keyset 分页：InnoDB 二级索引隐含主键，相当于 (user_id, col, order_id)
+        Index("idx_order_user_created", "user_id", "created_at"),
+        Index("idx_order_user_updated", "user_id", "updated_at"),
+        Index("idx_order_user_price", "user_id", "total_price"),
+        # 卖家发货队列：store_id + status 等值，updated_at 范围/排序
+        Index("idx_order_store_status_updated", "store_id", "status", "updated_at"),
     )
 
 
@@ -125,6 +143,92 @@ class OrderItem(Base):
     unit_price = Column(BigInteger, nullable=False)
 
 
+class IdempotencyKey(Base):
+    """客户端 Idempotency-Key 对应的首次响应，重试时原样返回。
+
+    执行视图之前先插入一行占住 key（``status_code`` 为空），响应随请求事务写回。
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (Index("idx_idempotency_created", "created_at"),)
+
+    user_id = Column(String(128), primary_key=True)
+    endpoint = Column(String(64), primary_key=True)
+    idem_key = Column(String(128), primary_key=True)
+    # 请求体的 SHA-256，同一个 key 换了请求内容时拒绝
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utcnow, nullable=False)
+
+
+class OrderEvent(Base):
+    """订单状态变更的追加式事件（outbox），与状态更新在同一事务中写入。"""
+
+    __tablename__ = "order_events"
+    __table_args__ = (
+        Index("idx_order_events_created", "created_at"),
+        Index("idx_order_events_seq", "seq", unique=True),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # 提交后才分配的消费序号，为空表示还未编号
+    seq = Column(BigInteger, nullable=True)
+    order_id = Column(String(256), nullable=False)
+    user_id = Column(String(128), nullable=False)
+    store_id = Column(String(128), nullable=False)
+    from_status = Column(String(32), nullable=True)
+    to_status = Column(String(32), nullable=False)
+    created_at = Column(DateTime, default=utcnow, nullable=False)
+
+
+class ArchivedOrder(Base):
+    """已归档的终态订单，列与 ``orders`` 一致，由 OrderArchiver 批量迁入。"""
+
+    __tablename__ = "orders_archive"
+
+    order_id = Column(String(256), primary_key=True)
+    user_id = Column(String(128), nullable=False)
+    store_id = Column(String(128), nullable=False)
+    status = Column(String(32), nullable=False)
+    total_price = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    payment_time = Column(DateTime, nullable=True)
+    shipment_time = Column(DateTime, nullable=True)
+    delivery_time = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    cancelled_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("idx_order_archive_user_created", "user_id", "created_at"),
+        Index("idx_order_archive_user_updated", "user_id", "updated_at"),
+        Index("idx_order_archive_user_price", "user_id", "total_price"),
+    )
+
+
+class ArchivedOrderItem(Base):
+    __tablename__ = "order_items_archive"
+    __table_args__ = (Index("idx_order_items_archive_order", "order_id"),)
+
+    id = Column(BigInteger, primary_key=True)
+    order_id = Column(String(256), nullable=False)
+    book_id = Column(String(64), nullable=False)
+    count = Column(Integer, nullable=False)
+    unit_price = Column(BigInteger, nullable=False)
+
+
+class BookSales(Base):
+    """已归档订单的销量汇总，热表之外的历史销量只从这里读。"""
+
+    __tablename__ = "book_sales"
+
+    book_id = Column(String(64), primary_key=True)
+    sold_count = Column(BigInteger, nullable=False, default=0)
+    sales_amount = Column(BigInteger, nullable=False, default=0)
+
+
 class BookSearchIndex(Base):
     __tablename__ = "book_search_index"
     __table_args__ = (
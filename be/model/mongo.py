@@ -15,6 +15,11 @@ def _get_client() -> MongoClient:
     return MongoClient(uri)
 
 
+def reset_client() -> None:
+    """Forget the cached client so the next call connects afresh (e.g. after fork)."""
+    _get_client.cache_clear()
+
+
 def get_book_collection():
     """Return the Mongo collection storing long text/blob documents."""
     db_name = os.getenv("BOOKSTORE_MONGO_DB", DEFAULT_DB)
@@ -3,6 +3,7 @@ import os
 from typing import Dict, List, Optional, Tuple
 
 from be.model import db_conn
+from be.model.blob_store import listing_book_info, load_book_infos
 from be.model.dao import search_dao
 from script.doubao_client import DoubaoError, recognize_image_text
 
@@ -53,21 +54,17 @@ class Search(db_conn.DBConn):
                     page_size=safe_page_size,
                     sort="updated_at",
                 )
+                infos = load_book_infos(record["book"] for record in records)
                 books: List[Dict] = []
                 for record in records:
                     inv = record["inventory"]
                     book = record["book"]
-                    info_str = getattr(inv, "book_info", "") or "{}"
-                    try:
-                        info = json.loads(info_str)
-                    except (TypeError, ValueError):
-                        info = {}
                     books.append(
                         {
                             "store_id": inv.store_id,
                             "book_id": book.book_id,
                             "stock_level": inv.stock_level,
-                            "book_info": info,
+                            "book_info": listing_book_info(infos, inv),
                         }
                     )
                 payload = {
@@ -134,17 +131,13 @@ class Search(db_conn.DBConn):
                         .filter(Inventory.book_id == target_book_id)
                         .all()
                     )
+                    infos = load_book_infos(book for _, book in rows)
                     for inv, book in rows:
-                        info_str = getattr(inv, "book_info", "") or "{}"
-                        try:
-                            info = json.loads(info_str)
-                        except (TypeError, ValueError):
-                            info = {}
                         unique[book.book_id] = {
                             "store_id": inv.store_id,
                             "book_id": book.book_id,
                             "stock_level": inv.stock_level,
-                            "book_info": info,
+                            "book_info": listing_book_info(infos, inv),
                             "matched_keyword": "cached",
                         }
 
@@ -178,20 +171,16 @@ class Search(db_conn.DBConn):
                     store_id=store_id,
                     limit=safe_limit,
                 )
+                infos = load_book_infos(row.get("book") for row in rows)
                 books: List[Dict] = []
                 for row in rows:
                     inv = row["inventory"]
-                    info_str = getattr(inv, "book_info", "") or "{}"
-                    try:
-                        book_info = json.loads(info_str)
-                    except (TypeError, ValueError):
-                        book_info = {}
                     books.append(
                         {
                             "store_id": inv.store_id,
                             "book_id": inv.book_id,
                             "stock_level": inv.stock_level,
-                            "book_info": book_info,
+                            "book_info": listing_book_info(infos, inv),
                             "matched_tags": row.get("matched_tags", []),
                             "sold_count": row.get("sold_count", 0),
                             "sales_amount": row.get("sales_amount", 0),
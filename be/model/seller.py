@@ -1,9 +1,24 @@
+import base64
 import json
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from be.model import error, db_conn
+from be.model.blob_store import (
+    BLOB_FIELDS,
+    BOOK_INFO_COLUMNS,
+    LONG_TEXT_COLUMNS,
+    get_blob_store,
+    picture_hash,
+)
+from be.model.buyer import serialize_order
 from be.model.dao import user_dao, store_dao, order_dao, search_dao
+from be.model.sql_conn import is_transient_error
+
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_BATCH_SIZE = 5000
 
 
 def _parse_book_info(book_json_str: str) -> Dict:
@@ -56,6 +71,172 @@ def _excerpt(text: Optional[str], limit: int = 512) -> Optional[str]:
     return text if len(text) <= limit else text[:limit]
 
 
+def _extract_pictures(pictures) -> Dict[str, bytes]:
+    """Decode base64 pictures into ``sha256 -> bytes``, keeping their order."""
+    if not isinstance(pictures, list):
+        raise ValueError("pictures must be a list of base64 strings")
+    return {
+        picture_hash(data): data
+        for data in (base64.b64decode(picture, validate=True) for picture in pictures)
+    }
+
+
+def _split_book_info(book_id: str, book_obj: Dict) -> Tuple[Dict, Dict, Dict]:
+    """Split ``book_info`` into books column values, the fields kept in the blob
+    store and the decoded pictures keyed by hash."""
+    columns = {key: book_obj.get(key) for key in BOOK_INFO_COLUMNS}
+    columns["title"] = columns["title"] or book_id
+    columns["price"] = int(columns["price"] or 0)
+    blob = {}
+    for key, column in LONG_TEXT_COLUMNS.items():
+        text = book_obj.get(key)
+        columns[column] = _excerpt(text)
+        if columns[column] != text:
+            blob[key] = text
+    pictures: Dict[str, bytes] = {}
+    if book_obj.get("pictures") is not None:
+        pictures = _extract_pictures(book_obj["pictures"])
+        blob["pictures"] = list(pictures)
+    columns["cover_ref"] = next(iter(pictures), None)
+    for key in BLOB_FIELDS:
+        if key in blob or key in LONG_TEXT_COLUMNS:
+            continue
+        if book_obj.get(key) is not None:
+            blob[key] = book_obj[key]
+    columns["has_external_longtext"] = bool(blob)
+    return columns, blob, pictures
+
+
+def _listing_rows(
+    store_id: str, book_id: str, book_json_str: str, stock_level
+) -> Dict[str, Dict]:
+    """Column values of the books, inventories and search index rows of one listing,
+    plus the blob document holding what does not fit in columns and its pictures."""
+    book_obj = _parse_book_info(book_json_str)
+    _, text_fields = _collect_search_text(book_obj)
+    columns, blob, pictures = _split_book_info(book_id, book_obj)
+    return {
+        "book": dict(columns, book_id=book_id),
+        "inventory": {
+            "store_id": store_id,
+            "book_id": book_id,
+            "stock_level": int(stock_level),
+            "price": columns["price"],
+        },
+        "search": {
+            "book_id": book_id,
+            "title": columns["title"],
+            "subtitle": book_obj.get("sub_title"),
+            "author": book_obj.get("author"),
+            "tags": text_fields.get("tags"),
+            "catalog_excerpt": _excerpt(text_fields.get("catalog")),
+            "intro_excerpt": _excerpt(book_obj.get("book_intro")),
+            "content_excerpt": _excerpt(book_obj.get("content")),
+        },
+        "blob": blob,
+        "pictures": pictures,
+    }
+
+
+def _prepare_listings(store_id: str, entries: List) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """Parse ``batch_add_books`` entries into one result per entry and the listing
+    rows of the valid ones; a book repeated in the entries is reported as existing."""
+    results = []
+    listings: Dict[str, Dict] = {}
+    for entry in entries:
+        payload = entry.get("book_info") if isinstance(entry, dict) else None
+        if not isinstance(payload, dict):
+            results.append({"book_id": None, "code": 530, "message": "invalid book info"})
+            continue
+        book_id = payload.get("id")
+        if not book_id:
+            results.append({"book_id": None, "code": 530, "message": "missing book id"})
+            continue
+        if book_id in listings:
+            code, message = error.error_exist_book_id(book_id)
+            results.append({"book_id": book_id, "code": code, "message": message})
+            continue
+        try:
+            listings[book_id] = _listing_rows(
+                store_id,
+                book_id,
+                json.dumps(payload),
+                entry.get("stock_level", 0),
+            )
+        except (TypeError, ValueError) as e:
+            results.append({"book_id": book_id, "code": 530, "message": f"{e}"})
+            continue
+        results.append({"book_id": book_id, "code": 200, "message": "ok"})
+    return results, listings
+
+
+def _write_listings(
+    session, store_id: str, results: List[Dict], listings: Dict[str, Dict]
+) -> None:
+    """Write the listings not yet in the store with set-based statements; the
+    ones already listed are marked 516 in ``results``, as are rows that fail
+    when the batch is retried row by row after a database error."""
+    listed = store_dao.get_inventory_book_ids(session, store_id, listings)
+    for item in results:
+        if item["code"] == 200 and item["book_id"] in listed:
+            code, message = error.error_exist_book_id(item["book_id"])
+            item.update(code=code, message=message)
+    new_rows = [rows for book_id, rows in listings.items() if book_id not in listed]
+    pictures: Dict[str, bytes] = {}
+    for rows in new_rows:
+        pictures.update(rows["pictures"])
+    get_blob_store().put_pictures(pictures)
+    get_blob_store().put_many(
+        {rows["book"]["book_id"]: rows["blob"] for rows in new_rows if rows["blob"]}
+    )
+    try:
+        with session.begin_nested():
+            _insert_listing_rows(session, new_rows)
+        return
+    except SQLAlchemyError as e:
+        if is_transient_error(e):
+            raise
+    # 整批写入失败（超长字段、并发插入了同一条上架等）：逐行重试，每行一个保存点，
+    # 只有出错的条目记失败，其余照常上架
+    pending = {item["book_id"]: item for item in results if item["code"] == 200}
+    for rows in new_rows:
+        book_id = rows["book"]["book_id"]
+        try:
+            with session.begin_nested():
+                _insert_listing_rows(session, [rows])
+        except IntegrityError:
+            code, message = error.error_exist_book_id(book_id)
+            pending[book_id].update(code=code, message=message)
+        except SQLAlchemyError as e:
+            if is_transient_error(e):
+                raise
+            pending[book_id].update(code=530, message=f"{e}")
+
+
+def _insert_listing_rows(session, new_rows: List[Dict]) -> None:
+    store_dao.bulk_upsert_books(session, [rows["book"] for rows in new_rows])
+    search_dao.bulk_upsert_search_index(session, [rows["search"] for rows in new_rows])
+    # inventories 最后写：库存准入计数只在插入成功后记录
+    store_dao.bulk_add_inventory(session, [rows["inventory"] for rows in new_rows])
+
+
+def _read_import_batches(
+    lines: Iterable[bytes], batch_size: int, resume_from: int
+) -> Iterator[Tuple[List[Tuple[int, bytes]], int]]:
+    """Group the non-blank lines after ``resume_from`` into ``(line_no, line)`` batches,
+    each paired with the number of the last line read; the final batch may be empty."""
+    batch = []
+    line_no = resume_from
+    for line_no, raw in enumerate(lines, start=1):
+        if line_no <= resume_from or not raw.strip():
+            continue
+        batch.append((line_no, raw))
+        if len(batch) >= batch_size:
+            yield batch, line_no
+            batch = []
+    yield batch, max(line_no, resume_from)
+
+
 with open("seller_loaded.marker", "a") as _marker:
     _marker.write("loaded\n")
 
@@ -80,50 +261,15 @@ class Seller(db_conn.DBConn):
             if self.book_id_exist(store_id, book_id):
                 return error.error_exist_book_id(book_id)
 
-            book_obj = _parse_book_info(book_json_str)
-            search_text, text_fields = _collect_search_text(book_obj)
-            price = int(book_obj.get("price") or 0)
-            title = book_obj.get("title") or book_id
-
+            rows = _listing_rows(store_id, book_id, book_json_str, stock_level)
             with self.session_scope() as session:
-                store_dao.upsert_book(
-                    session,
-                    book_id,
-                    title=title,
-                    author=book_obj.get("author"),
-                    publisher=book_obj.get("publisher"),
-                    original_title=book_obj.get("original_title"),
-                    translator=book_obj.get("translator"),
-                    pub_year=book_obj.get("pub_year"),
-                    pages=book_obj.get("pages"),
-                    price=price,
-                    currency_unit=book_obj.get("currency_unit"),
-                    binding=book_obj.get("binding"),
-                    isbn=book_obj.get("isbn"),
-                    intro_excerpt=_excerpt(book_obj.get("book_intro")),
-                    author_excerpt=_excerpt(book_obj.get("author_intro")),
-                    content_excerpt=_excerpt(book_obj.get("content")),
-                )
-                store_dao.add_inventory(
-                    session,
-                    store_id=store_id,
-                    book_id=book_id,
-                    stock_level=int(stock_level),
-                    price=price,
-                    book_info=book_json_str,
-                    search_text=search_text,
-                )
-                search_dao.upsert_search_index(
-                    session,
-                    book_id,
-                    title=title,
-                    subtitle=book_obj.get("sub_title"),
-                    author=book_obj.get("author"),
-                    tags=text_fields.get("tags"),
-                    catalog_excerpt=_excerpt(text_fields.get("catalog")),
-                    intro_excerpt=_excerpt(book_obj.get("book_intro")),
-                    content_excerpt=_excerpt(book_obj.get("content")),
-                )
+                # blob 先于行写入：事务失败只会留下一份无人引用、下次上架会被覆盖的文档
+                if rows["blob"]:
+                    get_blob_store().put_pictures(rows["pictures"])
+                    get_blob_store().put_many({book_id: rows["blob"]})
+                store_dao.upsert_book(session, **rows["book"])
+                store_dao.add_inventory(session, **rows["inventory"])
+                search_dao.upsert_search_index(session, **rows["search"])
             return 200, "ok"
         except Exception as e:
             return 530, f"{e}"
@@ -134,36 +280,20 @@ class Seller(db_conn.DBConn):
         store_id: str,
         books: List[Dict],
     ):
+        """List many books in one transaction with set-based reads and writes.
+
+        Results keep the request order and use the same codes as ``add_book``;
+        a book repeated in the batch is reported as existing after its first entry.
+        """
         try:
+            book_list = books if isinstance(books, list) else []
+            results, listings = _prepare_listings(store_id, book_list)
             if not self.user_id_exist(user_id):
                 return error.error_non_exist_user_id(user_id) + ([],)
             if not self.store_id_exist(store_id):
                 return error.error_non_exist_store_id(store_id) + ([],)
-
-            results = []
-            book_list = books if isinstance(books, list) else []
-            for entry in book_list:
-                payload = entry.get("book_info") if isinstance(entry, dict) else None
-                if not isinstance(payload, dict):
-                    results.append(
-                        {"book_id": None, "code": 530, "message": "invalid book info"}
-                    )
-                    continue
-                book_id = payload.get("id")
-                if not book_id:
-                    results.append(
-                        {"book_id": None, "code": 530, "message": "missing book id"}
-                    )
-                    continue
-                stock_level = entry.get("stock_level", 0)
-                code, message = self.add_book(
-                    user_id,
-                    store_id,
-                    book_id,
-                    json.dumps(payload),
-                    stock_level,
-                )
-                results.append({"book_id": book_id, "code": code, "message": message})
+            with self.session_scope() as session:
+                _write_listings(session, store_id, results, listings)
 
             overall_code = 200
             overall_message = "ok"
@@ -173,6 +303,82 @@ class Seller(db_conn.DBConn):
         except Exception as e:
             return 530, f"{e}", []
 
+    def import_books(
+        self,
+        user_id: str,
+        store_id: str,
+        lines: Iterable[bytes],
+        batch_size: int = IMPORT_BATCH_SIZE,
+        resume_from: int = 0,
+    ) -> Tuple[int, str, Optional[Iterator[str]]]:
+        """校验店铺后返回按批上架、逐批输出 NDJSON 进度的迭代器。
+
+        ``lines`` 逐行消费，内存只随批大小增长；行号不超过 ``resume_from`` 的行直接跳过，
+        客户端用上次收到的 ``committed_line`` 续传。
+        """
+        try:
+            with self.session_scope() as session:
+                store = store_dao.get_store(session, store_id)
+                if store is None:
+                    return error.error_non_exist_store_id(store_id) + (None,)
+                if store.owner_id != user_id:
+                    return error.error_authorization_fail() + (None,)
+        except Exception as e:
+            return 530, f"{e}", None
+        safe_batch_size = max(min(batch_size or IMPORT_BATCH_SIZE, MAX_IMPORT_BATCH_SIZE), 1)
+        progress = self._iter_import(
+            store_id, lines, safe_batch_size, max(resume_from or 0, 0)
+        )
+        return 200, "ok", (json.dumps(item) + "\n" for item in progress)
+
+    def _iter_import(
+        self, store_id: str, lines: Iterable[bytes], batch_size: int, resume_from: int
+    ) -> Iterator[Dict]:
+        committed = resume_from
+        totals = {"ok": 0, "failed": 0}
+        for batch, last_line in _read_import_batches(lines, batch_size, resume_from):
+            if batch:
+                try:
+                    progress = self._commit_import_batch(store_id, batch)
+                except Exception as e:
+                    yield {"code": 530, "message": f"{e}", "committed_line": committed}
+                    return
+                progress["committed_line"] = last_line
+                totals["ok"] += progress["ok"]
+                totals["failed"] += progress["failed"]
+                yield progress
+            committed = last_line
+        yield dict(totals, done=True, committed_line=committed)
+
+    def _commit_import_batch(
+        self, store_id: str, batch: List[Tuple[int, bytes]]
+    ) -> Dict:
+        """List one batch of NDJSON lines in its own transaction; return its progress."""
+        errors = []
+        entries = []
+        entry_lines = []
+        for line_no, raw in batch:
+            try:
+                entries.append(json.loads(raw))
+                entry_lines.append(line_no)
+            except ValueError:
+                errors.append(
+                    {"line": line_no, "book_id": None, "code": 530, "message": "invalid json"}
+                )
+        results, listings = _prepare_listings(store_id, entries)
+        # 迭代发生在视图返回之后，请求级 session 已提交，每批使用独立事务
+        with self.session_scope(standalone=True) as session:
+            _write_listings(session, store_id, results, listings)
+        for line_no, item in zip(entry_lines, results):
+            if item["code"] != 200:
+                errors.append(dict(item, line=line_no))
+        errors.sort(key=lambda item: item["line"])
+        return {
+            "ok": len(batch) - len(errors),
+            "failed": len(errors),
+            "errors": errors,
+        }
+
     def add_stock_level(
         self, user_id: str, store_id: str, book_id: str, add_stock_level: int
     ):
@@ -211,6 +417,68 @@ class Seller(db_conn.DBConn):
         except Exception as e:
             return 530, f"{e}"
 
+    def add_stock_levels(
+        self, user_id: str, store_id: str, items: List[Dict]
+    ) -> Tuple[int, str, List[Dict]]:
+        """Apply many ``{book_id, delta}`` stock changes of one store in one transaction.
+
+        Deltas for the same book are summed. Books not listed in the store are
+        reported per item, as are decreases that would take the stock below zero.
+        """
+        try:
+            if not self.user_id_exist(user_id):
+                return error.error_non_exist_user_id(user_id) + ([],)
+            results = []
+            deltas: Dict[str, int] = {}
+            for entry in items if isinstance(items, list) else []:
+                book_id = entry.get("book_id") if isinstance(entry, dict) else None
+                try:
+                    delta = int(entry["delta"])
+                except (KeyError, TypeError, ValueError):
+                    delta = None
+                if not isinstance(book_id, str) or not book_id or delta is None:
+                    results.append(
+                        {"book_id": book_id, "code": 530, "message": "invalid stock item"}
+                    )
+                    continue
+                if book_id not in deltas:
+                    results.append({"book_id": book_id, "code": 200, "message": "ok"})
+                    deltas[book_id] = 0
+                deltas[book_id] += delta
+
+            with self.session_scope() as session:
+                store = store_dao.get_store(session, store_id)
+                if store is None:
+                    return error.error_non_exist_store_id(store_id) + ([],)
+                if store.owner_id != user_id:
+                    return error.error_authorization_fail() + ([],)
+
+                locked = order_dao.lock_inventory(
+                    session, [(store_id, book_id) for book_id in deltas]
+                )
+                applicable: Dict[str, int] = {}
+                for item in results:
+                    book_id = item["book_id"]
+                    if item["code"] != 200:
+                        continue
+                    row = locked.get((store_id, book_id))
+                    if row is None:
+                        code, message = error.error_non_exist_book_id(book_id)
+                    elif row[0] + deltas[book_id] < 0:
+                        code, message = error.error_stock_level_low(book_id)
+                    else:
+                        applicable[book_id] = deltas[book_id]
+                        continue
+                    item.update(code=code, message=message)
+                store_dao.increase_stocks(session, store_id, applicable)
+
+            message = "ok"
+            if any(item["code"] != 200 for item in results):
+                message = "partial failure"
+            return 200, message, results
+        except Exception as e:
+            return 530, f"{e}", []
+
     def ship_order(self, user_id: str, store_id: str, order_id: str):
         try:
             if not self.user_id_exist(user_id):
@@ -243,3 +511,99 @@ class Seller(db_conn.DBConn):
             return 200, "ok"
         except Exception as e:
             return 530, f"{e}"
+
+    def ship_orders(
+        self, user_id: str, store_id: str, order_ids: List[str]
+    ) -> Tuple[int, str, List[Dict]]:
+        """Ship many paid orders of one store in one transaction and one UPDATE."""
+        try:
+            with self.session_scope() as session:
+                store = store_dao.get_store(session, store_id)
+                if store is None:
+                    return error.error_non_exist_store_id(store_id) + ([],)
+                if store.owner_id != user_id:
+                    return error.error_authorization_fail() + ([],)
+
+                requested = []
+                for order_id in order_ids if isinstance(order_ids, list) else []:
+                    if isinstance(order_id, str) and order_id not in requested:
+                        requested.append(order_id)
+                states = order_dao.lock_order_states(session, requested)
+                results = {}
+                shippable = []
+                for order_id in requested:
+                    state = states.get(order_id)
+                    if state is None:
+                        code, message = error.error_invalid_order_id(order_id)
+                    elif state[0] != store_id:
+                        code, message = error.error_authorization_fail()
+                    elif state[1] != "paid":
+                        code, message = error.error_invalid_order_status(order_id)
+                    else:
+                        shippable.append(order_id)
+                        code, message = 200, "ok"
+                    results[order_id] = {
+                        "order_id": order_id,
+                        "code": code,
+                        "message": message,
+                    }
+
+                order_dao.ship_store_orders(
+                    session, store_id, shippable, datetime.utcnow()
+                )
+
+            results = [results[order_id] for order_id in requested]
+            message = "ok"
+            if any(item["code"] != 200 for item in results):
+                message = "partial failure"
+            return 200, message, results
+        except Exception as e:
+            return 530, f"{e}", []
+
+    def list_store_orders(
+        self,
+        user_id: str,
+        store_id: str,
+        status: Optional[str],
+        updated_from: Optional[datetime] = None,
+        updated_to: Optional[datetime] = None,
+        page_size: int = 20,
+        cursor: Optional[str] = None,
+        include_items: bool = True,
+    ) -> Tuple[int, str, Dict]:
+        try:
+            with self.session_scope() as session:
+                store = store_dao.get_store(session, store_id)
+                if store is None:
+                    return error.error_non_exist_store_id(store_id) + ({},)
+                if store.owner_id != user_id:
+                    return error.error_authorization_fail() + ({},)
+                safe_page_size = max(min(page_size or 20, 100), 1)
+                try:
+                    orders, next_cursor = order_dao.list_store_orders(
+                        session,
+                        store_id=store_id,
+                        status=status,
+                        updated_from=updated_from,
+                        updated_to=updated_to,
+                        page_size=safe_page_size,
+                        cursor=cursor,
+                    )
+                except ValueError:
+                    return error.error_invalid_cursor(cursor) + ({},)
+                items_by_order = {}
+                if include_items:
+                    items_by_order = order_dao.get_items_for_orders(
+                        session, [order.order_id for order in orders]
+                    )
+                payload = {
+                    "page_size": safe_page_size,
+                    "orders": [
+                        serialize_order(order, items_by_order.get(order.order_id))
+                        for order in orders
+                    ],
+                    "next_cursor": next_cursor,
+                }
+            return 200, "ok", payload
+        except Exception as e:
+            return 530, f"{e}", {}
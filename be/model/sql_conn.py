@@ -1,9 +1,19 @@
+import logging
 import os
+import random
+import threading
+import time
 from contextlib import contextmanager
+from typing import Callable, Optional, TypeVar
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from be.model import metrics
+
+T = TypeVar("T")
+
 
 def _get_database_url() -> str:
     url = os.getenv("BOOKSTORE_DB_URL")
@@ -31,8 +41,117 @@ SessionLocal = sessionmaker(
 Base = declarative_base()
 
 
+def dispose_engine_after_fork() -> None:
+    """Drop pooled connections inherited from the parent process without closing them."""
+    engine.dispose(close=False)
+
+
+class RequestUnit:
+    """请求级工作单元：同一个 HTTP 请求内的所有 session_scope 复用同一个 session。"""
+
+    def __init__(self):
+        self.session = None
+        self.failed = False
+        self.checkouts = 0
+        # 本请求 session 已发出的写语句次数（flush 与 DML 各计一次），事务重试据此判断能否整体回滚
+        self.writes = 0
+
+
+_request_local = threading.local()
+
+
+@event.listens_for(engine, "checkout")
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    unit = current_request_unit()
+    if unit is not None:
+        unit.checkouts += 1
+
+
+def _count_request_write(session) -> None:
+    unit = current_request_unit()
+    if unit is not None and session is unit.session:
+        unit.writes += 1
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _count_flush(session, flush_context):
+    _count_request_write(session)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _count_dml(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        _count_request_write(orm_execute_state.session)
+
+
+def current_request_unit() -> Optional[RequestUnit]:
+    return getattr(_request_local, "unit", None)
+
+
+def begin_request_unit() -> RequestUnit:
+    unit = RequestUnit()
+    _request_local.unit = unit
+    return unit
+
+
+def commit_request_unit() -> bool:
+    """Commit the request's transaction unless one of its scopes failed."""
+    unit = current_request_unit()
+    if unit is None or unit.session is None:
+        return True
+    if unit.failed:
+        unit.session.rollback()
+        return True
+    try:
+        unit.session.commit()
+        return True
+    except Exception as e:
+        logging.error("request commit failed: %s", str(e))
+        unit.session.rollback()
+        unit.failed = True
+        return False
+
+
+def end_request_unit() -> Optional[RequestUnit]:
+    """Roll back anything left uncommitted, release the session and detach the unit."""
+    unit = current_request_unit()
+    if unit is None:
+        return None
+    _request_local.unit = None
+    if unit.session is not None:
+        try:
+            unit.session.rollback()
+        finally:
+            unit.session.close()
+            unit.session = None
+    return unit
+
+
+@contextmanager
+def _request_session_scope(unit: RequestUnit):
+    if unit.session is None:
+        unit.session = SessionLocal()
+    try:
+        yield unit.session
+        unit.session.flush()
+    except Exception:
+        unit.failed = True
+        raise
+
+
 @contextmanager
-def session_scope():
+def session_scope(standalone: bool = False):
+    """standalone=True 时不加入请求级工作单元，供响应返回后仍需读库的流式输出使用。"""
+    unit = None if standalone else current_request_unit()
+    if unit is not None:
+        with _request_session_scope(unit) as session:
+            yield session
+        return
+
     session = SessionLocal()
     try:
         yield session
@@ -42,3 +161,76 @@ def session_scope():
         raise
     finally:
         session.close()
+
+
+# MySQL: 1213 = ER_LOCK_DEADLOCK, 1205 = ER_LOCK_WAIT_TIMEOUT
+TRANSIENT_MYSQL_ERRORS = (1213, 1205)
+TX_MAX_ATTEMPTS = int(os.getenv("BOOKSTORE_TX_MAX_ATTEMPTS", "4"))
+TX_BASE_DELAY = float(os.getenv("BOOKSTORE_TX_BASE_DELAY", "0.01"))
+TX_MAX_DELAY = float(os.getenv("BOOKSTORE_TX_MAX_DELAY", "0.2"))
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Deadlock / lock wait timeout: the whole transaction can simply be re-run."""
+    if not isinstance(exc, DBAPIError) or exc.orig is None:
+        return False
+    args = getattr(exc.orig, "args", ())
+    if args and args[0] in TRANSIENT_MYSQL_ERRORS:
+        return True
+    # SQLite 没有死锁检测，写锁冲突表现为 "database is locked"
+    return "database is locked" in str(exc.orig)
+
+
+def _backoff_delay(attempt: int) -> float:
+    # full jitter: uniform(0, min(max, base * 2^attempt))
+    return random.uniform(0, min(TX_MAX_DELAY, TX_BASE_DELAY * (2 ** attempt)))
+
+
+def _request_writes() -> int:
+    unit = current_request_unit()
+    return unit.writes if unit is not None else 0
+
+
+def _reset_for_retry() -> None:
+    unit = current_request_unit()
+    if unit is not None and unit.session is not None:
+        unit.session.rollback()
+        unit.failed = False
+        unit.writes = 0
+
+
+def run_transaction(
+    name: str,
+    work: Callable[..., T],
+    scope: Callable = None,
+    max_attempts: int = None,
+) -> T:
+    """Run ``work(session)`` in a transaction, re-running it on transient lock errors.
+
+    Retries use bounded exponential backoff with full jitter; other errors,
+    and the last transient one, propagate. Inside a request unit the whole
+    request transaction is rolled back before each retry, so a request that
+    already wrote before ``work`` started is not retried: the error propagates
+    as if attempts were exhausted. Counters ``tx.<name>.retry`` and
+    ``tx.<name>.abort`` are kept in ``be.model.metrics``.
+    """
+    scope = scope or session_scope
+    max_attempts = max(max_attempts or TX_MAX_ATTEMPTS, 1)
+    # 回滚会连同 work 之前的写入一起撤销，这种请求不能安全地只重跑 work
+    retryable = _request_writes() == 0
+    attempt = 0
+    while True:
+        try:
+            with scope() as session:
+                return work(session)
+        except Exception as e:
+            attempt += 1
+            if not is_transient_error(e):
+                raise
+            if attempt >= max_attempts or not retryable:
+                metrics.incr("tx.{}.abort".format(name))
+                raise
+            metrics.incr("tx.{}.retry".format(name))
+            logging.warning("%s: transient error, retry %d: %s", name, attempt, e)
+            _reset_for_retry()
+            time.sleep(_backoff_delay(attempt))
@@ -0,0 +1,141 @@
+"""进程内库存准入计数：热点图书售罄后，下单请求不再排队等待库存行锁。
+
+计数只是数据库库存的近似副本，数据库行仍是唯一依据：
+- 锁定库存行时记下读到的库存（``observe``），写库存时记下增量（``adjust``）；
+  这些操作挂在 session 上，事务提交后才生效，回滚时只保留未被本事务改动过的观测值；
+- 每个条目只在 ``ttl`` 秒内可信，过期即视为未知，用于约束其它进程改库存带来的偏差；
+- ``admit`` 只在确知库存不足时拒绝，未知或可能足够时一律放行，由数据库做最终判断。
+
+默认关闭，``BOOKSTORE_STOCK_ADMISSION=1`` 开启。
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from be.model import metrics
+
+InventoryKey = Tuple[str, str]
+
+_SESSION_KEY = "stock_admission_ops"
+
+
+class StockAdmission:
+    """Thread-safe map of (store_id, book_id) -> last known stock level."""
+
+    def __init__(self, enabled: bool, ttl: float):
+        self.enabled = enabled
+        self.ttl = ttl
+        self._levels: Dict[InventoryKey, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def known_level(self, key: InventoryKey) -> Optional[int]:
+        with self._lock:
+            entry = self._levels.get(key)
+            if entry is None:
+                return None
+            seen_at, level = entry
+            if time.monotonic() - seen_at > self.ttl:
+                del self._levels[key]
+                return None
+            return level
+
+    def admit(self, store_id: str, items: Iterable[Tuple[str, int]]) -> Optional[str]:
+        """Return the first book known to be short of stock, else None."""
+        if not self.enabled:
+            return None
+        wanted: Dict[str, int] = {}
+        for book_id, count in items:
+            wanted[book_id] = wanted.get(book_id, 0) + int(count)
+        for book_id, count in wanted.items():
+            level = self.known_level((store_id, book_id))
+            if level is not None and level < count:
+                metrics.incr("stock_admission.rejected")
+                return book_id
+        return None
+
+    def apply(self, ops, committed: bool) -> None:
+        """Apply a finished transaction's ops; after a rollback only untouched observations count."""
+        now = time.monotonic()
+        touched = set()
+        with self._lock:
+            for op, key, value in ops:
+                if op == "add":
+                    touched.add(key)
+                    if not committed:
+                        continue
+                    entry = self._levels.get(key)
+                    if entry is not None:
+                        # 增量不刷新时间戳：条目的可信期从最近一次真实读取算起
+                        self._levels[key] = (entry[0], entry[1] + value)
+                elif op == "set":
+                    if committed or key not in touched:
+                        self._levels[key] = (now, value)
+                elif op == "drop":
+                    touched.add(key)
+                    self._levels.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._levels.clear()
+
+
+def _enabled_from_env() -> bool:
+    return os.getenv("BOOKSTORE_STOCK_ADMISSION", "0") == "1"
+
+
+_admission = StockAdmission(
+    enabled=_enabled_from_env(),
+    ttl=float(os.getenv("BOOKSTORE_STOCK_ADMISSION_TTL", "2")),
+)
+
+
+def configure(enabled: bool = None, ttl: float = None) -> None:
+    if enabled is not None:
+        _admission.enabled = enabled
+    if ttl is not None:
+        _admission.ttl = ttl
+    _admission.clear()
+
+
+def admit(store_id: str, items: Iterable[Tuple[str, int]]) -> Optional[str]:
+    return _admission.admit(store_id, items)
+
+
+def known_level(store_id: str, book_id: str) -> Optional[int]:
+    return _admission.known_level((store_id, book_id))
+
+
+def _record(session: Session, op: str, key: InventoryKey, value: int = 0) -> None:
+    if _admission.enabled:
+        session.info.setdefault(_SESSION_KEY, []).append((op, key, value))
+
+
+def observe(session: Session, key: InventoryKey, stock_level: int) -> None:
+    """Stock level read (under a row lock or just written) in ``session``'s transaction."""
+    _record(session, "set", key, stock_level)
+
+
+def adjust(session: Session, key: InventoryKey, delta: int) -> None:
+    _record(session, "add", key, delta)
+
+
+def forget(session: Session, key: InventoryKey) -> None:
+    _record(session, "drop", key)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    ops = session.info.pop(_SESSION_KEY, None)
+    if ops:
+        _admission.apply(ops, committed=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    ops = session.info.pop(_SESSION_KEY, None)
+    if ops:
+        _admission.apply(ops, committed=False)
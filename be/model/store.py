@@ -1,8 +1,10 @@
 import os
 import threading
 
+from be.model.buyer import Buyer
+from be.model.dao import order_dao
 from be.model.mongo import ensure_indexes
-from be.model.sql_conn import Base, engine
+from be.model.sql_conn import Base, engine, session_scope
 
 # global variable for database sync
 init_completed_event = threading.Event()
@@ -14,3 +16,6 @@ def init_database(_db_path=None):
     if os.getenv("BOOKSTORE_RESET_DB") == "1":
         Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    # 旧订单可能没有 expires_at，补齐后超时扫描只需走 (status, expires_at) 索引
+    with session_scope() as session:
+        order_dao.backfill_expires_at(session, Buyer.pending_timeout)
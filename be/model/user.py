@@ -7,6 +7,7 @@ import jwt
 from jwt import exceptions as jwt_exceptions
 
 from be.model import error
+from be.model import metrics
 from be.model.db_conn import DBConn
 from be.model.dao import user_dao
 
@@ -164,3 +165,11 @@ class User(DBConn):
         except BaseException as e:
             logging.error("change_password error: %s", str(e))
             return 530, "{}".format(str(e))
+
+    def settle_balance_ledger(self, limit: int = None) -> int:
+        """Fold up to ``limit`` pending ledger credits into users.balance."""
+        with self.session_scope() as session:
+            folded = user_dao.rollup_ledger(session, limit=limit)
+        if folded:
+            metrics.incr("balance_ledger.folded", folded)
+        return folded
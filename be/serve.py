@@ -1,21 +1,39 @@
 import logging
+import multiprocessing
 import os
-from flask import Flask, Blueprint
-from werkzeug.serving import make_server
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Blueprint, jsonify
+from werkzeug.serving import BaseWSGIServer, make_server
 import threading
 
 from be.view import auth
 from be.view import seller
 from be.view import buyer
 from be.view import search
+from be.view import metrics
+from be.view import events
+from be.view import book
+from be.model import ids, jobs, mongo, sql_conn
+from be.model import metrics as metrics_registry
 from be.model.store import init_database, init_completed_event
 
 bp_shutdown = Blueprint("shutdown", __name__)
 _stop_event = threading.Event()
+# 多进程模式下由父进程创建，fork 后各 worker 共享，用于跨进程传递关闭信号
+_process_stop_event = None
+
+HOST = "127.0.0.1"
+PORT = 5000
+SERVE_MODES = ("single", "thread", "process")
+DEFAULT_WORKERS = 4
 
 
 def request_shutdown():
     _stop_event.set()
+    if _process_stop_event is not None:
+        _process_stop_event.set()
 
 
 @bp_shutdown.route("/shutdown")
@@ -24,17 +42,152 @@ def be_shutdown():
     return "Server shutting down..."
 
 
+def _begin_request_unit():
+    sql_conn.begin_request_unit()
+
+
+def _commit_request_unit(response):
+    if not sql_conn.commit_request_unit():
+        response = jsonify({"message": "transaction commit failed"})
+        response.status_code = 530
+    unit = sql_conn.current_request_unit()
+    if unit is not None:
+        response.headers["X-DB-Checkouts"] = str(unit.checkouts)
+    return response
+
+
+def _end_request_unit(exc=None):
+    unit = sql_conn.end_request_unit()
+    if unit is not None:
+        logging.debug("db pool checkouts for request: %d", unit.checkouts)
+
+
 def _create_app() -> Flask:
     app = Flask(__name__)
+    app.before_request(_begin_request_unit)
+    app.after_request(_commit_request_unit)
+    app.teardown_request(_end_request_unit)
     app.register_blueprint(bp_shutdown)
     app.register_blueprint(auth.bp_auth)
     app.register_blueprint(seller.bp_seller)
     app.register_blueprint(buyer.bp_buyer)
     app.register_blueprint(search.bp_search)
+    app.register_blueprint(metrics.bp_metrics)
+    app.register_blueprint(events.bp_events)
+    app.register_blueprint(book.bp_book)
     return app
 
 
-def be_run():
+class ThreadPoolWSGIServer(BaseWSGIServer):
+    """WSGI server that dispatches accepted connections to a fixed-size thread pool."""
+
+    multithread = True
+
+    def __init__(self, host, port, app, workers: int, **kwargs):
+        super().__init__(host, port, app, **kwargs)
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="be-worker"
+        )
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+class PreforkWSGIServer(BaseWSGIServer):
+    """WSGI server whose listening socket is non-blocking and shared by forked workers."""
+
+    def server_activate(self):
+        super().server_activate()
+        # 非阻塞监听：多个 worker 同时被 select 唤醒时，没抢到连接的直接返回
+        self.socket.setblocking(False)
+
+    def get_request(self):
+        conn, addr = super().get_request()
+        # 已接受的连接恢复阻塞，否则读请求体/写响应时会抛 BlockingIOError
+        conn.setblocking(True)
+        return conn, addr
+
+
+def _serve_config(mode=None, workers=None):
+    mode = (mode or os.getenv("BOOKSTORE_SERVE_MODE") or "single").lower()
+    if mode not in SERVE_MODES:
+        raise ValueError(
+            "BOOKSTORE_SERVE_MODE must be one of {}, got {}".format(SERVE_MODES, mode)
+        )
+    if workers is None:
+        workers = int(os.getenv("BOOKSTORE_WORKERS", DEFAULT_WORKERS))
+    return mode, max(int(workers), 1)
+
+
+def _serve_until_stopped(server, stop_event):
+    server.timeout = 1
+    while not stop_event.is_set():
+        server.handle_request()
+
+
+def _init_forked_worker(index: int, metrics_dir: str):
+    # 连接池与 Mongo 客户端都不能跨 fork 共享，子进程需重新建立自己的连接
+    sql_conn.dispose_engine_after_fork()
+    mongo.reset_client()
+    # 各 worker 的 snowflake worker id 按 fork 序号区分，同一毫秒内也不会发出相同的订单号
+    ids.set_worker_index(index)
+    # 计数从零开始并写入共享目录，任一 worker 应答的 /metrics 都是所有 worker 的合计
+    metrics_registry.reset()
+    metrics_registry.share_across_processes(metrics_dir, "worker-{}".format(index))
+
+
+def _run_prefork(app, workers: int):
+    global _process_stop_event
+    _process_stop_event = multiprocessing.Event()
+    server = PreforkWSGIServer(HOST, PORT, app)
+
+    metrics_dir = tempfile.mkdtemp(prefix="bookstore-metrics-")
+
+    children = []
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            background_jobs = []
+            try:
+                _init_forked_worker(index, metrics_dir)
+                # 后台任务只在 0 号 worker 中运行，它们的指标与请求指标一起经共享目录合并
+                if index == 0:
+                    background_jobs = jobs.start_background_jobs()
+                _serve_until_stopped(server, _process_stop_event)
+            except BaseException:
+                logging.exception("worker %s crashed", os.getpid())
+                exit_code = 1
+            finally:
+                jobs.stop_background_jobs(background_jobs)
+                metrics_registry.flush()
+                os._exit(exit_code)
+        children.append(pid)
+
+    init_completed_event.set()
+    while not (_stop_event.is_set() or _process_stop_event.is_set()):
+        _process_stop_event.wait(1)
+    _process_stop_event.set()
+    for pid in children:
+        os.waitpid(pid, 0)
+    server.server_close()
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    _process_stop_event = None
+
+
+def be_run(mode=None, workers=None):
     this_path = os.path.dirname(__file__)
     parent_path = os.path.dirname(this_path)
     log_file = os.path.join(parent_path, "app.log")
@@ -48,10 +201,21 @@ def be_run():
     handler.setFormatter(formatter)
     logging.getLogger().addHandler(handler)
 
+    mode, workers = _serve_config(mode, workers)
     app = _create_app()
-    server = make_server("127.0.0.1", 5000, app)
-    server.timeout = 1
     _stop_event.clear()
+    if mode == "process":
+        _run_prefork(app, workers)
+        return
+
+    if mode == "thread":
+        server = ThreadPoolWSGIServer(HOST, PORT, app, workers=workers)
+    else:
+        server = make_server(HOST, PORT, app)
+    background_jobs = jobs.start_background_jobs()
     init_completed_event.set()
-    while not _stop_event.is_set():
-        server.handle_request()
+    try:
+        _serve_until_stopped(server, _stop_event)
+    finally:
+        jobs.stop_background_jobs(background_jobs)
+        server.server_close()
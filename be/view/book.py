@@ -0,0 +1,44 @@
+import re
+
+from flask import Blueprint, Response, jsonify, request
+
+from be.model.blob_store import get_blob_store
+
+bp_book = Blueprint("book", __name__, url_prefix="/book")
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+# 内容寻址：同一地址的字节永远不变，客户端与 CDN 可无限期缓存
+_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+def _mimetype(data: bytes) -> str:
+    for signature, mimetype in _SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+@bp_book.route("/picture/<digest>", methods=["GET"])
+def get_picture(digest):
+    if not _HASH_RE.match(digest):
+        return jsonify({"message": "picture not found"}), 404
+    etag = '"{}"'.format(digest)
+    headers = {"Cache-Control": _CACHE_CONTROL, "ETag": etag}
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+    try:
+        data = get_blob_store().get_picture(digest)
+    except Exception as e:
+        return jsonify({"message": "{}".format(str(e))}), 530
+    if data is None:
+        return jsonify({"message": "picture not found"}), 404
+    return Response(data, mimetype=_mimetype(data), headers=headers)
@@ -1,7 +1,9 @@
 from datetime import datetime
 
 from flask import Blueprint, Response, jsonify, request
+from be.model import error
 from be.model.buyer import Buyer
+from be.view.idempotency import idempotent
 
 bp_buyer = Blueprint("buyer", __name__, url_prefix="/buyer")
 
@@ -15,7 +17,21 @@ def _parse_time(value):
         return None
 
 
+_EXPORT_MIMETYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _parse_bool(value, default=True):
+    if value is None or value == "":
+        return default
+    return str(value).lower() not in ("0", "false", "no", "off")
+
+
 @bp_buyer.route("/new_order", methods=["POST"])
+@idempotent("new_order")
 def new_order():
     user_id: str = request.json.get("user_id")
     store_id: str = request.json.get("store_id")
@@ -31,7 +47,53 @@ def new_order():
     return jsonify({"message": message, "order_id": order_id}), code
 
 
+def _parse_basket(orders):
+    """Validate ``[{store_id, books: [{id, count}]}]``; return ``(error, groups)``."""
+    if not isinstance(orders, list):
+        return error.error_and_message(400, "orders must be a list"), []
+    groups = []
+    for group in orders:
+        if not isinstance(group, dict):
+            return error.error_and_message(400, "each order must be an object"), []
+        store_id = group.get("store_id")
+        if not isinstance(store_id, str) or not store_id:
+            return error.error_non_exist_store_id(store_id), []
+        books = group.get("books") or []
+        if not isinstance(books, list):
+            return error.error_and_message(400, "books must be a list"), []
+        id_and_count = []
+        for book in books:
+            book_id = book.get("id") if isinstance(book, dict) else None
+            if not isinstance(book_id, str) or not book_id:
+                return error.error_non_exist_book_id(book_id), []
+            count = book.get("count")
+            if isinstance(count, bool) or not isinstance(count, int):
+                return (
+                    error.error_and_message(400, "invalid count for book id {}".format(book_id)),
+                    [],
+                )
+            id_and_count.append((book_id, count))
+        groups.append((store_id, id_and_count))
+    return None, groups
+
+
+@bp_buyer.route("/new_orders", methods=["POST"])
+def new_orders():
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    user_id: str = body.get("user_id")
+    err, groups = _parse_basket(body.get("orders") or [])
+    if err is not None:
+        code, message = err
+        return jsonify({"message": message, "orders": []}), code
+
+    b = Buyer()
+    code, message, orders = b.new_orders(user_id, groups)
+    return jsonify({"message": message, "orders": orders}), code
+
+
 @bp_buyer.route("/payment", methods=["POST"])
+@idempotent("payment")
 def payment():
     user_id: str = request.json.get("user_id")
     order_id: str = request.json.get("order_id")
@@ -85,9 +147,23 @@ def list_orders():
     created_from = _parse_time(request.args.get("created_from"))
     created_to = _parse_time(request.args.get("created_to"))
     sort_by = request.args.get("sort_by", "updated_at")
+    include_items = _parse_bool(request.args.get("include_items"))
+    cursor = request.args.get("cursor")
+    include_total = _parse_bool(request.args.get("include_total"), default=False)
+    include_history = _parse_bool(request.args.get("include_history"), default=False)
     b = Buyer()
     code, message, payload = b.list_orders(
-        user_id, status, page, page_size, created_from, created_to, sort_by
+        user_id,
+        status,
+        page,
+        page_size,
+        created_from,
+        created_to,
+        sort_by,
+        include_items=include_items,
+        cursor=cursor,
+        include_total=include_total,
+        include_history=include_history,
     )
     response = {"message": message}
     if code == 200:
@@ -102,11 +178,13 @@ def export_orders():
     sort_by = request.args.get("sort_by", "updated_at")
     fmt = (request.args.get("format") or "json").lower()
     try:
-        limit = int(request.args.get("limit", 500))
+        limit = int(request.args.get("limit", 0))
     except (TypeError, ValueError):
-        limit = 500
+        limit = 0
     created_from = _parse_time(request.args.get("created_from"))
     created_to = _parse_time(request.args.get("created_to"))
+    include_items = _parse_bool(request.args.get("include_items"))
+    include_history = _parse_bool(request.args.get("include_history"), default=False)
 
     b = Buyer()
     code, message, data = b.export_orders(
@@ -117,12 +195,13 @@ def export_orders():
         sort_by=sort_by,
         fmt=fmt,
         limit=limit,
+        include_items=include_items,
+        include_history=include_history,
     )
     if code != 200 or data is None:
         return jsonify({"message": message}), code
+    fmt = data["format"]
+    response = Response(data["chunks"], mimetype=_EXPORT_MIMETYPES[fmt])
     if fmt == "csv":
-        content = data.get("content", "")
-        response = Response(content, mimetype="text/csv")
         response.headers["Content-Disposition"] = "attachment; filename=orders.csv"
-        return response
-    return jsonify({"message": message, "orders": data.get("orders", [])}), 200
+    return response
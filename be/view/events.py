@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify, request
+
+from be.model.events import OrderEvents
+
+bp_events = Blueprint("events", __name__, url_prefix="/events")
+
+
+@bp_events.route("/orders", methods=["GET"])
+def list_order_events():
+    after = request.args.get("after")
+    try:
+        limit = int(request.args.get("limit", 100))
+    except (TypeError, ValueError):
+        limit = 100
+    code, message, payload = OrderEvents().list_events(after, limit)
+    response = {"message": message}
+    if code == 200:
+        response.update(payload)
+    return jsonify(response), code
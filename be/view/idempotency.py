@@ -0,0 +1,96 @@
+import functools
+
+from flask import Response, jsonify, make_response, request
+
+from be.model import error
+from be.model.idempotency import (
+    IN_PROGRESS,
+    MAX_KEY_LENGTH,
+    REPLAY,
+    REUSED,
+    IdempotencyStore,
+    request_digest,
+)
+from be.model.user import User
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def _replay(stored) -> Response:
+    status_code, body = stored
+    response = Response(body, status=status_code, mimetype="application/json")
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _error(code_and_message):
+    code, message = code_and_message
+    return jsonify({"message": message}), code
+
+
+def idempotent(endpoint: str):
+    """带 Idempotency-Key 的重试直接返回首次响应，不再执行视图。
+
+    key 归属于 ``token`` 请求头验证过的用户；视图执行前先占住 key，首次响应与业务写入
+    处于同一个请求事务中提交。同一个 key 换了请求体返回 422，首个请求尚未完成时返回 409；
+    530 视为可重试，释放占位、不做记录。
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            idem_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not idem_key:
+                return view(*args, **kwargs)
+            if len(idem_key) > MAX_KEY_LENGTH:
+                return _error(error.error_invalid_idempotency_key(idem_key))
+
+            body = request.get_json(silent=True)
+            user_id = body.get("user_id") if isinstance(body, dict) else None
+            token = request.headers.get("token") or ""
+            if not isinstance(user_id, str) or not user_id:
+                return _error(error.error_authorization_fail())
+            request_hash = request_digest(body)
+            store = IdempotencyStore()
+            cached = store.cached(user_id, token, endpoint, idem_key)
+            if cached is not None:
+                cached_hash, stored = cached
+                if cached_hash != request_hash:
+                    return _error(error.error_idempotency_key_reused(idem_key))
+                return _replay(stored)
+
+            code, message = User().check_token(user_id, token)
+            if code != 200:
+                return _error((code, message))
+            state, stored = store.claim(user_id, token, endpoint, idem_key, request_hash)
+            if state == REPLAY:
+                return _replay(stored)
+            if state == REUSED:
+                return _error(error.error_idempotency_key_reused(idem_key))
+            if state == IN_PROGRESS:
+                return _error(error.error_idempotency_key_in_progress(idem_key))
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                store.release(user_id, endpoint, idem_key)
+                raise
+            if response.status_code == 530:
+                store.release(user_id, endpoint, idem_key)
+                return response
+            try:
+                store.complete(
+                    user_id,
+                    endpoint,
+                    idem_key,
+                    response.status_code,
+                    response.get_data(as_text=True),
+                )
+            except Exception as e:
+                return jsonify({"message": "{}".format(e)}), 530
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,12 @@
+from flask import Blueprint, jsonify
+
+from be.model import metrics
+
+bp_metrics = Blueprint("metrics", __name__)
+
+
+@bp_metrics.route("/metrics", methods=["GET"])
+def get_metrics():
+    payload = {"message": "ok"}
+    payload.update(metrics.snapshot())
+    return jsonify(payload), 200
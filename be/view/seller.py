@@ -1,7 +1,10 @@
 from flask import Blueprint
+from flask import Response
 from flask import request
 from flask import jsonify
+from flask import stream_with_context
 from be.model import seller
+from be.view.buyer import _parse_bool, _parse_time
 import json
 
 bp_seller = Blueprint("seller", __name__, url_prefix="/seller")
@@ -44,6 +47,18 @@ def add_stock_level():
     return jsonify({"message": message}), code
 
 
+@bp_seller.route("/add_stock_levels", methods=["POST"])
+def add_stock_levels():
+    payload = request.json or {}
+    user_id: str = payload.get("user_id")
+    store_id: str = payload.get("store_id")
+    items = payload.get("items") or []
+
+    s = seller.Seller()
+    code, message, results = s.add_stock_levels(user_id, store_id, items)
+    return jsonify({"message": message, "results": results}), code
+
+
 @bp_seller.route("/ship_order", methods=["POST"])
 def ship_order():
     user_id: str = request.json.get("user_id")
@@ -56,6 +71,18 @@ def ship_order():
     return jsonify({"message": message}), code
 
 
+@bp_seller.route("/ship_orders", methods=["POST"])
+def ship_orders():
+    payload = request.json or {}
+    user_id: str = payload.get("user_id")
+    store_id: str = payload.get("store_id")
+    order_ids = payload.get("order_ids") or []
+
+    s = seller.Seller()
+    code, message, results = s.ship_orders(user_id, store_id, order_ids)
+    return jsonify({"message": message, "results": results}), code
+
+
 @bp_seller.route("/batch_add_books", methods=["POST"])
 def batch_add_books():
     payload = request.json or {}
@@ -67,3 +94,57 @@ def batch_add_books():
     code, message, results = s.batch_add_books(user_id, store_id, books)
     response = {"message": message, "results": results}
     return jsonify(response), code
+
+
+@bp_seller.route("/import", methods=["POST"])
+def import_books():
+    user_id = request.args.get("user_id")
+    store_id = request.args.get("store_id")
+    try:
+        batch_size = int(request.args.get("batch_size", seller.IMPORT_BATCH_SIZE))
+    except (TypeError, ValueError):
+        batch_size = seller.IMPORT_BATCH_SIZE
+    try:
+        resume_from = int(request.args.get("resume_from", 0))
+    except (TypeError, ValueError):
+        resume_from = 0
+
+    s = seller.Seller()
+    # 请求体不经 request.json 整体解析，进度在读取请求体的同时输出
+    code, message, chunks = s.import_books(
+        user_id, store_id, request.stream, batch_size, resume_from
+    )
+    if code != 200:
+        return jsonify({"message": message}), code
+    return Response(stream_with_context(chunks), mimetype="application/x-ndjson")
+
+
+@bp_seller.route("/orders", methods=["GET"])
+def list_store_orders():
+    user_id = request.args.get("user_id")
+    store_id = request.args.get("store_id")
+    status = request.args.get("status")
+    try:
+        page_size = int(request.args.get("page_size", 20))
+    except (TypeError, ValueError):
+        page_size = 20
+    updated_from = _parse_time(request.args.get("updated_from"))
+    updated_to = _parse_time(request.args.get("updated_to"))
+    include_items = _parse_bool(request.args.get("include_items"))
+    cursor = request.args.get("cursor")
+
+    s = seller.Seller()
+    code, message, payload = s.list_store_orders(
+        user_id,
+        store_id,
+        status,
+        updated_from=updated_from,
+        updated_to=updated_to,
+        page_size=page_size,
+        cursor=cursor,
+        include_items=include_items,
+    )
+    response = {"message": message}
+    if code == 200:
+        response.update(payload)
+    return jsonify(response), code
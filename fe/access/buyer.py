@@ -15,7 +15,12 @@ class Buyer:
         code, self.token = self.auth.login(self.user_id, self.password, self.terminal)
         assert code == 200
 
-    def new_order(self, store_id: str, book_id_and_count: [(str, int)]) -> (int, str):
+    def new_order(
+        self,
+        store_id: str,
+        book_id_and_count: [(str, int)],
+        idempotency_key: str = "",
+    ) -> (int, str):
         books = []
         for id_count_pair in book_id_and_count:
             books.append({"id": id_count_pair[0], "count": id_count_pair[1]})
@@ -23,11 +28,27 @@ class Buyer:
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "new_order")
         headers = {"token": self.token}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
         r = requests.post(url, headers=headers, json=json)
         response_json = r.json()
         return r.status_code, response_json.get("order_id")
 
-    def payment(self, order_id: str):
+    def new_orders(self, groups: [(str, [(str, int)])]) -> (int, list):
+        orders = []
+        for store_id, book_id_and_count in groups:
+            books = [
+                {"id": book_id, "count": count}
+                for book_id, count in book_id_and_count
+            ]
+            orders.append({"store_id": store_id, "books": books})
+        json = {"user_id": self.user_id, "orders": orders}
+        url = urljoin(self.url_prefix, "new_orders")
+        headers = {"token": self.token}
+        r = requests.post(url, headers=headers, json=json)
+        return r.status_code, r.json().get("orders")
+
+    def payment(self, order_id: str, idempotency_key: str = ""):
         json = {
             "user_id": self.user_id,
             "password": self.password,
@@ -35,6 +56,8 @@ class Buyer:
         }
         url = urljoin(self.url_prefix, "payment")
         headers = {"token": self.token}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
         r = requests.post(url, headers=headers, json=json)
         return r.status_code
 
@@ -76,6 +99,10 @@ class Buyer:
         created_from: str = "",
         created_to: str = "",
         sort_by: str = "updated_at",
+        include_items: bool = True,
+        cursor: str = "",
+        include_total: bool = False,
+        include_history: bool = False,
     ) -> (int, dict):
         params = {
             "user_id": self.user_id,
@@ -83,6 +110,14 @@ class Buyer:
             "page_size": page_size,
             "sort_by": sort_by,
         }
+        if not include_items:
+            params["include_items"] = "false"
+        if cursor:
+            params["cursor"] = cursor
+        if include_total:
+            params["include_total"] = "true"
+        if include_history:
+            params["include_history"] = "true"
         if status:
             params["status"] = status
         if created_from:
@@ -101,14 +136,18 @@ class Buyer:
         created_to: str = "",
         sort_by: str = "updated_at",
         fmt: str = "json",
-        limit: int = 500,
+        limit: int = 0,
+        include_history: bool = False,
     ):
         params = {
             "user_id": self.user_id,
             "format": fmt,
             "sort_by": sort_by,
-            "limit": limit,
         }
+        if limit:
+            params["limit"] = limit
+        if include_history:
+            params["include_history"] = "true"
         if status:
             params["status"] = status
         if created_from:
@@ -118,6 +157,6 @@ class Buyer:
         url = urljoin(self.url_prefix, "orders/export")
         headers = {"token": self.token}
         r = requests.get(url, headers=headers, params=params)
-        if fmt == "csv":
+        if fmt in ("csv", "ndjson"):
             return r.status_code, r.text
         return r.status_code, r.json()
@@ -1,3 +1,4 @@
+import json as jsonlib
 import requests
 from urllib.parse import urljoin
 from fe.access import book
@@ -53,6 +54,40 @@ class Seller:
         r = requests.post(url, headers=headers, json=json)
         return r.status_code
 
+    def add_stock_levels(self, store_id: str, items: list) -> (int, dict):
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "items": items,
+        }
+        url = urljoin(self.url_prefix, "add_stock_levels")
+        headers = {"token": self.token}
+        r = requests.post(url, headers=headers, json=json)
+        return r.status_code, r.json()
+
+    def import_books(
+        self, store_id: str, lines, batch_size: int = None, resume_from: int = 0
+    ) -> (int, list):
+        """Upload ``lines`` (dicts or raw strings) as chunked NDJSON; return the progress lines."""
+        params = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "resume_from": resume_from,
+        }
+        if batch_size is not None:
+            params["batch_size"] = batch_size
+        body = (
+            (line if isinstance(line, str) else jsonlib.dumps(line)).encode("utf-8")
+            + b"\n"
+            for line in lines
+        )
+        url = urljoin(self.url_prefix, "import")
+        headers = {"token": self.token, "Content-Type": "application/x-ndjson"}
+        r = requests.post(url, headers=headers, params=params, data=body, stream=True)
+        if r.status_code != 200:
+            return r.status_code, [r.json()]
+        return r.status_code, [jsonlib.loads(line) for line in r.iter_lines() if line]
+
     def ship_order(self, store_id: str, order_id: str) -> int:
         json = {
             "user_id": self.seller_id,
@@ -64,6 +99,17 @@ class Seller:
         r = requests.post(url, headers=headers, json=json)
         return r.status_code
 
+    def ship_orders(self, store_id: str, order_ids: list) -> (int, dict):
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "order_ids": order_ids,
+        }
+        url = urljoin(self.url_prefix, "ship_orders")
+        headers = {"token": self.token}
+        r = requests.post(url, headers=headers, json=json)
+        return r.status_code, r.json()
+
     def batch_add_books(self, store_id: str, books: list) -> (int, dict):
         json = {
             "user_id": self.seller_id,
@@ -74,3 +120,33 @@ class Seller:
         headers = {"token": self.token}
         r = requests.post(url, headers=headers, json=json)
         return r.status_code, r.json()
+
+    def list_orders(
+        self,
+        store_id: str,
+        status: str = "",
+        updated_from: str = "",
+        updated_to: str = "",
+        page_size: int = 20,
+        cursor: str = "",
+        include_items: bool = True,
+    ) -> (int, dict):
+        params = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "page_size": page_size,
+        }
+        if status:
+            params["status"] = status
+        if updated_from:
+            params["updated_from"] = updated_from
+        if updated_to:
+            params["updated_to"] = updated_to
+        if cursor:
+            params["cursor"] = cursor
+        if not include_items:
+            params["include_items"] = "false"
+        url = urljoin(self.url_prefix, "orders")
+        headers = {"token": self.token}
+        r = requests.get(url, headers=headers, params=params)
+        return r.status_code, r.json()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Measure single-client new_order latency for orders with several lines.
+
+The script creates a scratch seller, store and buyer through the models (no
+HTTP), lists ``--books`` books, then places ``--orders`` orders that each
+take one copy of every book and reports the p50 / p99 latency of
+``Buyer.new_order``.
+"""
+import argparse
+import json
+import time
+import uuid
+
+from be.model.buyer import Buyer
+from be.model.seller import Seller
+from be.model.user import User
+
+
+def _setup(n_books: int, n_orders: int):
+    suffix = uuid.uuid4().hex[:12]
+    seller_id = f"bench_lat_seller_{suffix}"
+    buyer_id = f"bench_lat_buyer_{suffix}"
+    store_id = f"bench_lat_store_{suffix}"
+    for user_id in (seller_id, buyer_id):
+        code, message = User().register(user_id, user_id)
+        assert code == 200, message
+    seller = Seller()
+    code, message = seller.create_store(seller_id, store_id)
+    assert code == 200, message
+    book_ids = []
+    for i in range(n_books):
+        book_id = f"bench_lat_book_{suffix}_{i}"
+        info = {"id": book_id, "title": f"Latency {i}", "price": 100 + i}
+        code, message = seller.add_book(
+            seller_id, store_id, book_id, json.dumps(info), n_orders + 1
+        )
+        assert code == 200, message
+        book_ids.append(book_id)
+    return buyer_id, store_id, book_ids
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run(n_books: int, n_orders: int, warmup: int = 20):
+    buyer_id, store_id, book_ids = _setup(n_books, n_orders + warmup)
+    lines = [(book_id, 1) for book_id in book_ids]
+    buyer = Buyer()
+    latencies = []
+    for i in range(warmup + n_orders):
+        start = time.perf_counter()
+        code, message, _ = buyer.new_order(buyer_id, store_id, lines)
+        elapsed = time.perf_counter() - start
+        assert code == 200, message
+        if i >= warmup:
+            latencies.append(elapsed)
+    return {
+        "books": n_books,
+        "orders": n_orders,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--orders", type=int, default=500)
+    args = parser.parse_args()
+
+    for n_books in args.books:
+        result = run(n_books, args.orders)
+        print(
+            "books {books:3d}  orders {orders:5d}  "
+            "p50 {p50_ms:7.2f} ms  p99 {p99_ms:7.2f} ms".format(**result)
+        )
+
+
+if __name__ == "__main__":
+    main()
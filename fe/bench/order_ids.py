@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Compare insert rate and table/index size of legacy vs compact order ids.
+
+For each id scheme the script creates scratch copies of ``orders`` and
+``order_items`` (same columns and secondary indexes, no foreign keys),
+inserts ``--orders`` orders with ``--items`` lines each in batches, and
+reports rows/s plus data and index size as reported by the database.
+The scratch tables are dropped afterwards.
+"""
+import argparse
+import time
+import uuid
+
+from sqlalchemy import (
+    Column,
+    Index,
+    MetaData,
+    Table,
+    UniqueConstraint,
+    insert,
+    text,
+)
+
+from be.model import ids
+from be.model.models import Order, OrderItem
+from be.model.sql_conn import engine
+
+
+def _legacy_id(user_id: str, store_id: str) -> str:
+    return f"{user_id}_{store_id}_{uuid.uuid1()}"
+
+
+def _compact_id(user_id: str, store_id: str) -> str:
+    return ids.new_id()
+
+
+SCHEMES = {"legacy": _legacy_id, "compact": _compact_id}
+
+
+def _copy_table(source: Table, metadata: MetaData, suffix: str) -> Table:
+    """Same columns, unique constraints and indexes as ``source``; no foreign keys."""
+    columns = [
+        Column(
+            column.name,
+            column.type,
+            primary_key=column.primary_key,
+            nullable=column.nullable,
+            autoincrement=column.autoincrement,
+            default=column.default.arg if column.default is not None else None,
+        )
+        for column in source.columns
+    ]
+    table = Table(f"bench_{source.name}_{suffix}", metadata, *columns)
+    for constraint in source.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            table.append_constraint(
+                UniqueConstraint(
+                    *[column.name for column in constraint.columns],
+                    name=f"{constraint.name}_{suffix}",
+                )
+            )
+    for index in source.indexes:
+        Index(
+            f"{index.name}_{suffix}",
+            *[table.c[column.name] for column in index.columns],
+        )
+    return table
+
+
+def _scratch_tables(metadata: MetaData, suffix: str):
+    return (
+        _copy_table(Order.__table__, metadata, suffix),
+        _copy_table(OrderItem.__table__, metadata, suffix),
+    )
+
+
+def _table_size(conn, table_name: str):
+    """Return (data_bytes, index_bytes); None where the backend can't tell."""
+    dialect = engine.dialect.name
+    if dialect == "mysql":
+        conn.execute(text(f"ANALYZE TABLE {table_name}"))
+        row = conn.execute(
+            text(
+                "SELECT data_length, index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :name"
+            ),
+            {"name": table_name},
+        ).first()
+        return (int(row[0]), int(row[1])) if row else (None, None)
+    if dialect == "sqlite":
+        try:
+            data = conn.execute(
+                text("SELECT SUM(pgsize) FROM dbstat WHERE name = :name"),
+                {"name": table_name},
+            ).scalar()
+            index = conn.execute(
+                text(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master "
+                    "WHERE type = 'index' AND tbl_name = :name)"
+                ),
+                {"name": table_name},
+            ).scalar()
+            return data, index
+        except Exception:
+            return None, None
+    return None, None
+
+
+def run_scheme(name: str, n_orders: int, n_items: int, batch: int):
+    metadata = MetaData()
+    orders, items = _scratch_tables(metadata, name)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    make_id = SCHEMES[name]
+    try:
+        start = time.perf_counter()
+        for offset in range(0, n_orders, batch):
+            order_rows, item_rows = [], []
+            for i in range(offset, min(offset + batch, n_orders)):
+                user_id = f"bench_user_{i % 97}"
+                store_id = f"bench_store_{i % 13}"
+                order_id = make_id(user_id, store_id)
+                order_rows.append(
+                    {
+                        "order_id": order_id,
+                        "user_id": user_id,
+                        "store_id": store_id,
+                        "status": "pending",
+                        "total_price": 100 * n_items,
+                    }
+                )
+                item_rows.extend(
+                    {
+                        "order_id": order_id,
+                        "book_id": f"bench_book_{j}",
+                        "count": 1,
+                        "unit_price": 100,
+                    }
+                    for j in range(n_items)
+                )
+            with engine.begin() as conn:
+                conn.execute(insert(orders), order_rows)
+                conn.execute(insert(items), item_rows)
+        elapsed = time.perf_counter() - start
+        with engine.begin() as conn:
+            sizes = {
+                table.name: _table_size(conn, table.name) for table in (orders, items)
+            }
+        return {
+            "scheme": name,
+            "seconds": elapsed,
+            "orders_per_sec": n_orders / elapsed if elapsed else 0,
+            "sizes": sizes,
+        }
+    finally:
+        metadata.drop_all(engine)
+
+
+def _fmt_bytes(value):
+    return "n/a" if value is None else "{:.1f} KiB".format(value / 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    for name in SCHEMES:
+        result = run_scheme(name, args.orders, args.items, args.batch)
+        print(
+            "{scheme:8s} {seconds:8.2f}s {orders_per_sec:10.0f} orders/s".format(
+                **result
+            )
+        )
+        for table_name, (data, index) in result["sizes"].items():
+            print(
+                "    {:32s} data {:>12s}  index {:>12s}".format(
+                    table_name, _fmt_bytes(data), _fmt_bytes(index)
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ def run_bench():
 
     for ss in sessions:
         ss.join()
+    return wl
 
 
 # if __name__ == "__main__":
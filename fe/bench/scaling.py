@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Measure how bench throughput scales with the backend worker count.
+
+Each configuration starts a fresh backend process (``python -m be.app``) with
+``BOOKSTORE_SERVE_MODE``/``BOOKSTORE_WORKERS`` set, runs the regular bench with
+as many client sessions as workers, and reports the overall TPS.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urljoin
+
+import requests
+
+from fe import conf
+from fe.bench.run import run_bench
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _wait_until_up(timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(urljoin(conf.URL, "search/books"), params={"q": ""}, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.5)
+    raise RuntimeError("backend did not start within {}s".format(timeout))
+
+
+def _start_backend(mode: str, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["BOOKSTORE_SERVE_MODE"] = mode
+    env["BOOKSTORE_WORKERS"] = str(workers)
+    return subprocess.Popen([sys.executable, "-m", "be.app"], cwd=ROOT, env=env)
+
+
+def _stop_backend(proc: subprocess.Popen) -> None:
+    try:
+        requests.get(urljoin(conf.URL, "shutdown"), timeout=5)
+    except requests.RequestException:
+        pass
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def _tx_counters() -> dict:
+    """Sum the backend's ``tx.<op>.retry`` / ``tx.<op>.abort`` counters."""
+    totals = {"retry": 0, "abort": 0}
+    try:
+        counters = requests.get(urljoin(conf.URL, "metrics"), timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return totals
+    for name, value in counters.get("counters", {}).items():
+        kind = name.rsplit(".", 1)[-1]
+        if name.startswith("tx.") and kind in totals:
+            totals[kind] += value
+    return totals
+
+
+def run_scaling(worker_counts, mode: str = "thread"):
+    results = []
+    for workers in worker_counts:
+        proc = _start_backend(mode, workers)
+        try:
+            _wait_until_up()
+            conf.Session = workers
+            before = time.time()
+            wl = run_bench()
+            elapsed = time.time() - before
+            tx = _tx_counters()
+        finally:
+            _stop_backend(proc)
+        tps = wl.n_new_order_ok / elapsed if elapsed else 0
+        row = {
+            "mode": mode,
+            "workers": workers,
+            "sessions": workers,
+            "new_order_ok": wl.n_new_order_ok,
+            "seconds": round(elapsed, 2),
+            "tps": round(tps, 1),
+            "errors_530": wl.n_server_error,
+            "tx_retries": tx["retry"],
+            "tx_aborts": tx["abort"],
+        }
+        logging.info("scaling %s", row)
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["single", "thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print("mode\tworkers\tnew_order_ok\tseconds\ttps\t530s\tretries\taborts")
+    for row in run_scaling(args.workers, args.mode):
+        print(
+            "{mode}\t{workers}\t{new_order_ok}\t{seconds}\t{tps}\t"
+            "{errors_530}\t{tx_retries}\t{tx_aborts}".format(**row)
+        )
+
+
+if __name__ == "__main__":
+    main()
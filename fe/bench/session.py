@@ -35,6 +35,8 @@ class Session(threading.Thread):
             after = time.time()
             self.time_new_order = self.time_new_order + after - before
             self.new_order_i = self.new_order_i + 1
+            if getattr(new_order, "code", None) == 530:
+                self.workload.count_server_error()
             if ok:
                 self.new_order_ok = self.new_order_ok + 1
                 payment = Payment(new_order.buyer, order_id)
@@ -56,6 +58,8 @@ class Session(threading.Thread):
                     after = time.time()
                     self.time_payment = self.time_payment + after - before
                     self.payment_i = self.payment_i + 1
+                    if getattr(payment, "code", None) == 530:
+                        self.workload.count_server_error()
                     if ok:
                         self.payment_ok = self.payment_ok + 1
                 self.payment_request = []
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Hammer one hot book with concurrent new_order calls, with and without stock admission.
+
+For each mode the script creates a scratch store holding ``--stock`` copies
+of a single book, then ``--threads`` threads each place ``--orders`` one-copy
+orders through ``be.model.buyer.Buyer`` (no HTTP). Once the stock is gone
+every further order is a rejection; the report shows how long those
+rejections take and the overall order rate.
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from be.model import stock_admission
+from be.model.buyer import Buyer
+from be.model.dao import store_dao, user_dao
+from be.model.sql_conn import session_scope
+
+
+def _setup(stock: int, n_buyers: int):
+    suffix = uuid.uuid4().hex[:12]
+    seller_id = f"bench_hot_seller_{suffix}"
+    store_id = f"bench_hot_store_{suffix}"
+    book_id = f"bench_hot_book_{suffix}"
+    buyers = [f"bench_hot_buyer_{suffix}_{i}" for i in range(n_buyers)]
+    with session_scope() as session:
+        for user_id in [seller_id] + buyers:
+            user_dao.create_user(session, user_id, user_id, "", "bench")
+        store_dao.create_store(
+            session, store_id=store_id, owner_id=seller_id, name=store_id
+        )
+        store_dao.upsert_book(session, book_id, title="Hot Book")
+        store_dao.add_inventory(session, store_id, book_id, stock, 100)
+    return store_id, book_id, buyers
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run_mode(enabled: bool, stock: int, threads: int, orders: int):
+    stock_admission.configure(enabled=enabled)
+    store_id, book_id, buyers = _setup(stock, threads)
+    latencies = {"ok": [], "rejected": [], "error": []}
+    lock = threading.Lock()
+
+    def client(user_id):
+        buyer = Buyer()
+        for _ in range(orders):
+            start = time.perf_counter()
+            code, _, _ = buyer.new_order(user_id, store_id, [(book_id, 1)])
+            elapsed = time.perf_counter() - start
+            kind = "ok" if code == 200 else "rejected" if code == 517 else "error"
+            with lock:
+                latencies[kind].append(elapsed)
+
+    workers = [threading.Thread(target=client, args=(u,)) for u in buyers]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - start
+    stock_admission.configure(enabled=False)
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "mode": "admission" if enabled else "baseline",
+        "wall": wall,
+        "rate": total / wall if wall else 0,
+        "ok": len(latencies["ok"]),
+        "rejected": len(latencies["rejected"]),
+        "errors": len(latencies["error"]),
+        "reject_p50_ms": _percentile(latencies["rejected"], 0.5) * 1000,
+        "reject_p99_ms": _percentile(latencies["rejected"], 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=50)
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        result = run_mode(enabled, args.stock, args.threads, args.orders)
+        print(
+            "{mode:10s} {wall:7.2f}s {rate:9.0f} req/s  ok {ok:5d}  "
+            "rejected {rejected:5d}  errors {errors:3d}  "
+            "reject p50 {reject_p50_ms:7.2f} ms  p99 {reject_p99_ms:7.2f} ms".format(
+                **result
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
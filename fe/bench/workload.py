@@ -17,6 +17,7 @@ class NewOrder:
 
     def run(self) -> (bool, str):
         code, order_id = self.buyer.new_order(self.store_id, self.book_id_and_count)
+        self.code = code
         return code == 200, order_id
 
 
@@ -27,6 +28,7 @@ class Payment:
 
     def run(self) -> bool:
         code = self.buyer.payment(self.order_id)
+        self.code = code
         return code == 200
 
 
@@ -57,6 +59,8 @@ class Workload:
         self.n_payment_ok = 0
         self.time_new_order = 0
         self.time_payment = 0
+        # 后端返回 530（事务失败，如死锁/锁等待超时重试耗尽）的请求数
+        self.n_server_error = 0
         self.lock = threading.Lock()
         # 存储上一次的值，用于两次做差
         self.n_new_order_past = 0
@@ -128,6 +132,10 @@ class Workload:
         new_ord = NewOrder(b, store_id, book_id_and_count)
         return new_ord
 
+    def count_server_error(self):
+        with self.lock:
+            self.n_server_error += 1
+
     def update_stat(
         self,
         n_new_order,
@@ -0,0 +1,32 @@
+import threading
+
+from sqlalchemy import event
+
+from be.model.jobs import PeriodicJob
+from be.model.sql_conn import engine
+
+
+class StatementRecorder:
+    """Collect the SQL statements sent to the engine while the block runs.
+
+    Statements of background job threads are left out, so counts only cover the
+    test's own calls and the requests they make.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if isinstance(threading.current_thread(), PeriodicJob):
+            return
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self)
+
+    def matching(self, fragment: str):
+        return [s for s in self.statements if fragment in s]
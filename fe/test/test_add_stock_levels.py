@@ -0,0 +1,81 @@
+import uuid
+
+import pytest
+
+from be.model.dao import store_dao
+from be.model.seller import Seller as SellerModel
+from be.model.sql_conn import session_scope
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestAddStockLevels:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"seller_restock_{uuid.uuid4()}"
+        self.store_id = f"store_restock_{uuid.uuid4()}"
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        self.book_ids = [f"book_restock_{uuid.uuid4()}" for _ in range(30)]
+        books = [
+            {"book_info": {"id": book_id, "title": "Restock"}, "stock_level": 5}
+            for book_id in self.book_ids
+        ]
+        code, _ = self.seller.batch_add_books(self.store_id, books)
+        assert code == 200
+        yield
+
+    def _stock(self, book_id):
+        with session_scope() as session:
+            return store_dao.get_inventory(session, self.store_id, book_id).stock_level
+
+    def test_restock_many_books(self):
+        items = [{"book_id": b, "delta": 10} for b in self.book_ids[:3]]
+        items.append({"book_id": self.book_ids[0], "delta": 1})
+        code, body = self.seller.add_stock_levels(self.store_id, items)
+        assert code == 200
+        assert body["message"] == "ok"
+        assert [r["book_id"] for r in body["results"]] == self.book_ids[:3]
+        assert [self._stock(b) for b in self.book_ids[:3]] == [16, 15, 15]
+
+    def test_missing_books_and_negative_stock_reported(self):
+        items = [
+            {"book_id": self.book_ids[0], "delta": 2},
+            {"book_id": "no_such_book", "delta": 2},
+            {"book_id": self.book_ids[1], "delta": -6},
+            {"book_id": self.book_ids[2], "delta": "x"},
+        ]
+        code, body = self.seller.add_stock_levels(self.store_id, items)
+        assert code == 200
+        assert body["message"] == "partial failure"
+        assert [r["code"] for r in body["results"]] == [200, 515, 517, 530]
+        assert self._stock(self.book_ids[0]) == 7
+        assert self._stock(self.book_ids[1]) == 5
+
+    def test_store_checks(self):
+        items = [{"book_id": self.book_ids[0], "delta": 1}]
+        code, _ = self.seller.add_stock_levels(self.store_id + "_x", items)
+        assert code == 513
+        self.seller.seller_id = self.seller_id + "_x"
+        code, body = self.seller.add_stock_levels(self.store_id, items)
+        assert code == 511
+        assert body["results"] == []
+        self.seller.seller_id = self.seller_id
+        other = register_new_seller(f"seller_other_{uuid.uuid4()}", "pw")
+        code, _ = other.add_stock_levels(self.store_id, items)
+        assert code == 401
+        assert self._stock(self.book_ids[0]) == 5
+
+    def test_statement_count_does_not_grow(self):
+        def _run(book_ids):
+            with StatementRecorder() as recorder:
+                code, _, results = SellerModel().add_stock_levels(
+                    self.seller_id,
+                    self.store_id,
+                    [{"book_id": b, "delta": 1} for b in book_ids],
+                )
+            assert code == 200
+            assert all(r["code"] == 200 for r in results)
+            return len(recorder.matching("inventories"))
+
+        assert _run(self.book_ids[:2]) == _run(self.book_ids) == 2
@@ -0,0 +1,155 @@
+import base64
+import json
+import uuid
+
+import pytest
+from bson.binary import Binary
+from sqlalchemy import text
+
+from be.model.blob_store import get_blob_store, load_book_infos, picture_hash
+from be.model.models import Book
+from be.model.sql_conn import engine, session_scope
+from fe import conf
+from fe.access.book import Book as BookInfo
+from fe.access.new_seller import register_new_seller
+from fe.access.search import Search as SearchClient
+from script import backfill_book_info
+
+
+class TestBackfillBookInfo:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        # 还原拆表之前的 inventories 结构
+        missing = set(backfill_book_info.LEGACY_COLUMNS) - set(
+            backfill_book_info.legacy_columns()
+        )
+        with engine.begin() as conn:
+            for name in sorted(missing):
+                conn.execute(text(f"ALTER TABLE inventories ADD COLUMN {name} TEXT"))
+        seller_id = f"seller_backfill_{uuid.uuid4()}"
+        self.store_id = f"store_backfill_{uuid.uuid4()}"
+        seller = register_new_seller(seller_id, seller_id)
+        assert seller.create_store(self.store_id) == 200
+        book = BookInfo()
+        book.id = f"book_backfill_{uuid.uuid4()}"
+        self.title = f"backfill_{uuid.uuid4().hex[:8]}"
+        book.title = self.title
+        book.price = 10
+        assert seller.add_book(self.store_id, 3, book) == 200
+        self.book_id = book.id
+        yield
+        backfill_book_info.drop_legacy_columns()
+
+    def _set_legacy_info(self, book_info: str):
+        # 旧版上架与 books 行在同一事务里写入，上架行不早于 books 行
+        with session_scope() as session:
+            session.execute(
+                text(
+                    "UPDATE inventories SET book_info = :info, updated_at = "
+                    "(SELECT updated_at FROM books WHERE book_id = :book_id) "
+                    "WHERE store_id = :store_id AND book_id = :book_id"
+                ),
+                {
+                    "info": book_info,
+                    "store_id": self.store_id,
+                    "book_id": self.book_id,
+                },
+            )
+
+    def _book_info(self):
+        with session_scope() as session:
+            book = session.get(Book, self.book_id)
+            return load_book_infos([book])[self.book_id]
+
+    def test_legacy_book_info_is_moved_to_books_and_blob_store(self):
+        picture = b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes
+        intro = "长" * 2000
+        self._set_legacy_info(
+            json.dumps(
+                {
+                    "id": self.book_id,
+                    "title": "Legacy Title",
+                    "author": "Someone",
+                    "price": 10,
+                    "tags": ["fiction", "classic"],
+                    "book_intro": intro,
+                    "catalog": "1. start",
+                    "pictures": [base64.b64encode(picture).decode("ascii")],
+                }
+            )
+        )
+        # 带 blob 文档（has_external_longtext 为真）的书同样迁移
+        assert self._book_info()["title"] == self.title
+
+        migrated, failures = backfill_book_info.backfill(batch_size=1)
+        assert migrated >= 1
+        assert self.book_id not in [book_id for book_id, _ in failures]
+        info = self._book_info()
+        assert info["title"] == "Legacy Title"
+        assert info["tags"] == ["fiction", "classic"]
+        assert info["book_intro"] == intro
+        assert info["catalog"] == "1. start"
+        assert info["pictures"] == [picture_hash(picture)]
+        assert get_blob_store().get_picture(picture_hash(picture)) == picture
+
+        # 已迁移的书 books 行更新，再次运行时跳过；删除旧列后再运行无事可做
+        assert backfill_book_info.backfill() == (0, [])
+        assert backfill_book_info.drop_legacy_columns() == list(
+            backfill_book_info.LEGACY_COLUMNS
+        )
+        assert backfill_book_info.backfill() == (0, [])
+
+    def test_invalid_legacy_book_info_is_reported(self):
+        self._set_legacy_info("not json")
+        _, failures = backfill_book_info.backfill()
+        assert (self.book_id, "invalid book_info") in failures
+        assert self._book_info()["title"] == self.title
+
+    def test_legacy_blob_document_is_rewritten(self, monkeypatch):
+        # 旧版导入脚本写入 Mongo 的 book_blob：封面以 Binary 内嵌，另有旧键
+        picture = b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes
+        digest = picture_hash(picture)
+        legacy = {
+            self.book_id: {
+                "book_intro": "旧" * 600,
+                "picture": Binary(picture),
+                "long_content": Binary(b"raw"),
+            }
+        }
+        store = get_blob_store()
+        get_many, put_many = store.get_many, store.put_many
+
+        def legacy_get_many(book_ids):
+            docs = get_many(book_ids)
+            docs.update({b: legacy[b] for b in book_ids if b in legacy})
+            return docs
+
+        def replacing_put_many(docs):
+            for book_id in docs:
+                legacy.pop(book_id, None)
+            put_many(docs)
+
+        monkeypatch.setattr(store, "get_many", legacy_get_many)
+        monkeypatch.setattr(store, "put_many", replacing_put_many)
+        with session_scope() as session:
+            book = session.get(Book, self.book_id)
+            book.has_external_longtext = True
+            book.cover_ref = None
+
+        status, data = SearchClient(conf.URL).books(self.title)
+        assert status == 200
+        (item,) = data["books"]
+        assert item["book_info"]["pictures"] == [digest]
+        assert item["book_info"]["book_intro"] == "旧" * 600
+        assert store.get_picture(digest) is None
+
+        assert backfill_book_info.rewrite_legacy_blobs(batch_size=1) >= 1
+        assert self.book_id not in legacy
+        assert store.get_picture(digest) == picture
+        with session_scope() as session:
+            assert session.get(Book, self.book_id).cover_ref == digest
+        status, data = SearchClient(conf.URL).books(self.title)
+        assert status == 200
+        (item,) = data["books"]
+        assert item["book_info"]["pictures"] == [digest]
+        assert "picture" not in item["book_info"]
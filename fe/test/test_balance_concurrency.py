@@ -0,0 +1,79 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from be.model.buyer import Buyer
+from be.model.dao import order_dao, user_dao
+from be.model.sql_conn import session_scope
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+class TestBalanceConcurrency:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"seller_bal_{uuid.uuid4()}"
+        self.store_id = f"store_bal_{uuid.uuid4()}"
+        seller = register_new_seller(self.seller_id, self.seller_id)
+        assert seller.create_store(self.store_id) == 200
+        self.book = Book()
+        self.book.id = f"book_bal_{uuid.uuid4()}"
+        self.book.title = "Balance"
+        self.book.price = 100
+        assert seller.add_book(self.store_id, 1000, self.book) == 200
+        self.buyer_id = f"buyer_bal_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        yield
+
+    def _balance(self, user_id):
+        with session_scope() as session:
+            user_dao.rollup_ledger(session, user_id=user_id)
+            return user_dao.get_user(session, user_id).balance
+
+    def _statuses(self, order_ids):
+        with session_scope() as session:
+            return [order_dao.get_order(session, oid).status for oid in order_ids]
+
+    def test_concurrent_payments_conserve_money(self):
+        order_ids = []
+        for _ in range(12):
+            code, order_id = self.buyer.new_order(self.store_id, [(self.book.id, 1)])
+            assert code == 200
+            order_ids.append(order_id)
+        # 只够支付 7 单；每个订单并发支付两次
+        assert self.buyer.add_funds(700) == 200
+
+        def pay(order_id):
+            return Buyer().payment(self.buyer_id, self.buyer_id, order_id)[0]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(pay, order_ids * 2))
+
+        paid = codes.count(200)
+        assert 0 < paid <= 7
+        assert set(codes) <= {200, 519, 520, 530}
+        assert self._statuses(order_ids).count("paid") == paid
+        buyer_balance = self._balance(self.buyer_id)
+        assert buyer_balance >= 0
+        assert 700 - buyer_balance == 100 * paid
+        assert self._balance(self.seller_id) == 100 * paid
+
+    def test_concurrent_add_funds_and_payments(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book.id, 1)])
+        assert code == 200
+
+        def add(_):
+            return Buyer().add_funds(self.buyer_id, self.buyer_id, 10)[0]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(add, range(40)))
+        added = codes.count(200)
+        assert added > 0
+        assert self._balance(self.buyer_id) == 10 * added
+
+        assert self.buyer.add_funds(100) == 200
+        assert self.buyer.payment(order_id) == 200
+        assert self._balance(self.buyer_id) == 10 * added
+        assert self._balance(self.seller_id) == 100
@@ -0,0 +1,95 @@
+import uuid
+
+import pytest
+
+from be.model import jobs
+from be.model.dao import user_dao
+from be.model.models import BalanceLedger
+from be.model.sql_conn import session_scope
+from be.model.user import User
+from fe import conf
+from fe.access.book import Book
+from fe.access.buyer import Buyer
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+def _open_store(prefix, price=100):
+    seller_id = f"{prefix}_seller_{uuid.uuid4()}"
+    store_id = f"{prefix}_store_{uuid.uuid4()}"
+    seller = register_new_seller(seller_id, seller_id)
+    assert seller.create_store(store_id) == 200
+    book = Book()
+    book.id = f"{prefix}_book_{uuid.uuid4()}"
+    book.title = "Ledger"
+    book.price = price
+    assert seller.add_book(store_id, 100, book) == 200
+    return seller_id, store_id, book.id
+
+
+class TestBalanceLedger:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id, self.store_id, self.book_id = _open_store("ledger")
+        self.buyer_id = f"ledger_buyer_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(1000) == 200
+        yield
+
+    def _pay(self, n):
+        for _ in range(n):
+            code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+            assert code == 200
+            assert self.buyer.payment(order_id) == 200
+
+    def _balance(self, user_id):
+        # 读余额前先折叠该用户的流水
+        with session_scope() as session:
+            user_dao.rollup_ledger(session, user_id=user_id)
+            return user_dao.get_user(session, user_id).balance
+
+    def _ledger_rows(self, user_id):
+        with session_scope() as session:
+            return (
+                session.query(BalanceLedger)
+                .filter(BalanceLedger.user_id == user_id)
+                .count()
+            )
+
+    def test_payment_credits_ledger_and_rollup_folds_it(self):
+        self._pay(3)
+        assert self._ledger_rows(self.seller_id) == 3
+        with session_scope() as session:
+            assert user_dao.get_user(session, self.seller_id).balance == 0
+            assert user_dao.get_user(session, self.buyer_id).balance == 700
+
+        User().settle_balance_ledger()
+        assert self._ledger_rows(self.seller_id) == 0
+        with session_scope() as session:
+            assert user_dao.get_user(session, self.seller_id).balance == 300
+
+    def test_payer_can_spend_unfolded_credits(self):
+        self._pay(2)
+        # 卖家余额只在流水里，去另一家店消费 150
+        _, other_store, other_book = _open_store("ledger_other", price=150)
+        seller_buyer = Buyer(conf.URL, self.seller_id, self.seller_id)
+        code, order_id = seller_buyer.new_order(other_store, [(other_book, 1)])
+        assert code == 200
+        assert seller_buyer.payment(order_id) == 200
+        assert self._balance(self.seller_id) == 50
+
+    def test_rollup_job_runs_in_batches(self):
+        self._pay(3)
+        job = jobs.BalanceLedgerRollup(interval=60, batch_size=1)
+        job.run_once()
+        assert self._ledger_rows(self.seller_id) == 0
+        assert self._balance(self.seller_id) == 300
+
+    def test_revived_user_does_not_inherit_unfolded_credits(self):
+        self._pay(2)
+        user = User()
+        assert user.unregister(self.seller_id, self.seller_id) == (200, "ok")
+        assert user.register(self.seller_id, self.seller_id) == (200, "ok")
+        assert self._ledger_rows(self.seller_id) == 0
+        user.settle_balance_ledger()
+        assert self._balance(self.seller_id) == 0
@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import json
+import os
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+import requests
+from bson.binary import Binary
+
+from be.model.blob_store import FileBlobStore, build_book_info
+from be.model.models import Book as BookRow
+from fe import conf
+from fe.access.book import Book
+from fe.access.new_seller import register_new_seller
+from fe.access.search import Search as SearchClient
+
+PNG = b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes * 64
+
+
+class TestBookPictures:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.keyword = f"pic_{uuid.uuid4().hex[:8]}"
+        self.sellers = []
+        for i in range(2):
+            seller_id = f"seller_pic_{uuid.uuid4()}"
+            store_id = f"store_pic_{uuid.uuid4()}"
+            seller = register_new_seller(seller_id, seller_id)
+            assert seller.create_store(store_id) == 200
+            self.sellers.append((seller, store_id))
+        self.digest = hashlib.sha256(PNG).hexdigest()
+        self.url = urljoin(conf.URL, f"book/picture/{self.digest}")
+        yield
+
+    def _book(self, suffix):
+        book = Book()
+        book.id = f"{self.keyword}_{suffix}"
+        book.title = f"{self.keyword} {suffix}"
+        book.pictures = [base64.b64encode(PNG).decode("utf-8")]
+        return book
+
+    def test_same_picture_is_stored_once_and_referenced(self):
+        for i, (seller, store_id) in enumerate(self.sellers):
+            assert seller.add_book(store_id, 1, self._book(i)) == 200
+
+        status, data = SearchClient(conf.URL).books(self.keyword)
+        assert status == 200
+        infos = [item["book_info"] for item in data["books"]]
+        assert len(infos) == 2
+        assert all(info["pictures"] == [self.digest] for info in infos)
+
+        r = requests.get(self.url)
+        assert r.status_code == 200
+        assert r.content == PNG
+        assert r.headers["Content-Type"] == "image/png"
+        assert "immutable" in r.headers["Cache-Control"]
+
+        r = requests.get(self.url, headers={"If-None-Match": r.headers["ETag"]})
+        assert r.status_code == 304
+
+    def test_each_listing_keeps_its_store_price(self):
+        for i, (seller, store_id) in enumerate(self.sellers):
+            book = self._book("shared")
+            book.price = 100 * (i + 1)
+            book.tags = ["shared"]
+            assert seller.add_book(store_id, 1, book) == 200
+
+        status, data = SearchClient(conf.URL).books(self.keyword)
+        assert status == 200
+        prices = {item["store_id"]: item["book_info"]["price"] for item in data["books"]}
+        assert prices == {store_id: 100 * (i + 1) for i, (_, store_id) in enumerate(self.sellers)}
+        assert all(item["book_info"]["tags"] == ["shared"] for item in data["books"])
+
+    def test_unknown_or_malformed_hash(self):
+        r = requests.get(urljoin(conf.URL, "book/picture/" + "0" * 64))
+        assert r.status_code == 404
+        r = requests.get(urljoin(conf.URL, "book/picture/not-a-hash"))
+        assert r.status_code == 404
+
+    def test_invalid_base64_rejected(self):
+        seller, store_id = self.sellers[0]
+        book = self._book("bad")
+        book.pictures = ["not base64!"]
+        assert seller.add_book(store_id, 1, book) == 530
+
+
+def test_legacy_blob_document_is_whitelisted():
+    # 旧版导入脚本写入的 book_blob：封面以 Binary 内嵌，另有未知键
+    book = BookRow()
+    book.book_id = "legacy_blob"
+    book.title = "Legacy"
+    book.has_external_longtext = True
+    blob = {
+        "book_intro": "长" * 600,
+        "picture": Binary(PNG),
+        "tags": ["a", 1, "b"],
+        "long_content": Binary(b"raw"),
+    }
+    info = build_book_info(book, blob)
+    json.dumps(info)
+    assert info["book_intro"] == "长" * 600
+    assert info["pictures"] == [hashlib.sha256(PNG).hexdigest()]
+    assert info["tags"] == ["a", "b"]
+    assert "picture" not in info and "long_content" not in info
+
+
+def test_unchanged_blob_is_not_rewritten(tmp_path):
+    store = FileBlobStore(str(tmp_path))
+    store.put_many({"b1": {"tags": ["a"]}})
+    path = store._path("b1")
+    inode = os.stat(path).st_ino
+    # 内容不变时不重写：文件仍是原来那一个
+    store.put_many({"b1": {"tags": ["a"]}})
+    assert os.stat(path).st_ino == inode
+    store.put_many({"b1": {"tags": ["b"]}})
+    assert os.stat(path).st_ino != inode
+    assert store.get_many(["b1"])["b1"]["tags"] == ["b"]
@@ -1,7 +1,12 @@
+import json
 import uuid
+from datetime import datetime, timedelta
 
 import pytest
 
+from be.model.buyer import Buyer
+from be.model.dao import order_dao
+from be.model.sql_conn import session_scope
 from fe import conf
 from fe.access import book
 from fe.access.new_buyer import register_new_buyer
@@ -44,9 +49,60 @@ class TestBuyerExport:
         assert any(o["order_id"] == paid_order for o in orders)
         assert all(o["status"] == "paid" for o in orders)
 
+    def test_expired_pending_orders_are_exported_as_cancelled(self, monkeypatch):
+        # 停掉后台扫描，确认导出本身按超时判断输出状态
+        monkeypatch.setattr(Buyer, "cancel_expired_orders", lambda self, limit=None: 0)
+        order_id = self._create_order(pay=False)
+        with session_scope() as session:
+            order = order_dao.get_order(session, order_id)
+            order.expires_at = datetime.utcnow() - timedelta(seconds=30)
+
+        status, data = self.buyer.export_orders()
+        assert status == 200
+        (exported,) = [o for o in data["orders"] if o["order_id"] == order_id]
+        assert exported["status"] == "cancelled_timeout"
+        status, data = self.buyer.list_orders(include_items=False)
+        assert status == 200
+        (listed,) = [o for o in data["orders"] if o["order_id"] == order_id]
+        assert listed["status"] == exported["status"]
+
     def test_export_orders_csv(self):
         order_id = self._create_order(pay=True)
         status, csv_text = self.buyer.export_orders(fmt="csv")
         assert status == 200
         assert "order_id" in csv_text
         assert order_id in csv_text
+
+    def test_export_streams_in_chunks(self, monkeypatch):
+        from be.model import buyer as buyer_model
+
+        monkeypatch.setattr(buyer_model, "EXPORT_CHUNK_SIZE", 2)
+        order_ids = [self._create_order() for _ in range(5)]
+        status, listed = self.buyer.list_orders(include_items=False)
+        assert status == 200
+        expected = [o["order_id"] for o in listed["orders"]]
+        assert sorted(expected) == sorted(order_ids)
+
+        status, text = self.buyer.export_orders(fmt="ndjson")
+        assert status == 200
+        rows = [json.loads(line) for line in text.splitlines()]
+        assert [row["order_id"] for row in rows] == expected
+        assert all(len(row["items"]) == 1 for row in rows)
+
+        status, data = self.buyer.export_orders()
+        assert status == 200
+        assert [o["order_id"] for o in data["orders"]] == expected
+
+    def test_export_limit_and_unknown_user(self, monkeypatch):
+        from be.model import buyer as buyer_model
+
+        monkeypatch.setattr(buyer_model, "EXPORT_CHUNK_SIZE", 2)
+        for _ in range(3):
+            self._create_order()
+        status, csv_text = self.buyer.export_orders(fmt="csv", limit=3)
+        assert status == 200
+        assert len(csv_text.strip().splitlines()) == 4
+
+        self.buyer.user_id = self.buyer_id + "_x"
+        status, _ = self.buyer.export_orders(fmt="ndjson")
+        assert status == 511
@@ -106,8 +106,46 @@ def test_cancel_order_update_exception(buyer, monkeypatch):
     code, msg = buyer.cancel_order("buyer", "pwd", "order")
     assert code == 530
     assert msg == "boom"
-    assert calls["restored"][0] == "store"
-    assert calls["restored"][1] == [("book", 2)]
+    # 状态没切换成功就不归还库存
+    assert "restored" not in calls
+
+
+@pytest.mark.parametrize("updated", [1, 0])
+def test_cancel_order_restores_only_after_status_flip(buyer, monkeypatch, updated):
+    order = SimpleNamespace(
+        order_id="order",
+        user_id="buyer",
+        status="pending",
+        store_id="store",
+    )
+    monkeypatch.setattr(order_dao, "get_order", lambda session, order_id: order)
+    monkeypatch.setattr(
+        user_dao, "get_user", lambda session, uid: SimpleNamespace(password="pwd")
+    )
+    items = [SimpleNamespace(book_id="book", count=2)]
+    monkeypatch.setattr(order_dao, "get_order_items", lambda session, oid: items)
+    calls = []
+    monkeypatch.setattr(
+        order_dao,
+        "update_order_status",
+        lambda *args, **kwargs: calls.append("update") or updated,
+    )
+    monkeypatch.setattr(
+        order_dao,
+        "adjust_inventory_for_items",
+        lambda session, store_id, tuples, decrease=False: calls.append(
+            ("restore", store_id, tuples)
+        ),
+    )
+
+    code, msg = buyer.cancel_order("buyer", "pwd", "order")
+    if updated:
+        assert code == 200
+        assert calls == ["update", ("restore", "store", [("book", 2)])]
+    else:
+        # 并发取消中输掉的一方：另一方已切换状态并归还了库存
+        assert (code, msg) == error.error_invalid_order_status("order")
+        assert calls == ["update"]
 
 
 def test_cancel_expired_orders(monkeypatch):
@@ -0,0 +1,164 @@
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+import requests
+
+from be.model import idempotency
+from be.model.dao import store_dao, user_dao
+from be.model.idempotency import IdempotencyStore, ResponseCache, request_digest
+from be.model.sql_conn import session_scope
+from fe import conf
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestIdempotency:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        seller_id = f"seller_idem_{uuid.uuid4()}"
+        self.store_id = f"store_idem_{uuid.uuid4()}"
+        seller = register_new_seller(seller_id, seller_id)
+        assert seller.create_store(self.store_id) == 200
+        book = Book()
+        book.id = f"book_idem_{uuid.uuid4()}"
+        book.title = "Idempotent"
+        book.price = 100
+        assert seller.add_book(self.store_id, 10, book) == 200
+        self.book_id = book.id
+        self.buyer_id = f"buyer_idem_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(1000) == 200
+        yield
+
+    def _stock(self):
+        with session_scope() as session:
+            inventory = store_dao.get_inventory(session, self.store_id, self.book_id)
+            return inventory.stock_level
+
+    def _balance(self):
+        with session_scope() as session:
+            return user_dao.get_user(session, self.buyer_id).balance
+
+    def test_retried_new_order_returns_same_order(self):
+        key = str(uuid.uuid4())
+        code, first = self.buyer.new_order(self.store_id, [(self.book_id, 2)], key)
+        assert code == 200
+        code, second = self.buyer.new_order(self.store_id, [(self.book_id, 2)], key)
+        assert code == 200
+        assert second == first
+        assert self._stock() == 8
+
+        code, other = self.buyer.new_order(
+            self.store_id, [(self.book_id, 2)], str(uuid.uuid4())
+        )
+        assert code == 200 and other != first
+        assert self._stock() == 6
+
+    def test_retried_payment_does_not_charge_twice(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert code == 200
+        key = str(uuid.uuid4())
+        assert self.buyer.payment(order_id, key) == 200
+        assert self.buyer.payment(order_id, key) == 200
+        assert self._balance() == 900
+        # 没有 key 的重复支付仍按状态机拒绝
+        assert self.buyer.payment(order_id) == 520
+
+    def test_error_responses_are_replayed(self):
+        key = str(uuid.uuid4())
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 11)], key)
+        assert code == 517
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 11)], key)
+        assert code == 517
+        assert self._stock() == 10
+
+    def test_cached_replay_skips_database(self):
+        key = str(uuid.uuid4())
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)], key)
+        assert code == 200
+        idempotency.reset_cache()
+        with StatementRecorder() as from_db:
+            assert self.buyer.new_order(
+                self.store_id, [(self.book_id, 1)], key
+            ) == (200, order_id)
+        with StatementRecorder() as from_cache:
+            assert self.buyer.new_order(
+                self.store_id, [(self.book_id, 1)], key
+            ) == (200, order_id)
+        assert from_db.matching("idempotency_keys")
+        assert from_cache.statements == []
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        key = str(uuid.uuid4())
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 1)], key)
+        assert code == 200
+        # 缓存命中与查表两条路径都要比对请求体
+        for _ in range(2):
+            code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 2)], key)
+            assert code == 422
+            idempotency.reset_cache()
+        assert self._stock() == 9
+
+    def test_key_is_scoped_to_the_token_owner(self):
+        key = str(uuid.uuid4())
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 1)], key)
+        assert code == 200
+        other_id = f"buyer_idem_other_{uuid.uuid4()}"
+        other = register_new_buyer(other_id, other_id)
+        body = {
+            "user_id": self.buyer_id,
+            "store_id": self.store_id,
+            "books": [{"id": self.book_id, "count": 1}],
+        }
+        r = requests.post(
+            urljoin(conf.URL, "buyer/new_order"),
+            headers={"token": other.token, "Idempotency-Key": key},
+            json=body,
+        )
+        assert r.status_code == 401
+        assert "order_id" not in r.json()
+
+    def test_pending_key_runs_once(self, monkeypatch):
+        key = str(uuid.uuid4())
+        body = {
+            "user_id": self.buyer_id,
+            "store_id": self.store_id,
+            "books": [{"id": self.book_id, "count": 1}],
+        }
+        # 模拟同 key 的另一个请求正在执行
+        state, _ = IdempotencyStore().claim(
+            self.buyer_id, self.buyer.token, "new_order", key, request_digest(body)
+        )
+        assert state == idempotency.CLAIMED
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 1)], key)
+        assert code == 409
+        assert self._stock() == 10
+
+        # 占位超过租期没有完成（例如进程崩溃），重试接管并只执行一次
+        monkeypatch.setenv("BOOKSTORE_IDEMPOTENCY_LEASE", "0")
+        code, first = self.buyer.new_order(self.store_id, [(self.book_id, 1)], key)
+        assert code == 200
+        assert self.buyer.new_order(self.store_id, [(self.book_id, 1)], key) == (200, first)
+        assert self._stock() == 9
+
+    def test_key_too_long(self):
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 1)], "k" * 200)
+        assert code == 522
+        assert self._stock() == 10
+
+
+def test_response_cache_evicts_and_expires():
+    cache = ResponseCache(capacity=2, ttl=60)
+    cache.put("a", (200, "a"))
+    cache.put("b", (200, "b"))
+    assert cache.get("a") == (200, "a")
+    cache.put("c", (200, "c"))
+    assert cache.get("b") is None
+    assert cache.get("a") == (200, "a")
+
+    expired = ResponseCache(capacity=2, ttl=-1)
+    expired.put("a", (200, "a"))
+    assert expired.get("a") is None
@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+
+from be.model.dao import order_dao, store_dao
+from be.model.sql_conn import session_scope
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+class TestInventoryReservation:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"seller_reserve_{uuid.uuid4()}"
+        self.store_id = f"store_reserve_{uuid.uuid4()}"
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        self.book_ids = []
+        for stock in (5, 2):
+            book = Book()
+            book.id = f"book_reserve_{uuid.uuid4()}"
+            book.title = "Reserve"
+            book.price = 100
+            assert self.seller.add_book(self.store_id, stock, book) == 200
+            self.book_ids.append(book.id)
+        yield
+
+    def _stock(self, book_id):
+        with session_scope() as session:
+            return store_dao.get_inventory(session, self.store_id, book_id).stock_level
+
+    def test_reserve_reports_short_book_and_keeps_stock(self):
+        first, second = self.book_ids
+        with session_scope() as session:
+            short = order_dao.reserve_inventory(
+                session, self.store_id, [(first, 1), (second, 3)]
+            )
+        assert short == second
+        assert self._stock(first) == 5
+        assert self._stock(second) == 2
+
+    def test_reserve_merges_duplicates_and_restores(self):
+        first, second = self.book_ids
+        with session_scope() as session:
+            assert (
+                order_dao.reserve_inventory(
+                    session, self.store_id, [(second, 1), (first, 2), (first, 2)]
+                )
+                is None
+            )
+        assert self._stock(first) == 1
+        assert self._stock(second) == 1
+
+        with session_scope() as session:
+            assert order_dao.adjust_inventory_for_items(
+                session, self.store_id, [(first, 4), (second, 1)], decrease=False
+            )
+        assert self._stock(first) == 5
+        assert self._stock(second) == 2
+
+    def test_reserve_missing_book(self):
+        missing = f"missing_{uuid.uuid4()}"
+        with session_scope() as session:
+            short = order_dao.reserve_inventory(
+                session, self.store_id, [(self.book_ids[0], 1), (missing, 1)]
+            )
+        assert short == missing
+        assert self._stock(self.book_ids[0]) == 5
+
+    def test_new_order_names_short_book(self):
+        buyer_id = f"buyer_reserve_{uuid.uuid4()}"
+        buyer = register_new_buyer(buyer_id, buyer_id)
+        first, second = self.book_ids
+        code, _ = buyer.new_order(self.store_id, [(first, 1), (second, 3)])
+        assert code == 517
+        assert self._stock(first) == 5
@@ -0,0 +1,135 @@
+import base64
+import json
+import uuid
+
+import pytest
+
+from be.model.buyer import Buyer as BuyerModel
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestListOrdersQueries:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        seller_id = f"seller_loq_{uuid.uuid4()}"
+        self.store_id = f"store_loq_{uuid.uuid4()}"
+        seller = register_new_seller(seller_id, seller_id)
+        assert seller.create_store(self.store_id) == 200
+        self.book_ids = []
+        for i in range(2):
+            book = Book()
+            book.id = f"book_loq_{uuid.uuid4()}"
+            book.title = f"List Orders {i}"
+            book.price = 10
+            assert seller.add_book(self.store_id, 100, book) == 200
+            self.book_ids.append(book.id)
+        self.buyer_id = f"buyer_loq_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        yield
+
+    def _create_orders(self, n):
+        for _ in range(n):
+            code, _ = self.buyer.new_order(
+                self.store_id, [(book_id, 1) for book_id in self.book_ids]
+            )
+            assert code == 200
+
+    def _list(self, **kwargs):
+        with StatementRecorder() as recorder:
+            code, _, payload = BuyerModel().list_orders(
+                self.buyer_id, None, 1, 50, **kwargs
+            )
+        assert code == 200
+        return recorder, payload
+
+    def test_items_loaded_with_one_query(self):
+        self._create_orders(1)
+        one, payload = self._list()
+        assert len(payload["orders"]) == 1
+        self._create_orders(5)
+        six, payload = self._list()
+        assert len(payload["orders"]) == 6
+        assert all(len(o["items"]) == 2 for o in payload["orders"])
+        # 之前每个订单一次明细查询（N+1），现在与订单数无关
+        assert len(one.matching("order_items")) == 1
+        assert len(six.matching("order_items")) == 1
+        assert len(one.statements) == len(six.statements)
+
+    def test_summary_mode_skips_items_table(self):
+        self._create_orders(3)
+        recorder, payload = self._list(include_items=False)
+        assert len(payload["orders"]) == 3
+        assert all("items" not in o for o in payload["orders"])
+        assert recorder.matching("order_items") == []
+
+    def test_summary_mode_over_http(self):
+        self._create_orders(1)
+        status, data = self.buyer.list_orders(include_items=False)
+        assert status == 200
+        assert data["orders"] and "items" not in data["orders"][0]
+
+    @pytest.mark.parametrize("sort_by", ["updated_at", "created_at", "total_price"])
+    def test_cursor_walks_every_order_once(self, sort_by):
+        self._create_orders(5)
+        status, data = self.buyer.list_orders(page_size=50, sort_by=sort_by)
+        assert status == 200
+        expected = [o["order_id"] for o in data["orders"]]
+        assert len(expected) == 5 and data["next_cursor"] is None
+
+        seen, cursor = [], ""
+        while True:
+            status, data = self.buyer.list_orders(
+                page_size=2, sort_by=sort_by, cursor=cursor, include_items=False
+            )
+            assert status == 200
+            assert "total" not in data
+            seen.extend(o["order_id"] for o in data["orders"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        assert seen == expected
+
+    def test_cursor_page_uses_keyset_without_count(self):
+        self._create_orders(3)
+        code, _, page = BuyerModel().list_orders(self.buyer_id, None, 1, 2)
+        assert code == 200 and page["next_cursor"]
+        with StatementRecorder() as recorder:
+            code, _, payload = BuyerModel().list_orders(
+                self.buyer_id, None, 1, 2, cursor=page["next_cursor"]
+            )
+        assert code == 200
+        assert len(payload["orders"]) == 1
+        orders_sql = recorder.matching("FROM orders")
+        assert orders_sql
+        # SQLite 方言带 LIMIT 时总会渲染 OFFSET（值为 0），这里只检查 keyset 条件
+        assert all("orders.order_id <" in s for s in orders_sql)
+        assert not any("COUNT(" in s.upper() for s in orders_sql)
+
+    def test_total_only_on_request(self):
+        self._create_orders(2)
+        status, data = self.buyer.list_orders(include_total=True)
+        assert status == 200 and data["total"] == 2
+        status, data = self.buyer.list_orders()
+        assert status == 200 and "total" not in data
+
+    def test_invalid_cursor(self):
+        self._create_orders(2)
+        status, _ = self.buyer.list_orders(cursor="not-a-cursor")
+        assert status == 521
+        # 游标与排序字段绑定，换排序字段后旧游标失效
+        status, data = self.buyer.list_orders(page_size=1, sort_by="created_at")
+        assert status == 200 and data["next_cursor"]
+        status, _ = self.buyer.list_orders(
+            sort_by="total_price", cursor=data["next_cursor"]
+        )
+        assert status == 521
+        # 结构合法但时间值无法解析的游标同样返回 521
+        for value in ("not-a-time", None, 123):
+            forged = base64.urlsafe_b64encode(
+                json.dumps(["created_at", value, "order"]).encode("utf-8")
+            ).decode("ascii")
+            status, _ = self.buyer.list_orders(sort_by="created_at", cursor=forged)
+            assert status == 521
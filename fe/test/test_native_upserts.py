@@ -0,0 +1,67 @@
+import threading
+import uuid
+
+from be.model.dao import search_dao, store_dao
+from be.model.models import Book, BookSearchIndex
+from be.model.sql_conn import session_scope
+from fe.test.query_counter import StatementRecorder
+
+
+def _book_ids(n):
+    prefix = uuid.uuid4().hex[:8]
+    return [f"upsert_{prefix}_{i}" for i in range(n)]
+
+
+def test_bulk_upsert_inserts_then_overwrites_in_one_statement():
+    ids = _book_ids(3)
+    with session_scope() as session:
+        store_dao.bulk_upsert_books(
+            session, [{"book_id": b, "title": "old", "price": 1} for b in ids[:2]]
+        )
+    with StatementRecorder() as recorder:
+        with session_scope() as session:
+            store_dao.bulk_upsert_books(
+                session, [{"book_id": b, "title": "new", "price": 2} for b in ids]
+            )
+    assert len(recorder.matching("INSERT INTO books")) == 1
+    assert recorder.matching("SELECT") == []
+    with session_scope() as session:
+        books = session.query(Book).filter(Book.book_id.in_(ids)).all()
+        assert sorted((b.book_id, b.title, b.price) for b in books) == [
+            (b, "new", 2) for b in ids
+        ]
+
+
+def test_upsert_search_index_overwrites_columns():
+    [book_id] = _book_ids(1)
+    with session_scope() as session:
+        store_dao.upsert_book(session, book_id, title="t")
+        search_dao.upsert_search_index(session, book_id, title="t", tags="a")
+    with session_scope() as session:
+        search_dao.upsert_search_index(session, book_id, title="t2", tags="b")
+    with session_scope() as session:
+        entry = session.get(BookSearchIndex, book_id)
+        assert (entry.title, entry.tags) == ("t2", "b")
+
+
+def test_concurrent_listing_of_same_new_book():
+    [book_id] = _book_ids(1)
+    errors = []
+    barrier = threading.Barrier(4)
+
+    def list_book(i):
+        try:
+            barrier.wait()
+            with session_scope() as session:
+                store_dao.upsert_book(session, book_id, title=f"title {i}")
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    workers = [threading.Thread(target=list_book, args=(i,)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert errors == []
+    with session_scope() as session:
+        assert session.get(Book, book_id).title.startswith("title ")
@@ -0,0 +1,78 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from be.model.buyer import Buyer as BuyerModel
+from be.model.dao import order_dao
+from be.model.jobs import PeriodicJob
+from be.model.sql_conn import session_scope
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestNewOrderQueries:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        seller_id = f"seller_noq_{uuid.uuid4()}"
+        self.store_id = f"store_noq_{uuid.uuid4()}"
+        seller = register_new_seller(seller_id, seller_id)
+        assert seller.create_store(self.store_id) == 200
+        self.book_ids = []
+        for i in range(6):
+            book = Book()
+            book.id = f"book_noq_{uuid.uuid4()}"
+            book.title = f"Query Count {i}"
+            book.price = 100 + i
+            assert seller.add_book(self.store_id, 10, book) == 200
+            self.book_ids.append(book.id)
+        self.buyer_id = f"buyer_noq_{uuid.uuid4()}"
+        register_new_buyer(self.buyer_id, self.buyer_id)
+        yield
+
+    def _count_new_order(self, n_books):
+        with StatementRecorder() as recorder:
+            code, _, order_id = BuyerModel().new_order(
+                self.buyer_id,
+                self.store_id,
+                [(book_id, 1) for book_id in self.book_ids[:n_books]],
+            )
+        assert code == 200 and order_id
+        return recorder
+
+    def test_inventory_lookup_does_not_grow_with_books(self):
+        one = self._count_new_order(1)
+        six = self._count_new_order(6)
+        # 一次加锁查询 + 一次 executemany 更新，与书的数量无关
+        assert len(one.matching("inventories")) == 2
+        assert len(six.matching("inventories")) == 2
+        assert not six.matching("book_info")
+
+    def test_order_total_uses_inventory_price(self):
+        code, _, order_id = BuyerModel().new_order(
+            self.buyer_id, self.store_id, [(self.book_ids[0], 2), (self.book_ids[1], 1)]
+        )
+        assert code == 200
+        with session_scope() as session:
+            assert order_dao.get_order(session, order_id).total_price == 100 * 2 + 101
+
+
+def test_recorder_ignores_background_jobs():
+    class Probe(PeriodicJob):
+        job_name = "recorder-probe"
+
+        def run_once(self):
+            with session_scope(standalone=True) as session:
+                session.execute(text("SELECT 'from_job'"))
+            self._stop_event.set()
+
+    with StatementRecorder() as recorder:
+        job = Probe(interval=0.01)
+        job.start()
+        job.join(5)
+        with session_scope(standalone=True) as session:
+            session.execute(text("SELECT 'from_test'"))
+    assert recorder.matching("from_test")
+    assert recorder.matching("from_job") == []
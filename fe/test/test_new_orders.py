@@ -0,0 +1,132 @@
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+import requests
+
+from be.model.buyer import Buyer as BuyerModel
+from be.model.dao import order_dao, store_dao
+from be.model.sql_conn import session_scope
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestNewOrders:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.stores = []
+        for s in range(3):
+            seller_id = f"seller_bulk_{uuid.uuid4()}"
+            store_id = f"store_bulk_{uuid.uuid4()}"
+            seller = register_new_seller(seller_id, seller_id)
+            assert seller.create_store(store_id) == 200
+            book_ids = []
+            for i in range(2):
+                book = Book()
+                book.id = f"book_bulk_{uuid.uuid4()}"
+                book.title = f"Bulk {s}-{i}"
+                book.price = 10 * (i + 1)
+                assert seller.add_book(store_id, 5, book) == 200
+                book_ids.append(book.id)
+            self.stores.append((store_id, book_ids))
+        self.buyer_id = f"buyer_bulk_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        yield
+
+    def _stock(self, store_id, book_id):
+        with session_scope() as session:
+            return store_dao.get_inventory(session, store_id, book_id).stock_level
+
+    def test_orders_across_stores(self):
+        groups = [
+            (store_id, [(b, 2) for b in books]) for store_id, books in self.stores
+        ]
+        code, orders = self.buyer.new_orders(groups)
+        assert code == 200
+        assert [o["store_id"] for o in orders] == [s for s, _ in self.stores]
+        with session_scope() as session:
+            for result, (store_id, books) in zip(orders, self.stores):
+                order = order_dao.get_order(session, result["order_id"])
+                assert order.store_id == store_id
+                assert order.status == "pending"
+                assert order.total_price == 2 * 10 + 2 * 20
+                assert len(order_dao.get_order_items(session, order.order_id)) == 2
+        for store_id, books in self.stores:
+            assert all(self._stock(store_id, b) == 3 for b in books)
+
+        status, data = self.buyer.list_orders(include_items=False)
+        assert status == 200 and len(data["orders"]) == 3
+
+    def test_failed_groups_do_not_block_others(self):
+        (s1, b1), (s2, b2), (s3, b3) = self.stores
+        groups = [
+            (s1, [(b1[0], 1)]),
+            (s2, [(b2[0], 1), ("missing_book", 1)]),
+            ("missing_store_" + s3, [(b3[0], 1)]),
+            (s3, [(b3[0], 9)]),
+            (s1, [(b1[0], 4)]),
+            (s1, [(b1[0], 1)]),
+        ]
+        code, orders = self.buyer.new_orders(groups)
+        assert code == 200
+        assert "order_id" in orders[0]
+        assert orders[1]["code"] == 515
+        assert orders[2]["code"] == 513
+        assert orders[3]["code"] == 517
+        # 同一本书出现在多个分组：前两组用完 5 本，第三组库存不足
+        assert "order_id" in orders[4]
+        assert orders[5]["code"] == 517
+        assert self._stock(s1, b1[0]) == 0
+        assert self._stock(s2, b2[0]) == 5
+        assert self._stock(s3, b3[0]) == 5
+
+    def test_malformed_basket_is_rejected(self):
+        store_id, books = self.stores[0]
+        url = urljoin(self.buyer.url_prefix, "new_orders")
+        headers = {"token": self.buyer.token}
+        baskets = [
+            ("not a list", 400),
+            (["not an object"], 400),
+            ([{"store_id": None, "books": []}], 513),
+            ([{"store_id": store_id, "books": "x"}], 400),
+            ([{"store_id": store_id, "books": ["x"]}], 515),
+            # None 与字符串混在一起的书号不能进入模型层的排序
+            (
+                [
+                    {
+                        "store_id": store_id,
+                        "books": [{"id": books[0], "count": 1}, {"count": 1}],
+                    }
+                ],
+                515,
+            ),
+            ([{"store_id": store_id, "books": [{"id": books[0], "count": "1"}]}], 400),
+        ]
+        for orders, expected in baskets:
+            r = requests.post(
+                url, headers=headers, json={"user_id": self.buyer_id, "orders": orders}
+            )
+            assert r.status_code == expected, orders
+            assert r.json()["orders"] == []
+        assert self._stock(store_id, books[0]) == 5
+
+    def test_unknown_user(self):
+        self.buyer.user_id = self.buyer_id + "_x"
+        code, orders = self.buyer.new_orders([(self.stores[0][0], [])])
+        assert code == 511
+        assert orders == []
+
+    def test_basket_uses_one_lock_and_one_insert_per_table(self):
+        groups = [
+            (store_id, [(b, 1) for b in books]) for store_id, books in self.stores
+        ]
+        with StatementRecorder() as recorder:
+            code, _, orders = BuyerModel().new_orders(self.buyer_id, groups)
+        assert code == 200 and len(orders) == 3
+        # 一次加锁查询 + 一次 executemany 更新，与店铺数无关
+        assert len(recorder.matching("inventories")) == 2
+        assert len(recorder.matching("INSERT INTO orders")) == 1
+        assert len(recorder.matching("INSERT INTO order_items")) == 1
+        assert len(recorder.matching("FROM bookstores")) == 1
@@ -0,0 +1,157 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from be.model import jobs
+from be.model.dao import search_dao
+from be.model.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    BookSales,
+    Order,
+    OrderItem,
+)
+from be.model.sql_conn import session_scope
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+class TestOrderArchive:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"archive_seller_{uuid.uuid4()}"
+        self.store_id = f"archive_store_{uuid.uuid4()}"
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        book = Book()
+        book.id = f"archive_book_{uuid.uuid4()}"
+        book.title = "Archive"
+        book.price = 100
+        self.tag = f"archive-{uuid.uuid4().hex[:8]}"
+        book.tags = [self.tag]
+        assert self.seller.add_book(self.store_id, 100, book) == 200
+        self.book_id = book.id
+
+        self.buyer_id = f"archive_buyer_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(10000) == 200
+        yield
+
+    def _delivered_order(self, count):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, count)])
+        assert code == 200
+        assert self.buyer.payment(order_id) == 200
+        assert self.seller.ship_order(self.store_id, order_id) == 200
+        assert self.buyer.confirm_receipt(order_id) == 200
+        return order_id
+
+    def _cancelled_order(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert code == 200
+        assert self.buyer.cancel_order(order_id)[0] == 200
+        return order_id
+
+    def _age(self, order_ids, days):
+        with session_scope() as session:
+            session.execute(
+                update(Order)
+                .where(Order.order_id.in_(order_ids))
+                .values(updated_at=datetime.utcnow() - timedelta(days=days))
+            )
+
+    def _sold_count(self):
+        with session_scope() as session:
+            results = search_dao.recommend_by_tags(
+                session, [self.tag], self.store_id, 10
+            )
+            return results[0]["sold_count"] if results else 0
+
+    def _archive(self):
+        job = jobs.OrderArchiver(
+            interval=60, older_than=timedelta(days=1), batch_size=1
+        )
+        return job.run_once()
+
+    def test_old_terminal_orders_move_to_archive(self):
+        delivered = [self._delivered_order(2), self._delivered_order(3)]
+        cancelled = self._cancelled_order()
+        _, pending = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        recent = self._delivered_order(1)
+        self._age(delivered + [cancelled, pending], days=2)
+        assert self._sold_count() == 6
+
+        assert self._archive() >= 3
+
+        moved = delivered + [cancelled]
+        with session_scope() as session:
+            hot_ids = {
+                row.order_id
+                for row in session.query(Order.order_id).filter(
+                    Order.user_id == self.buyer_id
+                )
+            }
+            assert hot_ids == {pending, recent}
+            assert (
+                session.query(OrderItem).filter(OrderItem.order_id.in_(moved)).count()
+                == 0
+            )
+            archived = session.query(ArchivedOrder).filter(
+                ArchivedOrder.user_id == self.buyer_id
+            )
+            assert {order.order_id for order in archived} == set(moved)
+            assert (
+                session.query(ArchivedOrderItem)
+                .filter(ArchivedOrderItem.order_id.in_(moved))
+                .count()
+                == 3
+            )
+            sales = session.get(BookSales, self.book_id)
+            assert sales.sold_count == 5
+            assert sales.sales_amount == 500
+        # 归档前后推荐看到的销量一致
+        assert self._sold_count() == 6
+
+    def test_list_orders_with_history(self):
+        old = self._delivered_order(2)
+        recent = self._delivered_order(1)
+        self._age([old], days=2)
+        self._archive()
+
+        code, payload = self.buyer.list_orders()
+        assert code == 200
+        assert [order["order_id"] for order in payload["orders"]] == [recent]
+
+        code, payload = self.buyer.list_orders(
+            include_history=True, page_size=1, include_total=True
+        )
+        assert code == 200
+        assert payload["total"] == 2
+        assert [order["order_id"] for order in payload["orders"]] == [recent]
+        code, payload = self.buyer.list_orders(
+            include_history=True, page_size=1, cursor=payload["next_cursor"]
+        )
+        assert code == 200
+        assert [order["order_id"] for order in payload["orders"]] == [old]
+        assert payload["orders"][0]["status"] == "delivered"
+        assert payload["orders"][0]["items"] == [
+            {"book_id": self.book_id, "count": 2, "price": 100}
+        ]
+        assert payload["next_cursor"] is None
+
+        code, text = self.buyer.export_orders(fmt="ndjson", include_history=True)
+        assert code == 200
+        assert old in text and recent in text
+
+    def test_active_orders_are_not_archived(self):
+        _, pending = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        _, paid = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert self.buyer.payment(paid) == 200
+        self._age([pending, paid], days=2)
+        self._archive()
+        with session_scope() as session:
+            assert session.get(Order, pending) is not None
+            assert session.get(Order, paid) is not None
+            assert session.get(ArchivedOrder, paid) is None
@@ -0,0 +1,214 @@
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+
+import pytest
+import requests
+from sqlalchemy import func
+
+from be.model.dao import order_dao
+from be.model.events import OrderEvents
+from be.model.models import OrderEvent
+from be.model.sql_conn import session_scope
+from fe import conf
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestOrderEvents:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"seller_events_{uuid.uuid4()}"
+        self.store_id = f"store_events_{uuid.uuid4()}"
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        book = Book()
+        book.id = f"book_events_{uuid.uuid4()}"
+        book.title = "Events"
+        book.price = 10
+        assert self.seller.add_book(self.store_id, 100, book) == 200
+        self.book_id = book.id
+        self.buyer_id = f"buyer_events_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(1000) == 200
+        OrderEvents().sequence_events()
+        with session_scope() as session:
+            self.start = session.query(func.max(OrderEvent.seq)).scalar() or 0
+        self.url = urljoin(conf.URL, "events/orders")
+        yield
+
+    def _read_all(self, page_size=2):
+        # 后台 OrderEventSequencer 定期编号，这里直接补编，不必等待下一轮
+        OrderEvents().sequence_events()
+        events = []
+        after = self.start
+        while True:
+            r = requests.get(self.url, params={"after": after, "limit": page_size})
+            assert r.status_code == 200
+            body = r.json()
+            events.extend(body["events"])
+            if not body["events"]:
+                assert body["next_after"] == after
+                return events
+            after = body["next_after"]
+
+    def _transitions(self, events, order_id):
+        return [
+            (e["from_status"], e["to_status"])
+            for e in events
+            if e["order_id"] == order_id
+        ]
+
+    def test_every_transition_is_recorded_in_order(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert code == 200
+        assert self.buyer.payment(order_id) == 200
+        assert self.seller.ship_order(self.store_id, order_id) == 200
+        assert self.buyer.confirm_receipt(order_id) == 200
+        code, cancelled = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert self.buyer.cancel_order(cancelled)[0] == 200
+
+        events = self._read_all()
+        ids = [e["id"] for e in events]
+        assert ids == sorted(ids)
+        assert self._transitions(events, order_id) == [
+            (None, "pending"),
+            ("pending", "paid"),
+            ("paid", "shipped"),
+            ("shipped", "delivered"),
+        ]
+        assert self._transitions(events, cancelled) == [
+            (None, "pending"),
+            ("pending", "cancelled"),
+        ]
+        mine = [e for e in events if e["order_id"] == order_id]
+        assert all(e["user_id"] == self.buyer_id for e in mine)
+        assert all(e["store_id"] == self.store_id for e in mine)
+
+    def test_bulk_paths_write_one_event_per_order(self):
+        paid = []
+        for _ in range(3):
+            code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+            assert self.buyer.payment(order_id) == 200
+            paid.append(order_id)
+        code, payload = self.seller.ship_orders(self.store_id, paid)
+        assert code == 200
+        code, orders = self.buyer.new_orders(
+            [(self.store_id, [(self.book_id, 1)]), (self.store_id, [(self.book_id, 2)])]
+        )
+        assert code == 200
+
+        events = self._read_all(page_size=50)
+        for order_id in paid:
+            assert self._transitions(events, order_id) == [
+                (None, "pending"),
+                ("pending", "paid"),
+                ("paid", "shipped"),
+            ]
+        for order in orders:
+            assert self._transitions(events, order["order_id"]) == [(None, "pending")]
+
+    def _event_count(self, order_id, to_status):
+        with session_scope() as session:
+            return (
+                session.query(OrderEvent)
+                .filter(OrderEvent.order_id == order_id, OrderEvent.to_status == to_status)
+                .count()
+            )
+
+    def test_bulk_updates_only_record_transitioned_orders(self):
+        code, shipped = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert self.buyer.payment(shipped) == 200
+        assert self.seller.ship_order(self.store_id, shipped) == 200
+        code, paid = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert self.buyer.payment(paid) == 200
+        now = datetime.utcnow()
+
+        # 已是目标状态的订单、属于其它店铺的订单都不能写出事件
+        for store_id, order_ids in (
+            (self.store_id, [paid, shipped]),
+            (f"other_{self.store_id}", [paid]),
+        ):
+            with pytest.raises(RuntimeError):
+                with session_scope() as session:
+                    order_dao.ship_store_orders(session, store_id, order_ids, now)
+        with pytest.raises(RuntimeError):
+            with session_scope() as session:
+                order_dao.update_orders_status(
+                    session, [paid, shipped], "paid", "shipped", updated_at=now
+                )
+        assert self._event_count(shipped, "shipped") == 1
+        assert self._event_count(paid, "shipped") == 0
+
+        with session_scope() as session:
+            assert order_dao.ship_store_orders(session, self.store_id, [paid, paid], now) == 1
+        assert self._event_count(paid, "shipped") == 1
+
+    def _insert_event(self, event_id, order_id):
+        with session_scope() as session:
+            session.add(
+                OrderEvent(
+                    id=event_id,
+                    order_id=order_id,
+                    user_id=self.buyer_id,
+                    store_id=self.store_id,
+                    from_status="pending",
+                    to_status="paid",
+                    created_at=datetime.utcnow() - timedelta(minutes=5),
+                )
+            )
+
+    def test_late_commit_with_smaller_id_is_not_skipped(self):
+        with session_scope() as session:
+            base = (session.query(func.max(OrderEvent.id)).scalar() or 0) + 1000
+        # 较大的 id 先提交并被消费者读过，较小的 id 之后才提交（如长时间锁等待后）
+        self._insert_event(base + 2, "early_commit")
+        events = self._read_all()
+        assert [e["order_id"] for e in events] == ["early_commit"]
+        self.start = events[-1]["seq"]
+        self._insert_event(base + 1, "late_commit")
+        events = self._read_all()
+        assert [(e["order_id"], e["id"]) for e in events] == [("late_commit", base + 1)]
+        assert events[0]["seq"] > self.start
+
+    def test_reading_does_not_number_events(self):
+        self._insert_event(None, "unnumbered")
+        with StatementRecorder() as recorder:
+            r = requests.get(self.url, params={"after": self.start})
+        assert r.status_code == 200
+        assert recorder.statements
+        assert all(s.lstrip().upper().startswith("SELECT") for s in recorder.statements)
+        events = self._read_all()
+        assert [e["order_id"] for e in events] == ["unnumbered"]
+
+    def test_invalid_after(self):
+        r = requests.get(self.url, params={"after": "abc"})
+        assert r.status_code == 521
+
+    def test_purge_old_events(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert code == 200
+        with session_scope() as session:
+            session.query(OrderEvent).filter(OrderEvent.order_id == order_id).update(
+                {"created_at": datetime.utcnow() - timedelta(days=30)}
+            )
+        assert self.buyer.payment(order_id) == 200
+        OrderEvents().sequence_events()
+        assert OrderEvents().purge_expired(retention_days=7) >= 1
+        assert self._event_count(order_id, "pending") == 0
+        assert self._event_count(order_id, "paid") == 1
+
+    def test_purge_keeps_the_last_seq(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert code == 200
+        OrderEvents().sequence_events()
+        with session_scope() as session:
+            last_seq = session.query(func.max(OrderEvent.seq)).scalar()
+        OrderEvents().purge_expired(retention_days=-1)
+        with session_scope() as session:
+            assert session.query(func.max(OrderEvent.seq)).scalar() == last_seq
+        self._insert_event(None, "after_purge")
+        events = self._read_all()
+        assert [e["order_id"] for e in events if e["seq"] > last_seq] == ["after_purge"]
@@ -0,0 +1,88 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from be.model import metrics
+from be.model.buyer import Buyer
+from be.model.dao import order_dao, store_dao
+from be.model.jobs import OrderExpirySweeper
+from be.model.models import Order
+from be.model.sql_conn import session_scope
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+class TestOrderExpiry:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        seller_id = f"seller_expiry_{uuid.uuid4()}"
+        self.store_id = f"store_expiry_{uuid.uuid4()}"
+        seller = register_new_seller(seller_id, seller_id)
+        assert seller.create_store(self.store_id) == 200
+        book = Book()
+        book.id = f"book_expiry_{uuid.uuid4()}"
+        book.title = "Expiry"
+        book.price = 10
+        assert seller.add_book(self.store_id, 5, book) == 200
+        self.book_id = book.id
+        buyer_id = f"buyer_expiry_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(buyer_id, buyer_id)
+        assert self.buyer.add_funds(1000) == 200
+        yield
+
+    def _create_expired_order(self, count=2):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, count)])
+        assert code == 200
+        with session_scope() as session:
+            order = order_dao.get_order(session, order_id)
+            order.expires_at = datetime.utcnow() - timedelta(seconds=30)
+        return order_id
+
+    def _state(self, order_id):
+        with session_scope() as session:
+            order = order_dao.get_order(session, order_id)
+            inventory = store_dao.get_inventory(session, self.store_id, self.book_id)
+            return order.status, inventory.stock_level
+
+    def test_sweeper_cancels_and_restores_stock(self):
+        order_ids = [self._create_expired_order(count=1) for _ in range(3)]
+        OrderExpirySweeper(interval=60, batch_size=2).run_once()
+        for order_id in order_ids:
+            assert self._state(order_id) == ("cancelled_timeout", 5)
+        assert metrics.snapshot()["gauges"]["order_expiry.sweep_lag_seconds"] >= 0
+
+    def test_lag_gauge_resets_when_backlog_clears(self):
+        self._create_expired_order(count=1)
+        OrderExpirySweeper(interval=60, batch_size=200).run_once()
+        metrics.set_gauge("order_expiry.sweep_lag_seconds", 42)
+        assert Buyer().cancel_expired_orders(limit=200) == 0
+        assert metrics.snapshot()["gauges"]["order_expiry.sweep_lag_seconds"] == 0
+
+    def test_find_expired_respects_limit(self):
+        self._create_expired_order(count=1)
+        self._create_expired_order(count=1)
+        with session_scope() as session:
+            expired = order_dao.find_expired_pending_orders(
+                session, datetime.utcnow(), limit=1
+            )
+        assert len(expired) <= 1
+
+    def test_payment_on_expired_order_is_rejected(self):
+        order_id = self._create_expired_order()
+        assert self.buyer.payment(order_id) == 520
+        assert self._state(order_id) == ("cancelled_timeout", 5)
+
+    def test_backfill_expires_at(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        assert code == 200
+        with session_scope() as session:
+            order = order_dao.get_order(session, order_id)
+            order.expires_at = None
+            created_at = order.created_at
+        with session_scope() as session:
+            assert order_dao.backfill_expires_at(session, 60) >= 1
+        with session_scope() as session:
+            order = session.get(Order, order_id)
+            assert order.expires_at == created_at + timedelta(seconds=60)
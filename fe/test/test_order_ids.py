@@ -0,0 +1,136 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from be.model import ids
+from be.model.dao import order_dao
+from be.model.sql_conn import session_scope
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+def test_encode_roundtrip_and_order():
+    for value in (0, 1, 31, 32, 2**40 + 7, 2**64 - 1):
+        text = ids.encode(value)
+        assert len(text) == ids.ID_LENGTH
+        assert ids.decode(text) == value
+    assert ids.encode(41) < ids.encode(42) < ids.encode(2**50)
+    with pytest.raises(ValueError):
+        ids.decode("short")
+    with pytest.raises(ValueError):
+        ids.decode("UUUUUUUUUUUUU")
+
+
+def test_generator_is_monotonic_and_unique_across_threads():
+    generator = ids.SnowflakeGenerator(worker_id=3)
+
+    def batch(_):
+        return [generator.next_id() for _ in range(2000)]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        generated = [i for chunk in pool.map(batch, range(4)) for i in chunk]
+    assert len(set(generated)) == len(generated)
+
+    sequential = [generator.next_id() for _ in range(5000)]
+    assert sequential == sorted(sequential)
+    now_ms = int(time.time() * 1000)
+    assert abs(ids.timestamp_ms(sequential[-1]) - now_ms) < 5000
+
+
+def _forked_worker_ids(workers: int):
+    """Fork like ``serve._run_prefork`` and return each child's (worker id, order ids)."""
+    children = []
+    for index in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                ids.set_worker_index(index)
+                generated = [ids.new_id() for _ in range(200)]
+                os.write(write_fd, " ".join(generated).encode("ascii"))
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+    results = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd, "rb") as f:
+            generated = f.read().decode("ascii").split()
+        os.waitpid(pid, 0)
+        worker_ids = {
+            (ids.decode(i) >> ids.SEQUENCE_BITS) & ids.MAX_WORKER_ID for i in generated
+        }
+        results.append((worker_ids, generated))
+    return results
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+@pytest.mark.parametrize("base", [None, "1022"])
+def test_forked_workers_get_distinct_worker_ids(monkeypatch, base):
+    if base is None:
+        monkeypatch.delenv("BOOKSTORE_WORKER_ID", raising=False)
+    else:
+        monkeypatch.setenv("BOOKSTORE_WORKER_ID", base)
+    results = _forked_worker_ids(4)
+    worker_ids = [worker_id for worker_id_set, _ in results for worker_id in worker_id_set]
+    assert len(worker_ids) == 4
+    assert len(set(worker_ids)) == 4
+    generated = [i for _, chunk in results for i in chunk]
+    assert len(set(generated)) == len(generated)
+
+
+def test_worker_index_out_of_range():
+    with pytest.raises(ValueError):
+        ids.set_worker_index(ids.MAX_WORKER_ID + 1)
+
+
+class TestOrderIds:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        seller_id = f"seller_ids_{uuid.uuid4()}"
+        self.store_id = f"store_ids_{uuid.uuid4()}"
+        seller = register_new_seller(seller_id, seller_id)
+        assert seller.create_store(self.store_id) == 200
+        book = Book()
+        book.id = f"book_ids_{uuid.uuid4()}"
+        book.title = "Ids"
+        book.price = 10
+        assert seller.add_book(self.store_id, 10, book) == 200
+        self.book_id = book.id
+        self.buyer_id = f"buyer_ids_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(100) == 200
+        yield
+
+    def test_new_orders_get_compact_ids(self):
+        order_ids = []
+        for _ in range(3):
+            code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+            assert code == 200
+            assert len(order_id) == ids.ID_LENGTH
+            order_ids.append(order_id)
+        assert order_ids == sorted(order_ids)
+
+    def test_legacy_ids_still_resolve(self):
+        legacy_id = f"{self.buyer_id}_{self.store_id}_{uuid.uuid1()}"
+        with session_scope() as session:
+            order_dao.create_order(
+                session,
+                order_id=legacy_id,
+                user_id=self.buyer_id,
+                store_id=self.store_id,
+                status="pending",
+                total_price=10,
+                expires_at=datetime.utcnow() + timedelta(minutes=5),
+            )
+            order_dao.add_order_items(session, legacy_id, [(self.book_id, 1, 10)])
+        assert self.buyer.payment(legacy_id) == 200
+        status, data = self.buyer.list_orders(status="paid")
+        assert status == 200
+        assert [o["order_id"] for o in data["orders"]] == [legacy_id]
@@ -138,7 +138,9 @@ class TestOrderManagement:
         assert order_ids[0] in ids
         assert all(o["status"] == "paid" for o in data.get("orders", []))
 
-        status, data = self.buyer.list_orders(page=2, page_size=2)
+        status, data = self.buyer.list_orders(
+            page=2, page_size=2, include_total=True
+        )
         assert status == 200
         assert data.get("page") == 2
         assert data.get("page_size") == 2
@@ -0,0 +1,66 @@
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+import requests
+
+from be.model import sql_conn
+from be.model.dao import user_dao
+from fe import conf
+from fe.access.book import Book
+from fe.access.new_seller import register_new_seller
+
+
+@pytest.fixture
+def request_unit():
+    unit = sql_conn.begin_request_unit()
+    yield unit
+    sql_conn.end_request_unit()
+
+
+def test_scopes_share_one_session(request_unit):
+    with sql_conn.session_scope() as first:
+        pass
+    with sql_conn.session_scope() as second:
+        pass
+    assert first is second
+    assert request_unit.session is first
+
+
+def test_failed_scope_rolls_back_whole_request(request_unit):
+    user_id = f"unit_rollback_{uuid.uuid4()}"
+    with sql_conn.session_scope() as session:
+        user_dao.create_user(session, user_id, "pwd", "token", "terminal")
+    with pytest.raises(RuntimeError):
+        with sql_conn.session_scope():
+            raise RuntimeError("boom")
+    assert request_unit.failed is True
+    assert sql_conn.commit_request_unit() is True
+    sql_conn.end_request_unit()
+
+    with sql_conn.session_scope() as session:
+        assert user_dao.get_user(session, user_id) is None
+
+
+def test_add_book_uses_single_pool_checkout():
+    seller_id = f"seller_unit_{uuid.uuid4()}"
+    store_id = f"store_unit_{uuid.uuid4()}"
+    seller = register_new_seller(seller_id, seller_id)
+    assert seller.create_store(store_id) == 200
+
+    book = Book()
+    book.id = f"book_unit_{uuid.uuid4()}"
+    book.title = "Unit Of Work"
+    r = requests.post(
+        urljoin(conf.URL, "seller/add_book"),
+        headers={"token": seller.token},
+        json={
+            "user_id": seller_id,
+            "store_id": store_id,
+            "book_info": book.__dict__,
+            "stock_level": 1,
+        },
+    )
+    assert r.status_code == 200
+    # 用户/店铺/图书存在性检查与写入共用一个连接
+    assert r.headers.get("X-DB-Checkouts") == "1"
@@ -1,3 +1,5 @@
+import base64
+import hashlib
 import uuid
 
 from fe import conf
@@ -85,3 +87,21 @@ class TestSearchBooks:
             *(item["book_id"] for item in second_page.get("books", [])),
         }
         assert set(ids).issubset(combined_ids)
+
+    def test_search_returns_listed_book_info(self):
+        book = make_book(self.keyword, "roundtrip")
+        book.price = 3200
+        book.content = "long " * 400
+        book.pictures = ["aGVsbG8=", "d29ybGQ="]
+        assert self.seller.add_book(self.store_id, 10, book) == 200
+
+        status, data = self.search_client.books(self.keyword, store_id=self.store_id)
+        assert status == 200
+        [item] = [b for b in data["books"] if b["book_id"] == book.id]
+        info = item["book_info"]
+        for key, value in book.__dict__.items():
+            if key != "pictures":
+                assert info[key] == value, key
+        assert info["pictures"] == [
+            hashlib.sha256(base64.b64decode(p)).hexdigest() for p in book.pictures
+        ]
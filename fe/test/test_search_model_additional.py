@@ -14,13 +14,15 @@ def dummy_session_scope():
     return _scope
 
 
-def test_search_books_invalid_json(monkeypatch):
+def test_search_books_rebuilds_book_info(monkeypatch):
     captured = {}
 
     def fake_search(session, **kwargs):
         captured.update(kwargs)
-        inv = SimpleNamespace(store_id="store", stock_level=5, book_info="not json")
-        book = SimpleNamespace(book_id="book1")
+        inv = SimpleNamespace(store_id="store", book_id="book1", stock_level=5, price=10)
+        book = SimpleNamespace(
+            book_id="book1", title="T", price=10, has_external_longtext=False
+        )
         return 1, [{"inventory": inv, "book": book}]
 
     monkeypatch.setattr(search_dao, "search_books", fake_search)
@@ -31,7 +33,10 @@ def test_search_books_invalid_json(monkeypatch):
     assert code == 200
     assert payload["page"] == 1
     assert payload["page_size"] == 50
-    assert payload["books"][0]["book_info"] == {}
+    info = payload["books"][0]["book_info"]
+    assert info["id"] == "book1"
+    assert info["title"] == "T"
+    assert info["price"] == 10
     assert captured["store_id"] == "store-x"
 
 
@@ -57,7 +62,9 @@ def test_search_books_default_pagination(monkeypatch):
 
     def fake_search(session, **kwargs):
         captured.update(kwargs)
-        inv = SimpleNamespace(store_id="store", stock_level=1, book_info="{}")
+        inv = SimpleNamespace(
+            store_id="store", book_id="book-default", stock_level=1, price=0
+        )
         book = SimpleNamespace(book_id="book-default")
         return 0, [{"inventory": inv, "book": book}]
 
@@ -133,7 +140,7 @@ def test_search_books_by_image_cache_hit(monkeypatch, tmp_path):
                 store_id="store",
                 book_id="cached-book",
                 stock_level=1,
-                book_info=json.dumps({"title": "cached"}),
+                price=0,
             ),
             SimpleNamespace(book_id="cached-book"),
         )
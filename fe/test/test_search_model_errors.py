@@ -1,4 +1,3 @@
-import json
 import os
 import tempfile
 from pathlib import Path
@@ -93,7 +92,7 @@ def test_search_books_by_image_target_book_fallback(monkeypatch):
                         store_id="store",
                         book_id="target",
                         stock_level=1,
-                        book_info=json.dumps({"title": "fallback"}),
+                        price=0,
                     )
                     book = SimpleNamespace(book_id="target")
                     return [(inv, book)]
@@ -1,9 +1,15 @@
 import pytest
 import uuid
 
+from sqlalchemy import event
+
+from be.model import sql_conn
+from be.model.dao import store_dao
+from be.model.seller import Seller
 from fe import conf
 from fe.access import book
 from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
 
 
 class TestSellerBatchAdd:
@@ -48,3 +54,83 @@ class TestSellerBatchAdd:
         payload = self._payload(self.books[:1])
         code, _ = self.seller.batch_add_books(self.store_id + "_invalid", payload)
         assert code != 200
+
+    def test_batch_add_duplicate_in_batch(self):
+        payload = self._payload(self.books[:1]) + self._payload(self.books[:1])
+        code, resp = self.seller.batch_add_books(self.store_id, payload)
+        assert code == 200
+        assert resp["message"] == "partial failure"
+        assert [item["code"] for item in resp["results"]] == [200, 516]
+
+    def test_batch_add_statement_count_is_constant(self):
+        def _run(count):
+            payload = []
+            for i in range(count):
+                payload.append(
+                    {
+                        "book_info": {"id": f"bulk_{uuid.uuid4()}", "title": f"t{i}"},
+                        "stock_level": 1,
+                    }
+                )
+            with StatementRecorder() as recorder:
+                code, _, results = Seller().batch_add_books(
+                    self.seller_id, self.store_id, payload
+                )
+            assert code == 200
+            assert all(item["code"] == 200 for item in results)
+            return len(recorder.statements)
+
+        assert _run(2) == _run(20)
+
+    def _new_payload(self, count):
+        return [
+            {"book_info": {"id": f"bulk_{uuid.uuid4()}", "title": f"t{i}"}, "stock_level": 1}
+            for i in range(count)
+        ]
+
+    def _listed(self, book_ids):
+        with sql_conn.session_scope(standalone=True) as session:
+            return store_dao.get_inventory_book_ids(session, self.store_id, book_ids)
+
+    def test_batch_add_db_error_on_one_row(self):
+        payload = self._new_payload(3)
+        bad_id = payload[1]["book_info"]["id"]
+
+        def fail_on_bad_row(conn, cursor, statement, parameters, context, executemany):
+            rows = parameters if executemany else [parameters]
+            if statement.lstrip().upper().startswith("INSERT INTO INVENTORIES") and any(
+                bad_id in (row.values() if isinstance(row, dict) else row) for row in rows
+            ):
+                raise conn.dialect.dbapi.OperationalError("injected failure")
+
+        event.listen(sql_conn.engine, "before_cursor_execute", fail_on_bad_row)
+        try:
+            code, message, results = Seller().batch_add_books(
+                self.seller_id, self.store_id, payload
+            )
+        finally:
+            event.remove(sql_conn.engine, "before_cursor_execute", fail_on_bad_row)
+        assert code == 200
+        assert message == "partial failure"
+        assert [item["code"] for item in results] == [200, 530, 200]
+        assert "injected failure" in results[1]["message"]
+        book_ids = [entry["book_info"]["id"] for entry in payload]
+        assert self._listed(book_ids) == {book_ids[0], book_ids[2]}
+
+    def test_batch_add_concurrent_duplicate(self, monkeypatch):
+        payload = self._new_payload(3)
+        raced = book.Book()
+        raced.id = payload[2]["book_info"]["id"]
+        raced.title = payload[2]["book_info"]["title"]
+        assert self.seller.add_book(self.store_id, 5, raced) == 200
+        # 模拟另一请求在存在性检查之后插入了同一条上架
+        monkeypatch.setattr(store_dao, "get_inventory_book_ids", lambda *args: set())
+        code, message, results = Seller().batch_add_books(
+            self.seller_id, self.store_id, payload
+        )
+        assert code == 200
+        assert message == "partial failure"
+        assert [item["code"] for item in results] == [200, 200, 516]
+        monkeypatch.undo()
+        book_ids = [entry["book_info"]["id"] for entry in payload]
+        assert self._listed(book_ids) == set(book_ids)
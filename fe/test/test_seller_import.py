@@ -0,0 +1,92 @@
+import json
+import uuid
+
+import pytest
+
+from be.model.dao import store_dao
+from be.model.seller import Seller as SellerModel
+from be.model.sql_conn import session_scope
+from fe.access.new_seller import register_new_seller
+
+
+class TestSellerImport:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"seller_import_{uuid.uuid4()}"
+        self.store_id = f"store_import_{uuid.uuid4()}"
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        prefix = uuid.uuid4().hex[:8]
+        self.book_ids = [f"import_{prefix}_{i}" for i in range(23)]
+        self.lines = [
+            {"book_info": {"id": book_id, "title": f"Import {i}"}, "stock_level": 3}
+            for i, book_id in enumerate(self.book_ids)
+        ]
+        self.lines.insert(5, "")
+        self.lines.insert(12, "not json")
+        self.lines.append(self.lines[0])
+        yield
+
+    def _listed(self):
+        with session_scope() as session:
+            return store_dao.get_inventory_book_ids(
+                session, self.store_id, self.book_ids
+            )
+
+    def test_import_commits_in_batches(self):
+        code, progress = self.seller.import_books(
+            self.store_id, self.lines, batch_size=10
+        )
+        assert code == 200
+        *batches, done = progress
+        assert [p["committed_line"] for p in batches] == [11, 21, 26]
+        assert done == {
+            "done": True,
+            "committed_line": len(self.lines),
+            "ok": 23,
+            "failed": 2,
+        }
+        errors = [e for p in batches for e in p["errors"]]
+        assert [(e["line"], e["code"]) for e in errors] == [(13, 530), (26, 516)]
+        assert self._listed() == set(self.book_ids)
+
+    def test_resume_from_committed_line(self):
+        code, progress = self.seller.import_books(
+            self.store_id, self.lines[:15], batch_size=10
+        )
+        assert code == 200
+        resume_from = progress[-1]["committed_line"]
+        assert resume_from == 15
+
+        code, progress = self.seller.import_books(
+            self.store_id, self.lines, batch_size=10, resume_from=resume_from
+        )
+        assert code == 200
+        done = progress[-1]
+        assert (done["ok"], done["failed"]) == (len(self.book_ids) - 13, 1)
+        assert self._listed() == set(self.book_ids)
+
+    def test_store_checks(self):
+        code, _ = self.seller.import_books(self.store_id + "_x", self.lines)
+        assert code == 513
+        other = register_new_seller(f"seller_other_{uuid.uuid4()}", "pw")
+        code, _ = other.import_books(self.store_id, self.lines)
+        assert code == 401
+        assert self._listed() == set()
+
+    def test_request_body_is_consumed_per_batch(self):
+        consumed = []
+
+        def body():
+            for i, line in enumerate(self.lines):
+                consumed.append(i)
+                yield (line if isinstance(line, str) else json.dumps(line)).encode()
+
+        code, _, chunks = SellerModel().import_books(
+            self.seller_id, self.store_id, body(), batch_size=5
+        )
+        assert code == 200
+        first = json.loads(next(chunks))
+        assert first["committed_line"] == 5
+        assert len(consumed) == 5
+        assert json.loads(list(chunks)[-1])["done"] is True
@@ -12,7 +12,7 @@ from be.model.dao import order_dao, store_dao
 def dummy_session_scope():
     @contextlib.contextmanager
     def _scope():
-        yield SimpleNamespace()
+        yield SimpleNamespace(begin_nested=contextlib.nullcontext)
 
     return _scope
 
@@ -104,7 +104,24 @@ def test_batch_add_books_all_success(monkeypatch):
     s = seller_module.Seller()
     monkeypatch.setattr(seller_module.Seller, "user_id_exist", lambda self, _: True)
     monkeypatch.setattr(seller_module.Seller, "store_id_exist", lambda self, _: True)
-    monkeypatch.setattr(seller_module.Seller, "add_book", lambda *args, **kwargs: (200, "ok"))
+    s.session_scope = dummy_session_scope()
+    written = {}
+    monkeypatch.setattr(
+        store_dao, "get_inventory_book_ids", lambda session, store_id, ids: set()
+    )
+    monkeypatch.setattr(
+        store_dao, "bulk_upsert_books", lambda session, rows: written.update(books=rows)
+    )
+    monkeypatch.setattr(
+        store_dao,
+        "bulk_add_inventory",
+        lambda session, rows: written.update(inventory=rows),
+    )
+    monkeypatch.setattr(
+        seller_module.search_dao,
+        "bulk_upsert_search_index",
+        lambda session, rows: written.update(search=rows),
+    )
     books = [
         {"book_info": {"id": "book1"}, "stock_level": 5},
         {"book_info": {"id": "book2"}, "stock_level": 3},
@@ -113,6 +130,9 @@ def test_batch_add_books_all_success(monkeypatch):
     assert code == 200
     assert message == "ok"
     assert all(item["code"] == 200 for item in results)
+    assert [row["book_id"] for row in written["books"]] == ["book1", "book2"]
+    assert [row["stock_level"] for row in written["inventory"]] == [5, 3]
+    assert len(written["search"]) == 2
 
 
 def test_add_book_success(monkeypatch):
@@ -0,0 +1,85 @@
+import uuid
+
+import pytest
+
+from be.model.seller import Seller as SellerModel
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestSellerOrders:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"seller_queue_{uuid.uuid4()}"
+        self.store_id = f"store_queue_{uuid.uuid4()}"
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        self.book_ids = []
+        for i in range(2):
+            book = Book()
+            book.id = f"book_queue_{uuid.uuid4()}"
+            book.title = f"Queue {i}"
+            book.price = 10
+            assert self.seller.add_book(self.store_id, 100, book) == 200
+            self.book_ids.append(book.id)
+        self.buyer_id = f"buyer_queue_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(10000) == 200
+        yield
+
+    def _order(self, pay=True):
+        code, order_id = self.buyer.new_order(
+            self.store_id, [(book_id, 1) for book_id in self.book_ids]
+        )
+        assert code == 200
+        if pay:
+            assert self.buyer.payment(order_id) == 200
+        return order_id
+
+    def test_paid_queue_pages_oldest_first(self):
+        paid = [self._order() for _ in range(5)]
+        self._order(pay=False)
+        shipped = self._order()
+        assert self.seller.ship_order(self.store_id, shipped) == 200
+
+        seen = []
+        cursor = ""
+        while True:
+            code, payload = self.seller.list_orders(
+                self.store_id, status="paid", page_size=2, cursor=cursor
+            )
+            assert code == 200
+            assert all(order["status"] == "paid" for order in payload["orders"])
+            assert all(len(order["items"]) == 2 for order in payload["orders"])
+            seen.extend(order["order_id"] for order in payload["orders"])
+            cursor = payload["next_cursor"]
+            if not cursor:
+                break
+        assert seen == paid
+
+    def test_items_loaded_with_one_query(self):
+        for _ in range(4):
+            self._order()
+        with StatementRecorder() as recorder:
+            code, _, payload = SellerModel().list_store_orders(
+                self.seller_id, self.store_id, "paid", page_size=10
+            )
+        assert code == 200
+        assert len(payload["orders"]) == 4
+        assert len(recorder.matching("order_items")) == 1
+
+    def test_non_owner_rejected(self):
+        other_id = f"seller_queue_other_{uuid.uuid4()}"
+        other = register_new_seller(other_id, other_id)
+        code, _ = other.list_orders(self.store_id, status="paid")
+        assert code == 401
+
+    def test_unknown_store_and_bad_cursor(self):
+        code, _ = self.seller.list_orders(self.store_id + "_x", status="paid")
+        assert code == 513
+        code, _ = self.seller.list_orders(
+            self.store_id, status="paid", cursor="not-a-cursor"
+        )
+        assert code == 521
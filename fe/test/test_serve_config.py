@@ -0,0 +1,87 @@
+import json
+import os
+import socket
+
+import pytest
+
+from be import serve
+from be.model import metrics
+
+
+def test_serve_config_defaults(monkeypatch):
+    monkeypatch.delenv("BOOKSTORE_SERVE_MODE", raising=False)
+    monkeypatch.delenv("BOOKSTORE_WORKERS", raising=False)
+    assert serve._serve_config() == ("single", serve.DEFAULT_WORKERS)
+
+
+def test_serve_config_from_env(monkeypatch):
+    monkeypatch.setenv("BOOKSTORE_SERVE_MODE", "Process")
+    monkeypatch.setenv("BOOKSTORE_WORKERS", "8")
+    assert serve._serve_config() == ("process", 8)
+    # 显式参数优先于环境变量，worker 数至少为 1
+    assert serve._serve_config("thread", 0) == ("thread", 1)
+
+
+def test_serve_config_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        serve._serve_config("gevent", 2)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_metrics_are_merged_across_forked_workers(tmp_path):
+    # 模拟 _run_prefork：每个 worker 把自己的指标写进共享目录
+    pids = []
+    for index in range(2):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                metrics.reset()
+                metrics.share_across_processes(str(tmp_path), "worker-{}".format(index))
+                metrics.incr("tx.new_order.retry", index + 1)
+                if index == 0:
+                    metrics.set_gauge("order_expiry.sweep_lag_seconds", 3)
+                metrics.flush()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    before = metrics.snapshot()
+    try:
+        metrics.share_across_processes(str(tmp_path), "reader")
+        merged = metrics.snapshot()
+    finally:
+        metrics.share_across_processes(None)
+    assert merged["counters"]["tx.new_order.retry"] == 3 + before["counters"].get(
+        "tx.new_order.retry", 0
+    )
+    assert merged["gauges"]["order_expiry.sweep_lag_seconds"] >= 3
+
+
+def test_metrics_updates_are_flushed_not_written_per_call(tmp_path, monkeypatch):
+    monkeypatch.setenv("BOOKSTORE_METRICS_FLUSH_INTERVAL", "3600")
+    path = tmp_path / "worker-0.json"
+    try:
+        metrics.share_across_processes(str(tmp_path), "worker-0")
+        published = json.loads(path.read_text())["counters"].get("probe.flush", 0)
+        metrics.incr("probe.flush")
+        # 更新只在内存中累加，刷新时才写文件
+        assert json.loads(path.read_text())["counters"].get("probe.flush", 0) == published
+        metrics.flush()
+        assert json.loads(path.read_text())["counters"]["probe.flush"] == published + 1
+    finally:
+        metrics.share_across_processes(None)
+
+
+def test_prefork_server_hands_out_blocking_connections():
+    server = serve.PreforkWSGIServer("127.0.0.1", 0, None)
+    client = socket.create_connection(server.server_address)
+    try:
+        assert server.socket.getblocking() is False
+        conn, _ = server.get_request()
+        assert conn.getblocking() is True
+        conn.close()
+    finally:
+        client.close()
+        server.server_close()
@@ -0,0 +1,90 @@
+import uuid
+
+import pytest
+
+from be.model.seller import Seller as SellerModel
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestShipOrders:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"seller_bulk_ship_{uuid.uuid4()}"
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        self.store_id, self.book_id = self._open_store()
+        self.other_store_id, self.other_book_id = self._open_store()
+        self.buyer_id = f"buyer_bulk_ship_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(100000) == 200
+        yield
+
+    def _open_store(self):
+        store_id = f"store_bulk_ship_{uuid.uuid4()}"
+        assert self.seller.create_store(store_id) == 200
+        book = Book()
+        book.id = f"book_bulk_ship_{uuid.uuid4()}"
+        book.title = "Bulk Ship"
+        book.price = 10
+        assert self.seller.add_book(store_id, 1000, book) == 200
+        return store_id, book.id
+
+    def _order(self, store_id=None, book_id=None, pay=True):
+        code, order_id = self.buyer.new_order(
+            store_id or self.store_id, [(book_id or self.book_id, 1)]
+        )
+        assert code == 200
+        if pay:
+            assert self.buyer.payment(order_id) == 200
+        return order_id
+
+    def test_ship_many_with_one_update(self):
+        paid = [self._order() for _ in range(5)]
+        with StatementRecorder() as recorder:
+            code, message, results = SellerModel().ship_orders(
+                self.seller_id, self.store_id, paid
+            )
+        assert code == 200
+        assert message == "ok"
+        assert [r["order_id"] for r in results] == paid
+        assert all(r["code"] == 200 for r in results)
+        updates = [
+            s for s in recorder.statements if s.upper().startswith("UPDATE ORDERS")
+        ]
+        assert len(updates) == 1
+
+        code, payload = self.seller.list_orders(self.store_id, status="shipped")
+        assert code == 200
+        assert {o["order_id"] for o in payload["orders"]} == set(paid)
+        for order_id in paid:
+            assert self.buyer.confirm_receipt(order_id) == 200
+
+    def test_per_order_results(self):
+        paid = self._order()
+        pending = self._order(pay=False)
+        foreign = self._order(self.other_store_id, self.other_book_id)
+        missing = f"missing_{uuid.uuid4()}"
+
+        code, payload = self.seller.ship_orders(
+            self.store_id, [paid, pending, foreign, missing, paid]
+        )
+        assert code == 200
+        assert payload["message"] == "partial failure"
+        codes = {r["order_id"]: r["code"] for r in payload["results"]}
+        assert len(payload["results"]) == 4
+        assert codes == {paid: 200, pending: 520, foreign: 401, missing: 518}
+
+        # 已发货的订单再次发货按状态错误返回
+        code, payload = self.seller.ship_orders(self.store_id, [paid])
+        assert payload["results"][0]["code"] == 520
+
+    def test_store_ownership_checked_once(self):
+        order_id = self._order()
+        other_id = f"seller_bulk_ship_other_{uuid.uuid4()}"
+        other = register_new_seller(other_id, other_id)
+        code, _ = other.ship_orders(self.store_id, [order_id])
+        assert code == 401
+        code, _ = self.seller.ship_orders(self.store_id + "_x", [order_id])
+        assert code == 513
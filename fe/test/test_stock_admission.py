@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+
+from be.model import stock_admission
+from be.model.buyer import Buyer as BuyerModel
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.test.query_counter import StatementRecorder
+
+
+class TestStockAdmission:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        stock_admission.configure(enabled=True, ttl=60)
+        self.seller_id = f"seller_admission_{uuid.uuid4()}"
+        self.store_id = f"store_admission_{uuid.uuid4()}"
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        book = Book()
+        book.id = f"book_admission_{uuid.uuid4()}"
+        book.title = "Hot"
+        book.price = 10
+        assert self.seller.add_book(self.store_id, 2, book) == 200
+        self.book_id = book.id
+        self.buyer_id = f"buyer_admission_{uuid.uuid4()}"
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        yield
+        stock_admission.configure(enabled=False)
+
+    def _level(self):
+        return stock_admission.known_level(self.store_id, self.book_id)
+
+    def test_sold_out_rejected_without_touching_database(self):
+        assert self._level() == 2
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 2)])
+        assert code == 200
+        assert self._level() == 0
+
+        with StatementRecorder() as recorder:
+            code, _, _ = BuyerModel().new_order(
+                self.buyer_id, self.store_id, [(self.book_id, 1)]
+            )
+        assert code == 517
+        assert recorder.statements == []
+
+    def test_restock_and_cancel_are_tracked(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book_id, 2)])
+        assert code == 200
+        assert (
+            self.seller.add_stock_level(self.seller_id, self.store_id, self.book_id, 3)
+            == 200
+        )
+        assert self._level() == 3
+        assert self.buyer.cancel_order(order_id)[0] == 200
+        assert self._level() == 5
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 5)])
+        assert code == 200
+        assert self._level() == 0
+
+    def test_failed_reservation_records_observed_stock(self):
+        stock_admission.configure(enabled=True, ttl=60)
+        assert self._level() is None
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 3)])
+        assert code == 517
+        # 锁定库存行时读到的 2 在事务结束后生效
+        assert self._level() == 2
+
+    def test_stale_entries_are_ignored(self):
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 2)])
+        assert code == 200
+        stock_admission.configure(enabled=True, ttl=0)
+        assert self._level() is None
+        code, _ = self.buyer.new_order(self.store_id, [(self.book_id, 1)])
+        # 计数已过期，请求进入数据库并由库存行判定
+        assert code == 517
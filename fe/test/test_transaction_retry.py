@@ -0,0 +1,146 @@
+import contextlib
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from be.model import metrics, sql_conn
+from be.model.buyer import Buyer
+from be.model.dao import order_dao, user_dao
+from be.model.sql_conn import session_scope
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+def mysql_error(code, message="lock error"):
+    return OperationalError("UPDATE ...", {}, Exception(code, message))
+
+
+@contextlib.contextmanager
+def dummy_scope():
+    yield object()
+
+
+def counter(name):
+    return metrics.snapshot()["counters"].get(name, 0)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(sql_conn.time, "sleep", lambda seconds: None)
+
+
+def test_transient_error_classification():
+    assert sql_conn.is_transient_error(mysql_error(1213))
+    assert sql_conn.is_transient_error(mysql_error(1205))
+    assert not sql_conn.is_transient_error(mysql_error(1062))
+    assert not sql_conn.is_transient_error(
+        IntegrityError("INSERT ...", {}, Exception(1062, "duplicate"))
+    )
+    assert not sql_conn.is_transient_error(RuntimeError("boom"))
+    assert sql_conn.is_transient_error(
+        OperationalError("UPDATE ...", {}, Exception("database is locked"))
+    )
+
+
+def test_backoff_is_bounded():
+    for attempt in range(1, 20):
+        assert 0 <= sql_conn._backoff_delay(attempt) <= sql_conn.TX_MAX_DELAY
+
+
+def test_retries_until_success():
+    calls = []
+
+    def work(session):
+        calls.append(session)
+        if len(calls) < 3:
+            raise mysql_error(1213)
+        return "done"
+
+    before = counter("tx.retry_ok.retry")
+    assert sql_conn.run_transaction("retry_ok", work, scope=dummy_scope) == "done"
+    assert len(calls) == 3
+    assert counter("tx.retry_ok.retry") - before == 2
+
+
+def test_gives_up_after_max_attempts():
+    def work(session):
+        raise mysql_error(1205)
+
+    before = counter("tx.retry_abort.abort")
+    with pytest.raises(OperationalError):
+        sql_conn.run_transaction(
+            "retry_abort", work, scope=dummy_scope, max_attempts=3
+        )
+    assert counter("tx.retry_abort.abort") - before == 1
+    assert counter("tx.retry_abort.retry") == 2
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def work(session):
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        sql_conn.run_transaction("retry_other", work, scope=dummy_scope)
+    assert calls == [1]
+
+
+def test_request_with_earlier_writes_is_not_retried():
+    calls = []
+
+    def work(session):
+        calls.append(1)
+        raise mysql_error(1213)
+
+    user_id = f"user_retry_{uuid.uuid4()}"
+    before = counter("tx.retry_unit.abort")
+    sql_conn.begin_request_unit()
+    try:
+        with session_scope() as session:
+            user_dao.create_user(session, user_id, "pw", "token", "terminal")
+        # 重试会回滚整个请求事务，连同上面已写入的用户
+        with pytest.raises(OperationalError):
+            sql_conn.run_transaction("retry_unit", work)
+    finally:
+        sql_conn.end_request_unit()
+    assert calls == [1]
+    assert counter("tx.retry_unit.abort") - before == 1
+    assert counter("tx.retry_unit.retry") == 0
+
+
+def test_payment_survives_a_deadlock(monkeypatch):
+    seller_id = f"seller_retry_{uuid.uuid4()}"
+    store_id = f"store_retry_{uuid.uuid4()}"
+    seller = register_new_seller(seller_id, seller_id)
+    assert seller.create_store(store_id) == 200
+    book = Book()
+    book.id = f"book_retry_{uuid.uuid4()}"
+    book.title = "Retry"
+    book.price = 50
+    assert seller.add_book(store_id, 5, book) == 200
+    buyer_id = f"buyer_retry_{uuid.uuid4()}"
+    buyer = register_new_buyer(buyer_id, buyer_id)
+    assert buyer.add_funds(100) == 200
+    code, order_id = buyer.new_order(store_id, [(book.id, 1)])
+    assert code == 200
+
+    real_update = order_dao.update_order_status
+    failures = []
+
+    def deadlock_once(*args, **kwargs):
+        if not failures:
+            failures.append(1)
+            raise mysql_error(1213, "Deadlock found when trying to get lock")
+        return real_update(*args, **kwargs)
+
+    monkeypatch.setattr(order_dao, "update_order_status", deadlock_once)
+    assert Buyer().payment(buyer_id, buyer_id, order_id) == (200, "ok")
+    with session_scope() as session:
+        assert order_dao.get_order(session, order_id).status == "paid"
+        user_dao.rollup_ledger(session, user_id=seller_id)
+        assert user_dao.get_user(session, buyer_id).balance == 50
+        assert user_dao.get_user(session, seller_id).balance == 50
@@ -0,0 +1,215 @@
+"""把旧版 ``inventories.book_info`` 与旧版 ``book_blob`` 文档迁到新的存储形态。
+
+旧版每条上架都在 ``inventories.book_info`` 里存一份完整 JSON（含 base64 图片），
+拆表后读接口只从 ``books`` 与 blob 存储重建 ``book_info``。删除旧列之前先运行本脚本：
+同一本书在多家店铺上架时取 ``updated_at`` 最新的那份，按上架时的同一套规则拆分写入，
+图片解码后按哈希存进图片库。``books`` 行比这份上架更新的书（拆表后重新上架过、
+或已迁移过）跳过，写入都是 upsert，可重复运行。
+
+旧版导入脚本写入的 ``book_blob`` 文档把封面以 Binary 内嵌在 ``picture`` 里，
+还可能带其它旧键；没有内容哈希的文档一律按白名单重写，内嵌封面存入图片库并记为
+``pictures`` 中的哈希，``books.cover_ref`` 为空时补上。
+
+    python script/backfill_book_info.py --batch-size 200
+    python script/backfill_book_info.py --drop-columns   # 全部成功后删除旧列
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+
+from sqlalchemy import MetaData, Table, bindparam, inspect, select, text, update  # noqa: E402
+
+from be.model.blob_store import get_blob_store, normalize_blob  # noqa: E402
+from be.model.dao import search_dao, store_dao  # noqa: E402
+from be.model.models import Book  # noqa: E402
+from be.model.seller import _listing_rows, _parse_book_info  # noqa: E402
+from be.model.sql_conn import engine, session_scope  # noqa: E402
+
+DEFAULT_BATCH = 200
+LEGACY_COLUMNS = ("book_info", "search_text")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Move legacy inventories.book_info into books and the blob store."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH,
+        help="Books per transaction.",
+    )
+    parser.add_argument(
+        "--drop-columns",
+        action="store_true",
+        help="Drop inventories.book_info/search_text after every book was migrated.",
+    )
+    return parser.parse_args()
+
+
+def legacy_columns() -> List[str]:
+    names = {column["name"] for column in inspect(engine).get_columns("inventories")}
+    return [name for name in LEGACY_COLUMNS if name in names]
+
+
+def _latest_listings(session, inventories: Table, book_ids: List[str]) -> Dict[str, Tuple]:
+    """``book_id -> (store_id, book_info, stock_level, updated_at)`` of each book's
+    newest listing that still has a legacy ``book_info``."""
+    rows = session.execute(
+        select(
+            inventories.c.book_id,
+            inventories.c.store_id,
+            inventories.c.book_info,
+            inventories.c.stock_level,
+            inventories.c.updated_at,
+        )
+        .where(
+            inventories.c.book_id.in_(book_ids),
+            inventories.c.book_info.isnot(None),
+        )
+        .order_by(inventories.c.book_id, inventories.c.updated_at)
+    )
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def backfill(batch_size: int = DEFAULT_BATCH) -> Tuple[int, List[Tuple[str, str]]]:
+    """Migrate every book that still has a legacy ``book_info``; return (migrated, failures)."""
+    if "book_info" not in legacy_columns():
+        return 0, []
+    inventories = Table("inventories", MetaData(), autoload_with=engine)
+    blob_store = get_blob_store()
+    migrated = 0
+    failures: List[Tuple[str, str]] = []
+    last_book_id = ""
+    while True:
+        with session_scope() as session:
+            book_ids = list(
+                session.execute(
+                    select(inventories.c.book_id)
+                    .where(
+                        inventories.c.book_info.isnot(None),
+                        inventories.c.book_id > last_book_id,
+                    )
+                    .group_by(inventories.c.book_id)
+                    .order_by(inventories.c.book_id)
+                    .limit(batch_size)
+                ).scalars()
+            )
+            if not book_ids:
+                break
+            last_book_id = book_ids[-1]
+
+            book_updated = dict(
+                session.execute(
+                    select(Book.book_id, Book.updated_at).where(Book.book_id.in_(book_ids))
+                ).all()
+            )
+            book_rows, search_rows = [], []
+            blobs: Dict[str, Dict] = {}
+            pictures: Dict[str, bytes] = {}
+            for book_id, (store_id, info, stock, listed_at) in _latest_listings(
+                session, inventories, book_ids
+            ).items():
+                # books 行在这份上架之后被写过：拆表后重新上架或已经迁移，以 books 为准
+                updated_at = book_updated.get(book_id)
+                if updated_at is not None and updated_at > listed_at:
+                    continue
+                if not _parse_book_info(info):
+                    failures.append((book_id, "invalid book_info"))
+                    continue
+                try:
+                    rows = _listing_rows(store_id, book_id, info, stock)
+                except (TypeError, ValueError) as e:
+                    failures.append((book_id, f"{e}"))
+                    continue
+                book_rows.append(rows["book"])
+                search_rows.append(rows["search"])
+                if rows["blob"]:
+                    blobs[book_id] = rows["blob"]
+                pictures.update(rows["pictures"])
+            # 与上架一致：blob 与图片先于行写入
+            blob_store.put_pictures(pictures)
+            blob_store.put_many(blobs)
+            store_dao.bulk_upsert_books(session, book_rows)
+            search_dao.bulk_upsert_search_index(session, search_rows)
+            migrated += len(book_rows)
+    return migrated, failures
+
+
+def rewrite_legacy_blobs(batch_size: int = DEFAULT_BATCH) -> int:
+    """Rewrite blob documents without a content hash into the whitelisted shape; return how many."""
+    blob_store = get_blob_store()
+    rewritten = 0
+    last_book_id = ""
+    while True:
+        with session_scope() as session:
+            books = dict(
+                session.execute(
+                    select(Book.book_id, Book.cover_ref)
+                    .where(
+                        Book.has_external_longtext.is_(True),
+                        Book.book_id > last_book_id,
+                    )
+                    .order_by(Book.book_id)
+                    .limit(batch_size)
+                ).all()
+            )
+            if not books:
+                break
+            last_book_id = max(books)
+
+            docs: Dict[str, Dict] = {}
+            pictures: Dict[str, bytes] = {}
+            covers: List[Dict] = []
+            for book_id, doc in blob_store.get_many(books).items():
+                if "content_hash" in doc:
+                    continue
+                fields, legacy_pictures = normalize_blob(doc)
+                docs[book_id] = fields
+                pictures.update(legacy_pictures)
+                if books[book_id] is None and fields.get("pictures"):
+                    covers.append(
+                        {"b_book_id": book_id, "b_cover_ref": fields["pictures"][0]}
+                    )
+            blob_store.put_pictures(pictures)
+            blob_store.put_many(docs)
+            if covers:
+                books_table = Book.__table__
+                session.execute(
+                    update(books_table)
+                    .where(books_table.c.book_id == bindparam("b_book_id"))
+                    .values(cover_ref=bindparam("b_cover_ref")),
+                    covers,
+                )
+            rewritten += len(docs)
+    return rewritten
+
+
+def drop_legacy_columns() -> List[str]:
+    dropped = legacy_columns()
+    with engine.begin() as conn:
+        for name in dropped:
+            conn.execute(text("ALTER TABLE inventories DROP COLUMN {}".format(name)))
+    return dropped
+
+
+def main() -> None:
+    args = parse_args()
+    batch_size = max(args.batch_size, 1)
+    migrated, failures = backfill(batch_size)
+    print(f"Migrated {migrated} books")
+    for book_id, message in failures:
+        print(f"  failed {book_id}: {message}")
+    print(f"Rewrote {rewrite_legacy_blobs(batch_size)} legacy blob documents")
+    if args.drop_columns:
+        if failures:
+            raise SystemExit("Some books failed; legacy columns were kept.")
+        print("Dropped columns: {}".format(", ".join(drop_legacy_columns()) or "none"))
+
+
+if __name__ == "__main__":
+    main()
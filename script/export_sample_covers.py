@@ -5,6 +5,7 @@ from typing import Iterable, Optional
 
 from bson.binary import Binary
 
+from be.model.blob_store import get_blob_store
 from be.model.mongo import get_book_collection
 
 DEFAULT_DEST = Path("test_pictures")
@@ -38,6 +39,8 @@ def export_sample_covers(
     coll = get_book_collection()
     dest.mkdir(parents=True, exist_ok=True)
 
+    # 旧版文档内嵌 picture，迁移后的文档在 pictures 中记图片库的哈希
+    has_cover = {"$or": [{"picture": {"$exists": True}}, {"pictures.0": {"$exists": True}}]}
     docs = []
     if book_ids:
         docs = list(
@@ -45,7 +48,7 @@ def export_sample_covers(
                 {
                     "doc_type": "book_blob",
                     "book_id": {"$in": list(book_ids)},
-                    "picture": {"$exists": True},
+                    **has_cover,
                 }
             )
         )
@@ -53,7 +56,7 @@ def export_sample_covers(
         docs = list(
             coll.aggregate(
                 [
-                    {"$match": {"doc_type": "book_blob", "picture": {"$exists": True}}},
+                    {"$match": {"doc_type": "book_blob", **has_cover}},
                     {"$sample": {"size": limit}},
                 ]
             )
@@ -62,6 +65,8 @@ def export_sample_covers(
     for doc in docs[:limit]:
         book_id = doc.get("book_id")
         pic = doc.get("picture")
+        if not pic and doc.get("pictures"):
+            pic = get_blob_store().get_picture(doc["pictures"][0])
         if not book_id or not pic:
             continue
         _save_picture(book_id, pic, dest)
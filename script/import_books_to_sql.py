@@ -2,21 +2,20 @@ import argparse
 import sqlite3
 import sys
 from pathlib import Path
-from typing import Dict, Optional
-
-from bson.binary import Binary
+from typing import Dict, List, Optional
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 sys.path.append(str(BASE_DIR))
 
-from be.model.mongo import get_book_collection  # noqa: E402
+from be.model.blob_store import get_blob_store, picture_hash  # noqa: E402
 from be.model.sql_conn import session_scope  # noqa: E402
 from be.model.models import Book, BookSearchIndex, Inventory  # noqa: E402
-from be.model.dao import search_dao  # noqa: E402
+from be.model.dao import search_dao, store_dao  # noqa: E402
 
 DEFAULT_SQLITE = Path(__file__).resolve().parents[1] / "fe" / "data" / "book_lx.db"
 DEFAULT_LONG_TEXT_THRESHOLD = 2048
 DEFAULT_EXCERPT = 512
+DEFAULT_BATCH = 500
 
 
 def parse_args() -> argparse.Namespace:
@@ -41,6 +40,12 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_EXCERPT,
         help="Length of excerpt kept in MySQL for long text fields.",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH,
+        help="Rows per upsert statement.",
+    )
     parser.add_argument(
         "--reset",
         action="store_true",
@@ -65,7 +70,7 @@ def import_books(args: argparse.Namespace) -> None:
     cursor = conn.execute("SELECT * FROM book")
     rows = cursor.fetchall()
 
-    mongo_coll = get_book_collection()
+    blob_store = get_blob_store()
     imported = 0
     with session_scope() as session:
         if args.reset:
@@ -73,80 +78,77 @@ def import_books(args: argparse.Namespace) -> None:
             session.query(BookSearchIndex).delete()
             session.query(Book).delete()
 
+        book_rows: List[Dict] = []
+        search_rows: List[Dict] = []
+        blobs: Dict[str, Dict] = {}
+        pictures: Dict[str, bytes] = {}
+
+        def flush() -> None:
+            blob_store.put_pictures(pictures)
+            blob_store.put_many(blobs)
+            store_dao.bulk_upsert_books(session, book_rows)
+            search_dao.bulk_upsert_search_index(session, search_rows)
+            for pending in (book_rows, search_rows, blobs, pictures):
+                pending.clear()
+
         for row in rows:
             data = dict(row)
             book_id = data["id"]
-            book = session.get(Book, book_id)
-            if book is None:
-                book = Book(book_id=book_id)
-                session.add(book)
-
-            book.title = data.get("title") or book_id
-            book.author = data.get("author")
-            book.publisher = data.get("publisher")
-            book.original_title = data.get("original_title")
-            book.translator = data.get("translator")
-            book.pub_year = data.get("pub_year")
-            book.pages = data.get("pages")
-            book.price = data.get("price")
-            book.currency_unit = data.get("currency_unit")
-            book.binding = data.get("binding")
-            book.isbn = data.get("isbn")
-
-            long_payload: Dict[str, Optional[str]] = {}
-            author_intro = data.get("author_intro")
-            book_intro = data.get("book_intro")
-            content = data.get("content")
-
-            book.author_excerpt = author_intro
-            book.intro_excerpt = book_intro
-            book.content_excerpt = content
-
-            if author_intro and len(author_intro) > args.long_text_threshold:
-                long_payload["author_intro"] = author_intro
-                book.author_excerpt = _excerpt(author_intro, args.excerpt_length)
-            if book_intro and len(book_intro) > args.long_text_threshold:
-                long_payload["book_intro"] = book_intro
-                book.intro_excerpt = _excerpt(book_intro, args.excerpt_length)
-            if content and len(content) > args.long_text_threshold:
-                long_payload["content"] = content
-                book.content_excerpt = _excerpt(content, args.excerpt_length)
+            book = {
+                "book_id": book_id,
+                "title": data.get("title") or book_id,
+                "author": data.get("author"),
+                "publisher": data.get("publisher"),
+                "original_title": data.get("original_title"),
+                "translator": data.get("translator"),
+                "pub_year": data.get("pub_year"),
+                "pages": data.get("pages"),
+                "price": data.get("price"),
+                "currency_unit": data.get("currency_unit"),
+                "binding": data.get("binding"),
+                "isbn": data.get("isbn"),
+                "cover_ref": None,
+            }
+
+            long_payload: Dict[str, object] = {}
+            for key, column in (
+                ("author_intro", "author_excerpt"),
+                ("book_intro", "intro_excerpt"),
+                ("content", "content_excerpt"),
+            ):
+                text = data.get(key)
+                book[column] = text
+                if text and len(text) > args.long_text_threshold:
+                    long_payload[key] = text
+                    book[column] = _excerpt(text, args.excerpt_length)
 
             picture = data.get("picture")
             if picture:
-                long_payload["picture"] = Binary(picture)
-
-            has_blob = bool(long_payload)
-            book.has_external_longtext = has_blob
-
-            search_dao.upsert_search_index(
-                session,
-                book_id,
-                title=book.title,
-                subtitle=None,
-                author=book.author,
-                tags=data.get("tags"),
-                catalog_excerpt=None,
-                intro_excerpt=book.intro_excerpt,
-                content_excerpt=book.content_excerpt,
+                digest = picture_hash(picture)
+                pictures[digest] = picture
+                long_payload["pictures"] = [digest]
+                book["cover_ref"] = digest
+
+            book["has_external_longtext"] = bool(long_payload)
+            if long_payload:
+                blobs[book_id] = long_payload
+            book_rows.append(book)
+            search_rows.append(
+                {
+                    "book_id": book_id,
+                    "title": book["title"],
+                    "subtitle": None,
+                    "author": book["author"],
+                    "tags": data.get("tags"),
+                    "catalog_excerpt": None,
+                    "intro_excerpt": book["intro_excerpt"],
+                    "content_excerpt": book["content_excerpt"],
+                }
             )
-
-            if has_blob:
-                doc = {"doc_type": "book_blob", "book_id": book_id}
-                doc.update(
-                    {
-                        key: value
-                        for key, value in long_payload.items()
-                        if value is not None
-                    }
-                )
-                mongo_coll.update_one(
-                    {"doc_type": "book_blob", "book_id": book_id},
-                    {"$set": doc},
-                    upsert=True,
-                )
-
             imported += 1
+            if len(book_rows) >= args.batch_size:
+                flush()
+        flush()
 
     conn.close()
     print(f"Imported {imported} books from {sqlite_path}")